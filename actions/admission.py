@@ -0,0 +1,145 @@
+"""
+Adaptive admission control for the public endpoints
+
+Each endpoint group has a concurrency limit that follows observed latency
+(AIMD: grow by about one slot per limit's worth of fast requests, cut by a
+fixed factor when requests get slow or fail). Requests are admitted by
+priority class:
+
+- critical (emergency keywords, government alerts): always admitted, never queued
+- normal: admitted under the limit, otherwise queued briefly, then shed
+- low (quizzes, tips, rewards): admitted only under a share of the limit, shed at once
+
+Limits are per process, like the uvicorn worker they protect. The priority
+rules and the AIMD limit live in admission_rules.py, shared with the webhook.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+import logging
+
+from admission_rules import CRITICAL, LOW, NORMAL, AdaptiveLimit, classify_text
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+ACTION_PRIORITIES = {
+    "action_emergency_assessment": CRITICAL,
+    "action_health_quiz": LOW,
+    "action_health_tips": LOW,
+    "action_reward_calculation": LOW,
+}
+
+
+def classify_action(request: Dict) -> str:
+    """Priority class of a Rasa action request: by action, then by the user's message"""
+    latest = (request.get("tracker") or {}).get("latest_message") or {}
+    if classify_text(latest.get("text")) == CRITICAL:
+        return CRITICAL
+    return ACTION_PRIORITIES.get(request.get("next_action"), NORMAL)
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; callers answer 503 with Retry-After"""
+
+    def __init__(self, group: str, priority: str, retry_after: float):
+        super().__init__(f"{group} overloaded, shed {priority} request")
+        self.group = group
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, group: str, limit: AdaptiveLimit, low_share: float = 0.5,
+                 queue_timeout: float = 1.0, max_queued: int = 100, retry_after: float = 5.0):
+        self.group = group
+        self.limit = limit
+        self.low_share = low_share
+        self.queue_timeout = queue_timeout
+        self.max_queued = max_queued
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = {CRITICAL: 0, NORMAL: 0, LOW: 0}
+        self.shed = {CRITICAL: 0, NORMAL: 0, LOW: 0}
+
+    async def _acquire(self, priority: str):
+        if priority == CRITICAL or (self.in_flight < self.limit.limit * (self.low_share if priority == LOW else 1)
+                                    and not self._waiters):
+            self.in_flight += 1
+            return
+        if priority == LOW or len(self._waiters) >= self.max_queued:
+            raise self._shed(priority)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # The releasing request hands its slot over (in_flight already counts us)
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._shed(priority)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()  # handed a slot the cancelled request won't use
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _shed(self, priority: str) -> Overloaded:
+        self.shed[priority] += 1
+        return Overloaded(self.group, priority, self.retry_after)
+
+    def _release(self):
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < self.limit.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    @asynccontextmanager
+    async def admit(self, priority: str = NORMAL) -> AsyncIterator[None]:
+        """Hold a slot for the request; raises Overloaded if it is shed"""
+        await self._acquire(priority)
+        self.admitted[priority] += 1
+        started, ok = time.monotonic(), False
+        try:
+            yield
+            ok = True
+        finally:
+            self.limit.record(time.monotonic() - started, ok, self.in_flight)
+            self._release()
+
+    def snapshot(self) -> Dict:
+        return {
+            "limit": round(self.limit.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "admitted": dict(self.admitted),
+            "shed": dict(self.shed),
+        }
+
+
+_controllers: Dict[str, AdmissionController] = {}
+
+
+def get_admission(group: str) -> AdmissionController:
+    """Process-wide controller for an endpoint group ("chat" or "actions")"""
+    if group not in _controllers:
+        target = {
+            "chat": settings.admission_chat_target_latency_seconds,
+            "actions": settings.admission_actions_target_latency_seconds,
+        }[group]
+        _controllers[group] = AdmissionController(
+            group,
+            AdaptiveLimit(target, initial=settings.admission_initial_limit,
+                          min_limit=settings.admission_min_limit, max_limit=settings.admission_max_limit),
+            low_share=settings.admission_low_priority_share,
+            queue_timeout=settings.admission_queue_timeout_seconds,
+            retry_after=settings.admission_retry_after_seconds,
+        )
+    return _controllers[group]
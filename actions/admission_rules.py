@@ -0,0 +1,56 @@
+"""
+Priority classes and the AIMD limit shared by the actions server and the
+webhook gateway
+
+Kept free of service settings so the webhook image can copy this one file
+(see webhook/Dockerfile) instead of carrying its own copy of the rules.
+"""
+
+import time
+from typing import Optional
+
+CRITICAL = "critical"
+NORMAL = "normal"
+LOW = "low"
+
+EMERGENCY_KEYWORDS = (
+    "emergency", "ambulance", "urgent", "can't breathe", "cannot breathe", "difficulty breathing",
+    "chest pain", "heart attack", "stroke", "unconscious", "fainting", "severe bleeding",
+    "poisoning", "overdose", "suicide",
+)
+LOW_PRIORITY_KEYWORDS = ("quiz", "tip", "tips", "trivia", "reward", "token balance")
+
+
+def classify_text(text: Optional[str]) -> str:
+    """Priority class of a free-text user message"""
+    text = (text or "").lower()
+    if any(keyword in text for keyword in EMERGENCY_KEYWORDS):
+        return CRITICAL
+    words = set(text.replace("?", " ").replace(".", " ").split())
+    if any(keyword in words or (" " in keyword and keyword in text) for keyword in LOW_PRIORITY_KEYWORDS):
+        return LOW
+    return NORMAL
+
+
+class AdaptiveLimit:
+    """AIMD concurrency limit driven by request latency"""
+
+    def __init__(self, target_latency: float, initial: float = 20, min_limit: float = 2,
+                 max_limit: float = 500, backoff: float = 0.8):
+        self.target_latency = target_latency
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self._last_decrease = 0.0
+
+    def record(self, latency: float, ok: bool, in_use: float):
+        now = time.monotonic()
+        if not ok or latency > self.target_latency:
+            # At most one cut per latency window, so one slow burst isn't counted many times
+            if now - self._last_decrease >= self.target_latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        elif in_use >= self.limit / 2:
+            # Only grow a limit that is actually being used
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
@@ -0,0 +1,191 @@
+"""
+Idempotent alert delivery: drop alerts already sent (or being sent) to a recipient
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+SENT = "sent"
+
+
+def alert_key(idempotency_key: Optional[str] = None, task_id: Optional[str] = None) -> Optional[str]:
+    """
+    Dedupe key for an alert: the caller's key, else the Celery task id
+
+    The task id still drops redeliveries of the same task. Identical text sent
+    again as a new alert is a new delivery, so message content is never the key.
+    None (no key, not running as a task) means the send is not deduplicated.
+    """
+    if idempotency_key:
+        return idempotency_key
+    return f"task:{task_id}" if task_id else None
+
+
+def _claimable(state: Optional[str], now: float, lease: float) -> bool:
+    # A claim whose sender died is released when its lease runs out
+    return state is None or (state != SENT and now - float(state) > lease)
+
+
+class InMemoryDedupeStore:
+    """Per-process delivery records, for tests and single-worker deployments"""
+
+    def __init__(self):
+        self._alerts: Dict[str, Tuple[float, Dict[str, str]]] = {}
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def claim(self, key: str, recipients: List[str], lease: float, ttl: int) -> List[str]:
+        with self._lock:
+            now = time.time()
+            expires, states = self._alerts.get(key, (0.0, {}))
+            if expires < now:
+                states = {}
+            claimed = [r for r in recipients if _claimable(states.get(r), now, lease)]
+            states.update((r, str(now)) for r in claimed)
+            self._alerts[key] = (now + ttl, states)
+            self._dropped += len(recipients) - len(claimed)
+            for old in [k for k, (exp, _) in self._alerts.items() if exp < now]:
+                del self._alerts[old]
+            return claimed
+
+    def mark_sent(self, key: str, recipients: List[str]):
+        with self._lock:
+            states = self._alerts.get(key, (0.0, {}))[1]
+            states.update((r, SENT) for r in recipients)
+
+    def release(self, key: str, recipients: List[str]):
+        with self._lock:
+            states = self._alerts.get(key, (0.0, {}))[1]
+            for r in recipients:
+                if states.get(r) != SENT:
+                    states.pop(r, None)
+
+    def dropped(self) -> int:
+        with self._lock:
+            return self._dropped
+
+
+# One hash per alert, one field per recipient: claim/send state of each delivery
+CLAIM_LUA = """
+local now = tonumber(ARGV[1])
+local lease = tonumber(ARGV[2])
+local claimed = {}
+for i = 4, #ARGV do
+  local state = redis.call('HGET', KEYS[1], ARGV[i])
+  if not state or (state ~= 'sent' and now - tonumber(state) > lease) then
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[1])
+    claimed[#claimed + 1] = ARGV[i]
+  end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+local dropped = #ARGV - 3 - #claimed
+if dropped > 0 then
+  redis.call('INCRBY', KEYS[2], dropped)
+end
+return claimed
+"""
+
+# Drop claims, but never a 'sent' record another run wrote after this run's lease ran out
+RELEASE_LUA = """
+for i = 1, #ARGV do
+  if redis.call('HGET', KEYS[1], ARGV[i]) ~= 'sent' then
+    redis.call('HDEL', KEYS[1], ARGV[i])
+  end
+end
+"""
+
+
+class RedisDedupeStore:
+    """Delivery records shared by every worker, in one Redis hash per alert"""
+
+    def __init__(self, redis_url: str, prefix: str = "alerts:dedupe"):
+        import redis
+
+        self.client = redis.Redis.from_url(redis_url, decode_responses=True)
+        self.prefix = prefix
+        self._claim = self.client.register_script(CLAIM_LUA)
+        self._release = self.client.register_script(RELEASE_LUA)
+
+    def claim(self, key: str, recipients: List[str], lease: float, ttl: int) -> List[str]:
+        return self._claim(
+            keys=[f"{self.prefix}:{key}", f"{self.prefix}:dropped"],
+            args=[time.time(), lease, ttl, *recipients],
+        )
+
+    def mark_sent(self, key: str, recipients: List[str]):
+        self.client.hset(f"{self.prefix}:{key}", mapping={r: SENT for r in recipients})
+
+    def release(self, key: str, recipients: List[str]):
+        self._release(keys=[f"{self.prefix}:{key}"], args=recipients)
+
+    def dropped(self) -> int:
+        return int(self.client.get(f"{self.prefix}:dropped") or 0)
+
+
+class AlertDeduplicator:
+    """
+    Claims (alert, recipient) deliveries so each is sent at most once
+
+    A task claims its recipients before sending. Recipients already sent or
+    currently claimed by another run (a duplicate enqueue, or a redelivery
+    racing the original) are dropped and counted. Successful sends are marked
+    sent for `ttl` seconds; failed or deferred ones are released so a retry
+    can claim them again. If the store is unreachable, alerts are sent
+    rather than dropped.
+    """
+
+    def __init__(self, store=None, ttl_seconds: int = None, lease_seconds: float = None):
+        self.store = store or InMemoryDedupeStore()
+        self.ttl = ttl_seconds or settings.alert_dedupe_ttl_hours * 3600
+        self.lease = lease_seconds or settings.alert_dedupe_lease_seconds
+
+    def claim(self, key: str, recipients: List[str]) -> List[str]:
+        """Recipients of alert `key` this caller may send to (others are duplicates)"""
+        if not recipients:
+            return []
+        try:
+            claimed = self.store.claim(key, recipients, self.lease, self.ttl)
+        except Exception as e:
+            logger.warning(f"Alert dedupe unavailable, sending without it: {str(e)}")
+            return list(recipients)
+        if len(claimed) < len(recipients):
+            logger.info(f"Dropped {len(recipients) - len(claimed)} duplicate deliveries of alert {key}")
+        return claimed
+
+    def mark_sent(self, key: str, recipients: List[str]):
+        if recipients:
+            self._safely("mark sent", self.store.mark_sent, key, recipients)
+
+    def release(self, key: str, recipients: List[str]):
+        if recipients:
+            self._safely("release", self.store.release, key, recipients)
+
+    def dropped(self) -> int:
+        """Duplicate deliveries dropped so far (cluster-wide with the Redis store)"""
+        return self.store.dropped()
+
+    def _safely(self, action: str, fn, key: str, recipients: List[str]):
+        try:
+            fn(key, recipients)
+        except Exception as e:
+            logger.warning(f"Could not {action} deliveries of alert {key}: {str(e)}")
+
+
+_deduplicator: Optional[AlertDeduplicator] = None
+
+
+def get_alert_deduplicator() -> AlertDeduplicator:
+    """Process-wide deduplicator, backed by Redis when ALERT_DEDUPE_BACKEND=redis"""
+    global _deduplicator
+    if _deduplicator is None:
+        store = None
+        if settings.alert_dedupe_backend == "redis":
+            store = RedisDedupeStore(settings.redis_url)
+        _deduplicator = AlertDeduplicator(store=store)
+    return _deduplicator
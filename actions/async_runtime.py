@@ -0,0 +1,109 @@
+"""
+Long-lived event loop for running async service code from sync Celery tasks
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Awaitable, Optional, TypeVar
+import logging
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# One pooled HTTP client per event loop (the API server's loop, a worker's runtime loop)
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = \
+    weakref.WeakKeyDictionary()
+
+
+def shared_http_client() -> httpx.AsyncClient:
+    """
+    Keep-alive HTTP client for outbound API calls on the running loop
+
+    Callers must not close it; pass per-request timeouts instead of building
+    a client per call.
+    """
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None:
+        client = _http_clients[loop] = httpx.AsyncClient()
+    return client
+
+
+async def close_http_client():
+    client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+class AsyncRuntime:
+    """
+    One event loop per process, running on a daemon thread
+
+    Sync callers submit coroutines with `run()`. Because the loop outlives each
+    call, the asyncpg pool, the Redis clients and the shared HTTP client keep
+    their connections between tasks instead of being rebuilt per task.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._serve, name="async-runtime", daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """Run `coro` on the runtime loop and wait for its result"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise
+
+    def close(self, cleanup: Optional[Awaitable] = None, timeout: float = 10.0):
+        """Run `cleanup` (e.g. disposing pools) on the loop, then stop it"""
+        if not self.loop.is_running():
+            return
+        try:
+            if cleanup is not None:
+                self.run(cleanup, timeout=timeout)
+            self.run(close_http_client(), timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Error shutting down async runtime: {str(e)}")
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout)
+            if not self.loop.is_running():
+                self.loop.close()
+
+
+_runtime: Optional[AsyncRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime() -> AsyncRuntime:
+    """This process's runtime; a forked child (Celery prefork) starts its own"""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None or _runtime.pid != os.getpid():
+            _runtime = AsyncRuntime()
+        return _runtime
+
+
+def shutdown_runtime(cleanup: Optional[Awaitable] = None):
+    global _runtime
+    with _runtime_lock:
+        runtime, _runtime = _runtime, None
+    if runtime is not None and runtime.pid == os.getpid():
+        runtime.close(cleanup)
+    elif cleanup is not None and asyncio.iscoroutine(cleanup):
+        cleanup.close()
@@ -2,19 +2,56 @@
 Database configuration and models for SIH Health Bot
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Boolean, Float, JSON
+from sqlalchemy import create_engine, make_url, text, Column, Integer, String, DateTime, Text, Boolean, Float, JSON
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.dialects.postgresql import UUID
+import asyncio
+import itertools
+import logging
+import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Generator
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Dict, Generator, List, Optional, Tuple, TypeVar
 
+from async_runtime import get_runtime
 from config import settings
+from pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument_pool, pool_options
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _async_database_url(url: str) -> str:
+    """Swap the sync Postgres driver in `url` for asyncpg"""
+    parsed = make_url(url)
+    if parsed.drivername in ("postgresql", "postgresql+psycopg2"):
+        parsed = parsed.set(drivername="postgresql+asyncpg")
+    return parsed.render_as_string(hide_password=False)
+
 
 # Database setup
-engine = create_engine(settings.database_url)
+# The sync engine serves Celery workers and bulk jobs; request handlers use the async engine
+engine = create_engine(settings.database_url, poolclass=InstrumentedQueuePool, **pool_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(
+    _async_database_url(settings.database_url), poolclass=InstrumentedAsyncQueuePool, **pool_options()
+)
+instrument_pool(engine.pool, "sync")
+instrument_pool(async_engine.sync_engine.pool, "async")
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Read replicas (comma-separated DATABASE_REPLICA_URLS) for dashboard-style reads
+replica_engines: List[AsyncEngine] = []
+for _i, _url in enumerate(u.strip() for u in settings.database_replica_urls.split(",") if u.strip()):
+    replica_engines.append(create_async_engine(
+        _async_database_url(_url), poolclass=InstrumentedAsyncQueuePool, **pool_options()
+    ))
+    instrument_pool(replica_engines[-1].sync_engine.pool, f"replica-{_i}")
+
 Base = declarative_base()
 
 # Database models
@@ -42,7 +79,8 @@ class SymptomReport(Base):
     recommendation = Column(Text)
     image_url = Column(String(500))
     voice_url = Column(String(500))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    location = Column(String(100))
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # partition key
 
 class VaccinationRecord(Base):
     __tablename__ = "vaccination_records"
@@ -52,7 +90,7 @@ class VaccinationRecord(Base):
     vaccine_name = Column(String(100))
     vaccine_type = Column(String(50))
     date_administered = Column(DateTime)
-    next_due_date = Column(DateTime)
+    next_due_date = Column(DateTime, index=True)
     location = Column(String(100))
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -79,7 +117,7 @@ class OutbreakAlert(Base):
     precautions = Column(JSON)
     source = Column(String(50))  # MOFHW, IDSP, etc.
     verified = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # partition key
 
 class MedicineInfo(Base):
     __tablename__ = "medicine_info"
@@ -130,7 +168,154 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+class ReadRouter:
+    """
+    Routes read-only sessions to a replica, falling back to the primary
+
+    A replica is used only while its replay lag is within `max_lag` seconds;
+    lag is probed at most every `check_interval` seconds per replica. Users
+    who wrote within the last `sticky_seconds` read from the primary so they
+    see their own writes. Write marks are kept locally and in Redis so they
+    hold across API processes.
+    """
+
+    LAG_QUERY = text(
+        "SELECT CASE"
+        " WHEN NOT pg_is_in_recovery() THEN 0"
+        " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+        " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+        " END"
+    )
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: List[AsyncEngine],
+        max_lag: float,
+        check_interval: float,
+        sticky_seconds: float,
+        redis_client=None
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.sticky_seconds = sticky_seconds
+        self._redis = redis_client
+        self._sessions = {
+            id(e): async_sessionmaker(e, autoflush=False, expire_on_commit=False) for e in [primary, *replicas]
+        }
+        self._lag: Dict[int, Tuple[float, float]] = {}  # id(engine) -> (checked_at, lag seconds)
+        self._recent_writers: Dict[str, float] = {}
+        self._next = itertools.count()
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            import redis.asyncio as aioredis
+
+            self._redis = aioredis.from_url(settings.redis_url)
+        return self._redis
+
+    async def mark_write(self, user_id: Optional[str]):
+        """Pin `user_id`'s reads to the primary for the stickiness window"""
+        if not user_id or not self.replicas:
+            return
+        user_id = str(user_id)
+        now = time.monotonic()
+        self._recent_writers[user_id] = now + self.sticky_seconds
+        if len(self._recent_writers) > 10000:
+            self._recent_writers = {k: v for k, v in self._recent_writers.items() if v > now}
+        try:
+            await self.redis.set(f"db:ryw:{user_id}", 1, px=int(self.sticky_seconds * 1000))
+        except Exception as e:
+            logger.warning(f"Could not record read-your-writes mark: {str(e)}")
+
+    async def _is_sticky(self, user_id: str) -> bool:
+        expires = self._recent_writers.get(user_id)
+        if expires is not None and expires > time.monotonic():
+            return True
+        try:
+            return bool(await self.redis.exists(f"db:ryw:{user_id}"))
+        except Exception:
+            # Can't tell whether the user just wrote; stay consistent
+            return True
+
+    async def _probe_lag(self, engine: AsyncEngine) -> float:
+        async with engine.connect() as conn:
+            return float(await conn.scalar(self.LAG_QUERY))
+
+    async def _replica_lag(self, engine: AsyncEngine) -> float:
+        checked_at, lag = self._lag.get(id(engine), (float("-inf"), float("inf")))
+        if time.monotonic() - checked_at < self.check_interval:
+            return lag
+        try:
+            lag = await self._probe_lag(engine)
+        except Exception as e:
+            logger.warning(f"Replica lag check failed: {str(e)}")
+            lag = float("inf")
+        self._lag[id(engine)] = (time.monotonic(), lag)
+        return lag
+
+    async def engine_for(self, user_id: Optional[str] = None) -> AsyncEngine:
+        if not self.replicas:
+            return self.primary
+        if user_id and await self._is_sticky(str(user_id)):
+            return self.primary
+
+        start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if await self._replica_lag(replica) <= self.max_lag:
+                return replica
+        return self.primary
+
+    @asynccontextmanager
+    async def session(self, user_id: Optional[str] = None) -> AsyncIterator[AsyncSession]:
+        engine = await self.engine_for(user_id)
+        async with self._sessions[id(engine)]() as db:
+            yield db
+
+
+read_router = ReadRouter(
+    async_engine,
+    replica_engines,
+    max_lag=settings.replica_max_lag_seconds,
+    check_interval=settings.replica_lag_check_seconds,
+    sticky_seconds=settings.read_your_writes_seconds
+)
+
+def read_session(user_id: Optional[str] = None):
+    """
+    Session for read-only queries: a healthy replica, or the primary
+
+    Pass the user_id of per-user reads so recent writers read from the primary.
+    """
+    return read_router.session(user_id)
+
+async def mark_write(user_id: Optional[str]):
+    await read_router.mark_write(user_id)
+
+def run_async(coro: Awaitable[T]) -> T:
+    """
+    Run an async service call from sync code (Celery tasks)
+
+    Calls share this process's long-lived event loop, so the asyncpg pool
+    (whose connections belong to that loop) stays warm between tasks.
+    """
+    return get_runtime().run(coro)
+
+async def dispose_async_engines():
+    """Close pooled async connections; run on the loop that opened them"""
+    for e in [async_engine, *replica_engines]:
+        await e.dispose()
+
 # Initialize database
 async def init_db():
     """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
@@ -15,18 +15,24 @@ import logging
 import hmac
 import hashlib
 import json
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.types import DomainDict
 
 from database import get_db, init_db
+from pool_metrics import get_pool_metrics
+from alert_dedupe import get_alert_deduplicator
+from admission import CRITICAL, Overloaded, classify_action, classify_text, get_admission
+from async_runtime import close_http_client
 from database import User, SymptomReport, VaccinationRecord, RewardTransaction
+from services.cache import TTLCache
 from services import (
     HealthAnalysisService,
     VaccinationService,
     OutbreakService,
+    VaccinationCoverageService,
 )
 # Optional services: import if present; otherwise set to None so app still starts
 try:
@@ -53,6 +59,13 @@ from auth import verify_hmac_signature
 from config import settings
 from pydantic import BaseModel
 from tasks import send_alert_task
+from task_metrics import instrument_tasks
+from task_queues import configure_queues, emergency_options
+from celery import current_app as celery_app
+
+# Producers need the same routes/priorities as the workers
+configure_queues(celery_app)
+instrument_tasks()
 from fastapi.responses import PlainTextResponse
 
 # Configure logging
@@ -68,7 +81,10 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 openai.api_key = OPENAI_API_KEY
 
 # --- In-memory session store for web users (for demo; use Redis/DB for production) ---
-web_user_histories = {}
+# Bounded: idle users expire and only the exchanges used as context are kept
+web_user_histories = TTLCache(
+    maxsize=settings.chat_history_max_users, ttl=settings.chat_history_ttl_hours * 3600
+)
 from fastapi import Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
@@ -78,14 +94,27 @@ class ChatRequest(BaseModel):
     user_id: str
     message: str
 
+# Shed requests get a 503 the client can retry after, instead of queueing behind a storm
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        {"error": "Service busy, please retry shortly.", "priority": exc.priority},
+        status_code=503,
+        headers={"Retry-After": str(int(exc.retry_after))},
+    )
+
 @app.post("/api/chat")
 async def chat_api(req: ChatRequest):
+    async with get_admission("chat").admit(classify_text(req.message)):
+        return await _chat_reply(req)
+
+async def _chat_reply(req: ChatRequest):
     user_id = req.user_id
     user_message = req.message
     if not OPENAI_API_KEY:
         return JSONResponse({"error": "OpenAI API key not set."}, status_code=500)
     # Maintain conversation history for context (last 12 exchanges)
-    history = web_user_histories.get(user_id, [])
+    history = web_user_histories.get(user_id, [])[-settings.chat_history_max_exchanges:]
     system_prompt = {
         "role": "system",
         "content": (
@@ -100,7 +129,7 @@ async def chat_api(req: ChatRequest):
         )
     }
     messages = [system_prompt]
-    for h in history[-12:]:
+    for h in history:
         messages.append({"role": "user", "content": f"[User]: {h['user']}"})
         if h.get("assistant"):
             messages.append({"role": "assistant", "content": h["assistant"]})
@@ -108,9 +137,9 @@ async def chat_api(req: ChatRequest):
     try:
         # Save to history before call to help GPT-4 see the latest turn
         history.append({"user": user_message})
-        web_user_histories[user_id] = history
+        web_user_histories.set(user_id, history)
         try:
-            response = openai.ChatCompletion.create(
+            response = await openai.ChatCompletion.acreate(
                 model="gpt-4",
                 messages=messages,
                 max_tokens=1024,
@@ -119,7 +148,7 @@ async def chat_api(req: ChatRequest):
         except Exception as e:
             # fallback to gpt-3.5-turbo if gpt-4 is not available
             logger.warning(f"Falling back to gpt-3.5-turbo: {e}")
-            response = openai.ChatCompletion.create(
+            response = await openai.ChatCompletion.acreate(
                 model="gpt-3.5-turbo-16k",
                 messages=messages,
                 max_tokens=1024,
@@ -128,7 +157,7 @@ async def chat_api(req: ChatRequest):
         answer = response.choices[0].message["content"].strip()
         # Save assistant reply to history
         history[-1]["assistant"] = answer
-        web_user_histories[user_id] = history
+        web_user_histories.set(user_id, history)
         return {"reply": answer}
     except Exception as e:
         logger.error(f"AI chat error: {e}")
@@ -159,7 +188,12 @@ async def index():
             "/webhook",
             "/api/outbreaks",
             "/api/vaccination-schedule",
+            "/api/vaccination-schedule/due",
+            "/api/vaccination-coverage",
             "/api/outbreak-alert",
+            "/api/metrics/db-pool",
+            "/api/metrics/alert-dedupe",
+            "/api/metrics/admission",
         ],
     }
 
@@ -176,11 +210,30 @@ async def startup_event():
     await init_db()
     logger.info("Database initialized successfully")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_http_client()
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow()}
 
+# Connection pool metrics for this worker process
+@app.get("/api/metrics/db-pool")
+async def db_pool_metrics():
+    return {"pid": os.getpid(), "pools": get_pool_metrics()}
+
+# Duplicate alert deliveries dropped (cluster-wide with ALERT_DEDUPE_BACKEND=redis)
+@app.get("/api/metrics/alert-dedupe")
+async def alert_dedupe_metrics():
+    return {"backend": settings.alert_dedupe_backend, "dropped": get_alert_deduplicator().dropped()}
+
+# Admission limits and shed counts for this worker process
+@app.get("/api/metrics/admission")
+async def admission_metrics():
+    return {"pid": os.getpid(), "groups": {group: get_admission(group).snapshot() for group in ("chat", "actions")}}
+
 # Rasa webhook endpoint
 @app.post("/webhook")
 async def rasa_webhook(
@@ -189,11 +242,14 @@ async def rasa_webhook(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """Handle Rasa webhook requests with HMAC verification"""
+    # Verify before classifying, so an unsigned body can't claim the critical class
+    if not verify_hmac_signature(request, credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid HMAC signature")
+    async with get_admission("actions").admit(classify_action(request)):
+        return await _rasa_webhook(request, background_tasks)
+
+async def _rasa_webhook(request: Dict[str, Any], background_tasks: BackgroundTasks):
     try:
-        # Verify HMAC signature for government alerts
-        if not verify_hmac_signature(request, credentials.credentials):
-            raise HTTPException(status_code=401, detail="Invalid HMAC signature")
-        
         # Process the request
         result = await process_rasa_request(request, background_tasks)
         return result
@@ -206,6 +262,9 @@ async def rasa_webhook(
 class AlertRequest(BaseModel):
     user_id: str
     message: str
+    emergency: bool = False
+    # Repeat a request with the same key and the alert is delivered once
+    idempotency_key: Optional[str] = None
 
 
 @app.post("/api/v1/alerts/")
@@ -214,9 +273,17 @@ async def create_alert(payload: AlertRequest):
 
     Accepts a JSON payload with `user_id` and `message`, enqueues
     `send_alert_task` via Celery, and returns the Celery task id.
+    Emergency alerts go to the emergency queue, ahead of every other workload.
+    An optional `idempotency_key` makes client retries safe; without one,
+    each request is a separate alert even if the text repeats.
     """
     try:
-        async_result = send_alert_task.delay(user_id=payload.user_id, message=payload.message)
+        options = emergency_options() if payload.emergency else {}
+        async_result = send_alert_task.apply_async(
+            kwargs={"user_id": payload.user_id, "message": payload.message,
+                    "idempotency_key": payload.idempotency_key},
+            **options
+        )
         return {"task_id": async_result.id}
     except Exception as e:
         logger.error(f"Failed to enqueue alert task: {e}")
@@ -647,17 +714,47 @@ async def get_vaccination_schedule(age: int, location: Optional[str] = None):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/vaccination-schedule/due")
+async def get_due_vaccines(
+    date_of_birth: Optional[date] = None,
+    age_days: Optional[int] = None,
+    user_id: Optional[str] = None
+):
+    """Get exact due, overdue and upcoming doses from a date of birth (or age in days)"""
+    if date_of_birth is None and age_days is None:
+        raise HTTPException(status_code=400, detail="date_of_birth or age_days is required")
+    try:
+        if date_of_birth is None:
+            date_of_birth = date.today() - timedelta(days=age_days)
+        vaccination_service = VaccinationService()
+        return await vaccination_service.get_due_vaccines(date_of_birth, user_id=user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/vaccination-coverage")
+async def get_vaccination_coverage(location: Optional[str] = None):
+    """Get per-location vaccination coverage from the periodically refreshed snapshot"""
+    try:
+        coverage_service = VaccinationCoverageService()
+        return await coverage_service.get_location_coverage(location)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/outbreak-alert")
 async def receive_outbreak_alert(
     alert_data: Dict[str, Any],
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """Receive outbreak alerts from government systems with HMAC verification"""
+    # Verify before admitting: only signed alerts may take a never-shed critical slot
+    if not verify_hmac_signature(alert_data, credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid HMAC signature")
+    # Government alerts are never shed, but still count against the limit
+    async with get_admission("actions").admit(CRITICAL):
+        return await _receive_outbreak_alert(alert_data)
+
+async def _receive_outbreak_alert(alert_data: Dict[str, Any]):
     try:
-        # Verify HMAC signature
-        if not verify_hmac_signature(alert_data, credentials.credentials):
-            raise HTTPException(status_code=401, detail="Invalid HMAC signature")
-        
         outbreak_service = OutbreakService()
         await outbreak_service.process_outbreak_alert(alert_data)
         
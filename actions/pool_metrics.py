@@ -0,0 +1,152 @@
+"""
+Instrumented SQLAlchemy connection pools for SIH Health Bot
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+import logging
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    """Checkout counters and wait times for one connection pool"""
+
+    def __init__(self, name: str, window: int = 1000):
+        self.name = name
+        self.pool = None
+        self.checkouts = 0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.slow_checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._recent_waits = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record_checkout(self, wait: float, overflowed: bool):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+            self._recent_waits.append(wait)
+            if overflowed:
+                self.overflow_events += 1
+            slow = wait >= settings.db_pool_slow_checkout_seconds
+            if slow:
+                self.slow_checkouts += 1
+
+        if slow:
+            logger.warning(
+                f"Slow connection checkout from {self.name} pool: waited {wait * 1000:.1f} ms "
+                f"({self.pool.status() if self.pool is not None else 'no pool'})"
+            )
+
+    def record_timeout(self, wait: float):
+        with self._lock:
+            self.timeouts += 1
+        logger.error(
+            f"Connection checkout from {self.name} pool timed out after {wait:.1f} s "
+            f"({self.pool.status() if self.pool is not None else 'no pool'})"
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current pool occupancy plus cumulative checkout statistics"""
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            result = {
+                "checkouts": self.checkouts,
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+                "slow_checkouts": self.slow_checkouts,
+                "wait_ms_avg": round(1000 * self.wait_seconds_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(1000 * self.wait_seconds_max, 3),
+                "wait_ms_p95": round(1000 * waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+            }
+
+        pool = self.pool
+        if pool is not None:
+            result.update(
+                pool_size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+                max_overflow=pool._max_overflow,
+            )
+        return result
+
+
+class _InstrumentedPoolMixin:
+    """
+    Times every pool checkout
+
+    The measured wait covers both queueing for a free connection and opening
+    a new (possibly overflow) connection when the pool grows.
+    """
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        if self.metrics is None:
+            return super()._do_get()
+
+        overflow_before = self._overflow
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_timeout(time.perf_counter() - started)
+            raise
+        # _overflow starts at -pool_size; only growth past zero is a real overflow connection
+        self.metrics.record_checkout(time.perf_counter() - started, self._overflow > max(overflow_before, 0))
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep reporting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        if self.metrics is not None:
+            self.metrics.pool = pool
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+POOL_METRICS: Dict[str, PoolMetrics] = {}
+
+
+def pool_options() -> Dict[str, Any]:
+    """create_engine keyword arguments for the configured pool sizing"""
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def instrument_pool(pool, name: str) -> PoolMetrics:
+    """Attach a PoolMetrics to an engine's instrumented pool and register it"""
+    metrics = PoolMetrics(name)
+    metrics.pool = pool
+    pool.metrics = metrics
+    POOL_METRICS[name] = metrics
+    return metrics
+
+
+def get_pool_metrics() -> Dict[str, Dict[str, Any]]:
+    return {name: metrics.snapshot() for name, metrics in POOL_METRICS.items()}
@@ -0,0 +1,273 @@
+"""
+Health-aware routing between alert delivery providers
+"""
+
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# (successes, failures, latency seconds summed over attempts)
+Stats = Tuple[int, int, float]
+
+
+class InMemoryHealthStore:
+    """Per-process provider health, for tests and single-worker deployments"""
+
+    def __init__(self):
+        self._buckets: Dict[str, Dict[int, List[float]]] = defaultdict(dict)
+        self._circuits: Dict[str, float] = {}
+        self._probes: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, provider: str, bucket: int, successes: int, failures: int, latency: float, ttl: int):
+        with self._lock:
+            buckets = self._buckets[provider]
+            counts = buckets.setdefault(bucket, [0, 0, 0.0])
+            counts[0] += successes
+            counts[1] += failures
+            counts[2] += latency
+            for old in [b for b in buckets if b < bucket - 64]:
+                del buckets[old]
+
+    def window(self, providers: List[str], buckets: List[int]) -> Dict[str, Stats]:
+        with self._lock:
+            result = {}
+            for provider in providers:
+                rows = [self._buckets[provider].get(b, [0, 0, 0.0]) for b in buckets]
+                result[provider] = (int(sum(r[0] for r in rows)), int(sum(r[1] for r in rows)), sum(r[2] for r in rows))
+            return result
+
+    def clear_window(self, provider: str):
+        with self._lock:
+            self._buckets[provider].clear()
+
+    def circuits(self, providers: List[str]) -> Dict[str, Optional[float]]:
+        with self._lock:
+            return {p: self._circuits.get(p) for p in providers}
+
+    def open_circuit(self, provider: str, opened_at: float):
+        with self._lock:
+            self._circuits[provider] = opened_at
+
+    def close_circuit(self, provider: str):
+        with self._lock:
+            self._circuits.pop(provider, None)
+            self._probes.pop(provider, None)
+
+    def try_probe(self, provider: str, ttl: float) -> bool:
+        with self._lock:
+            now = time.time()
+            if self._probes.get(provider, 0) > now:
+                return False
+            self._probes[provider] = now + ttl
+            return True
+
+
+class RedisHealthStore:
+    """Provider health shared by every worker, in time-bucketed Redis hashes"""
+
+    def __init__(self, redis_url: str, prefix: str = "alerts:provider"):
+        import redis
+
+        self.client = redis.Redis.from_url(redis_url, decode_responses=True)
+        self.prefix = prefix
+
+    def add(self, provider: str, bucket: int, successes: int, failures: int, latency: float, ttl: int):
+        key = f"{self.prefix}:{provider}:stats:{bucket}"
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hincrby(key, "ok", successes)
+        pipe.hincrby(key, "fail", failures)
+        pipe.hincrbyfloat(key, "latency", latency)
+        pipe.expire(key, ttl)
+        pipe.execute()
+
+    def window(self, providers: List[str], buckets: List[int]) -> Dict[str, Stats]:
+        pipe = self.client.pipeline(transaction=False)
+        for provider in providers:
+            for bucket in buckets:
+                pipe.hgetall(f"{self.prefix}:{provider}:stats:{bucket}")
+        rows = iter(pipe.execute())
+        result = {}
+        for provider in providers:
+            ok = fail = 0
+            latency = 0.0
+            for _ in buckets:
+                row = next(rows)
+                ok += int(row.get("ok", 0))
+                fail += int(row.get("fail", 0))
+                latency += float(row.get("latency", 0.0))
+            result[provider] = (ok, fail, latency)
+        return result
+
+    def clear_window(self, provider: str):
+        keys = list(self.client.scan_iter(f"{self.prefix}:{provider}:stats:*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def circuits(self, providers: List[str]) -> Dict[str, Optional[float]]:
+        values = self.client.mget([f"{self.prefix}:{p}:circuit" for p in providers])
+        return {p: float(v) if v else None for p, v in zip(providers, values)}
+
+    def open_circuit(self, provider: str, opened_at: float):
+        self.client.set(f"{self.prefix}:{provider}:circuit", opened_at)
+
+    def close_circuit(self, provider: str):
+        self.client.delete(f"{self.prefix}:{provider}:circuit", f"{self.prefix}:{provider}:probe")
+
+    def try_probe(self, provider: str, ttl: float) -> bool:
+        return bool(self.client.set(f"{self.prefix}:{provider}:probe", 1, nx=True, px=int(ttl * 1000)))
+
+
+class ProviderRouter:
+    """
+    Orders alert providers by recent health, with a circuit breaker per provider.
+
+    Outcomes are counted in fixed time buckets over a sliding window. A
+    provider whose failure rate over at least `min_samples` attempts reaches
+    `failure_threshold` has its circuit opened and is skipped for `cooldown`
+    seconds. After that one caller gets to probe it (half-open); success
+    closes the circuit, failure re-opens it.
+
+    While every usable provider is healthy the configured order is kept, so
+    the primary takes all traffic. Otherwise traffic is spread by weights
+    favouring high success rates and low latency.
+    """
+
+    def __init__(
+        self,
+        store=None,
+        window_seconds: int = None,
+        bucket_seconds: int = 10,
+        min_samples: int = None,
+        failure_threshold: float = None,
+        healthy_success_rate: float = None,
+        cooldown: float = None,
+        rng: Optional[random.Random] = None,
+    ):
+        self.store = store or InMemoryHealthStore()
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = max(1, (window_seconds or settings.alert_router_window_seconds) // bucket_seconds)
+        self.min_samples = min_samples if min_samples is not None else settings.alert_router_min_samples
+        self.failure_threshold = failure_threshold if failure_threshold is not None \
+            else settings.alert_router_failure_threshold
+        self.healthy_success_rate = healthy_success_rate if healthy_success_rate is not None \
+            else settings.alert_router_healthy_success_rate
+        self.cooldown = cooldown if cooldown is not None else settings.alert_router_cooldown_seconds
+        self.rng = rng or random.Random()
+
+    def _buckets(self) -> List[int]:
+        current = int(time.time() // self.bucket_seconds)
+        return list(range(current - self.window_buckets + 1, current + 1))
+
+    def order(self, providers: List[str]) -> List[str]:
+        """
+        Providers to try, best first
+
+        Providers with an open circuit are left out unless every circuit is
+        open, in which case all are tried in configured order.
+        """
+        try:
+            circuits = self.store.circuits(providers)
+            stats = self.store.window(providers, self._buckets())
+        except Exception as e:
+            logger.warning(f"Provider health unavailable, using configured order: {str(e)}")
+            return list(providers)
+
+        now = time.time()
+        usable = []
+        for provider in providers:
+            opened_at = circuits[provider]
+            if opened_at is None:
+                usable.append(provider)
+            elif now - opened_at >= self.cooldown and self.store.try_probe(provider, self.cooldown):
+                logger.info(f"Probing {provider} after circuit cooldown")
+                usable.append(provider)
+        if not usable:
+            return list(providers)
+
+        if all(self._is_healthy(stats[p]) for p in usable):
+            return usable
+
+        weights = {p: self._weight(stats[p]) for p in usable}
+        first = self.rng.choices(usable, weights=[weights[p] for p in usable])[0]
+        return [first] + sorted((p for p in usable if p != first), key=lambda p: -weights[p])
+
+    def record(self, provider: str, latency: float, successes: int = 0, failures: int = 0):
+        """Record the outcome of one send (or batch) and trip/reset the circuit"""
+        try:
+            buckets = self._buckets()
+            self.store.add(provider, buckets[-1], successes, failures, latency,
+                           ttl=(self.window_buckets + 1) * self.bucket_seconds)
+
+            opened_at = self.store.circuits([provider])[provider]
+            if opened_at is not None:
+                if successes and not failures:
+                    # Half-open probe succeeded; forget the failures that tripped it
+                    self.store.close_circuit(provider)
+                    self.store.clear_window(provider)
+                    logger.info(f"Circuit closed for {provider}")
+                elif failures:
+                    self.store.open_circuit(provider, time.time())
+                return
+
+            if failures:
+                ok, fail, _ = self.store.window([provider], buckets)[provider]
+                if ok + fail >= self.min_samples and fail / (ok + fail) >= self.failure_threshold:
+                    self.store.open_circuit(provider, time.time())
+                    logger.warning(
+                        f"Circuit opened for {provider}: {fail}/{ok + fail} failures in the last "
+                        f"{self.window_buckets * self.bucket_seconds}s"
+                    )
+        except Exception as e:
+            logger.warning(f"Could not record provider health for {provider}: {str(e)}")
+
+    def health(self, providers: List[str]) -> Dict[str, Dict[str, object]]:
+        stats = self.store.window(providers, self._buckets())
+        circuits = self.store.circuits(providers)
+        return {
+            p: {
+                "samples": stats[p][0] + stats[p][1],
+                "success_rate": round(self._success_rate(stats[p]), 3),
+                "avg_latency_ms": round(1000 * self._latency(stats[p]), 1),
+                "circuit": "closed" if circuits[p] is None else "open",
+            }
+            for p in providers
+        }
+
+    def _is_healthy(self, stats: Stats) -> bool:
+        ok, fail, _ = stats
+        return ok + fail < self.min_samples or self._success_rate(stats) >= self.healthy_success_rate
+
+    def _success_rate(self, stats: Stats) -> float:
+        ok, fail, _ = stats
+        return ok / (ok + fail) if ok + fail else 1.0
+
+    def _latency(self, stats: Stats) -> float:
+        ok, fail, latency = stats
+        return latency / (ok + fail) if ok + fail else 0.0
+
+    def _weight(self, stats: Stats) -> float:
+        # Success rate dominates (a failed attempt costs a timeout plus a retry elsewhere);
+        # the 0.1 s latency floor keeps idle or very fast providers from taking everything
+        return max(self._success_rate(stats), 0.01) ** 4 / max(self._latency(stats), 0.1)
+
+
+_router: Optional[ProviderRouter] = None
+
+
+def get_provider_router() -> ProviderRouter:
+    """Process-wide router, backed by Redis when ALERT_ROUTER_BACKEND=redis"""
+    global _router
+    if _router is None:
+        store = None
+        if settings.alert_router_backend == "redis":
+            store = RedisHealthStore(settings.redis_url)
+        _router = ProviderRouter(store=store)
+    return _router
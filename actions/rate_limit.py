@@ -0,0 +1,195 @@
+"""
+Token-bucket rate limiting of outbound messages per provider and sender
+"""
+
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+import logging
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RateDecision:
+    granted: int
+    wait_seconds: float = 0.0
+    # True when the tokens were booked in advance and may be used after `wait_seconds`
+    reserved: bool = False
+
+
+def _take(tokens: float, elapsed: float, rate: float, capacity: int, requested: int,
+          partial: bool, max_debt: float) -> Tuple[float, RateDecision]:
+    """
+    One bucket step: refill for `elapsed` seconds, then try to take `requested` tokens
+
+    With `partial`, as many tokens as are available are granted and the wait is
+    until enough for the rest (up to one full burst) have refilled. With
+    `max_debt`, a request that can't be granted now may borrow up to that many
+    tokens, leaving the bucket negative; the caller must then wait until the
+    bucket is back at zero. Mirrored by TOKEN_BUCKET_LUA.
+    """
+    tokens = min(capacity, tokens + max(elapsed, 0.0) * rate)
+    granted = min(requested, int(max(tokens, 0.0))) if partial else (requested if tokens >= requested else 0)
+    tokens -= granted
+    if granted == requested:
+        return tokens, RateDecision(granted)
+
+    need = min(requested - granted, capacity) if partial else requested
+    wait = (need - tokens) / rate
+    if max_debt > 0 and not partial and tokens - requested >= -max_debt:
+        tokens -= requested
+        return tokens, RateDecision(requested, wait_seconds=-tokens / rate, reserved=True)
+    return tokens, RateDecision(granted, wait_seconds=wait)
+
+
+# Same arithmetic as _take, atomically on a Redis hash. Uses the Redis server
+# clock so workers with skewed clocks still share one bucket correctly.
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local partial = ARGV[4] == '1'
+local max_debt = tonumber(ARGV[5])
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+
+tokens = math.min(capacity, tokens + math.max(now - ts, 0) * rate)
+local granted = 0
+if partial then
+  granted = math.min(requested, math.floor(math.max(tokens, 0)))
+elseif tokens >= requested then
+  granted = requested
+end
+tokens = tokens - granted
+
+local wait = 0
+local reserved = 0
+if granted < requested then
+  local need = requested
+  if partial then need = math.min(requested - granted, capacity) end
+  wait = (need - tokens) / rate
+  if max_debt > 0 and not partial and tokens - requested >= -max_debt then
+    tokens = tokens - requested
+    granted = requested
+    reserved = 1
+    wait = -tokens / rate
+  end
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {granted, tostring(wait), reserved}
+"""
+
+
+class InMemoryBucketStore:
+    """Per-process buckets, for tests and single-worker deployments"""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, capacity: int, requested: int,
+             partial: bool, max_debt: float) -> RateDecision:
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens, decision = _take(tokens, now - updated, rate, capacity, requested, partial, max_debt)
+            self._buckets[key] = (tokens, now)
+            return decision
+
+
+class RedisBucketStore:
+    """Buckets shared by every worker, updated by one Lua script per request"""
+
+    def __init__(self, redis_url: str, prefix: str = "alerts:ratelimit"):
+        import redis
+
+        self.client = redis.Redis.from_url(redis_url, decode_responses=True)
+        self.prefix = prefix
+        self._script = self.client.register_script(TOKEN_BUCKET_LUA)
+
+    def take(self, key: str, rate: float, capacity: int, requested: int,
+             partial: bool, max_debt: float) -> RateDecision:
+        granted, wait, reserved = self._script(
+            keys=[f"{self.prefix}:{key}"],
+            args=[rate, capacity, requested, 1 if partial else 0, max_debt],
+        )
+        return RateDecision(int(granted), wait_seconds=float(wait), reserved=bool(reserved))
+
+
+class ProviderRateLimiter:
+    """
+    Send-rate limits per provider and sender (Twilio number, Gupshup account)
+
+    Each bucket refills at the provider's sustained rate up to its burst size.
+    Callers that are refused get the exact wait until tokens are available, so
+    tasks can be deferred with a matching countdown instead of hitting the
+    provider and retrying on 429s. If the bucket store is unreachable sends
+    are allowed rather than blocked.
+    """
+
+    def __init__(self, store=None, limits: Optional[Dict[str, Tuple[float, int]]] = None,
+                 max_reservation_seconds: float = None):
+        self.store = store or InMemoryBucketStore()
+        self.limits = limits if limits is not None else {
+            "twilio": (settings.twilio_sends_per_second, settings.twilio_send_burst),
+            "gupshup": (settings.gupshup_sends_per_second, settings.gupshup_send_burst),
+        }
+        self.max_reservation_seconds = max_reservation_seconds if max_reservation_seconds is not None \
+            else settings.rate_limit_max_reservation_seconds
+
+    def acquire(self, provider: str, sender: str, tokens: int = 1,
+                partial: bool = False, reserve: bool = False) -> RateDecision:
+        """
+        Take `tokens` sends from the provider/sender bucket
+
+        Args:
+            provider: Provider name, e.g. "twilio"
+            sender: Sending number or account the provider limits on
+            tokens: Messages about to be sent
+            partial: Grant as many as are available instead of all-or-nothing
+            reserve: Book the tokens ahead (up to max_reservation_seconds) when
+                they aren't available now; the caller sends after `wait_seconds`
+
+        Returns:
+            RateDecision with the tokens granted and, if short, the wait in seconds
+        """
+        limit = self.limits.get(provider)
+        if limit is None or tokens <= 0:
+            return RateDecision(tokens)
+        rate, burst = limit
+        max_debt = rate * self.max_reservation_seconds if reserve else 0.0
+        try:
+            return self.store.take(f"{provider}:{sender}", rate, burst, tokens, partial, max_debt)
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, allowing {provider} send: {str(e)}")
+            return RateDecision(tokens)
+
+
+def countdown(seconds: float) -> float:
+    """Task countdown for a rate-limit wait, rounded up to the next millisecond"""
+    return math.ceil(seconds * 1000) / 1000
+
+
+_limiter: Optional[ProviderRateLimiter] = None
+
+
+def get_rate_limiter() -> ProviderRateLimiter:
+    """Process-wide limiter, backed by Redis when RATE_LIMIT_BACKEND=redis"""
+    global _limiter
+    if _limiter is None:
+        store = None
+        if settings.rate_limit_backend == "redis":
+            store = RedisBucketStore(settings.redis_url)
+        _limiter = ProviderRateLimiter(store=store)
+    return _limiter
@@ -4,10 +4,12 @@ from .health_analysis import HealthAnalysisService
 from .vaccination import VaccinationService
 from .outbreak import OutbreakService
 from .language import LanguageService
+from .coverage import VaccinationCoverageService
 
 __all__ = [
     "HealthAnalysisService",
     "VaccinationService",
     "OutbreakService",
     "LanguageService",
+    "VaccinationCoverageService",
 ]
@@ -0,0 +1,223 @@
+"""
+Population vaccination coverage computed from per-user vaccine bitsets
+"""
+
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+from sqlalchemy import BigInteger, case, func, literal, select
+
+from config import settings
+from database import get_db, User, VaccinationRecord
+from .schedules import VACCINATION_SCHEDULES
+
+logger = logging.getLogger(__name__)
+
+# One bit per distinct vaccine name across all schedules
+VACCINE_NAMES: Tuple[str, ...] = tuple(sorted({
+    vaccine.name for schedule in VACCINATION_SCHEDULES.values() for vaccine in schedule.vaccines
+}))
+VACCINE_BITS: Dict[str, int] = {name.lower(): bit for bit, name in enumerate(VACCINE_NAMES)}
+AGE_GROUPS: Tuple[str, ...] = ("infant", "child", "adult", "senior")
+
+
+def vaccine_mask(names) -> int:
+    """Bitset of the known vaccines among `names` (case-insensitive)"""
+    mask = 0
+    for name in names:
+        bit = VACCINE_BITS.get(str(name).lower())
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+
+def mask_names(mask: int) -> List[str]:
+    return [name for bit, name in enumerate(VACCINE_NAMES) if mask >> bit & 1]
+
+
+REQUIRED_MASKS: Dict[str, int] = {
+    group: vaccine_mask(v.name for v in VACCINATION_SCHEDULES[group].vaccines) for group in AGE_GROUPS
+}
+
+_SNAPSHOT_KEY = "vaccination:coverage:snapshot"
+_local_snapshot: Dict[str, Any] = {}
+_refresh_lock: Optional[asyncio.Lock] = None  # created on first use, inside the serving loop
+
+
+class VaccinationCoverageService:
+    """Cohort coverage engine serving per-location coverage from a refreshed snapshot"""
+
+    def compute_snapshot(self) -> Dict[str, Any]:
+        """
+        Compute coverage for every location in one aggregated SQL pass
+
+        The database folds each user's records into a bitset with bit_or and
+        then counts users per (location, age group, bitset), so only distinct
+        cohorts come back. Missing doses are then evaluated for all cohorts at
+        once with numpy.
+        """
+        started = time.monotonic()
+        db = next(get_db())
+        try:
+            rows = db.execute(self._cohort_query()).all()
+        finally:
+            db.close()
+
+        snapshot = self._evaluate(rows)
+        snapshot["generated_at"] = datetime.utcnow().isoformat()
+        snapshot["duration_seconds"] = round(time.monotonic() - started, 3)
+        return snapshot
+
+    def _cohort_query(self):
+        bit_case = case(
+            *[
+                (func.lower(VaccinationRecord.vaccine_name) == name, literal(1 << bit, BigInteger))
+                for name, bit in VACCINE_BITS.items()
+            ],
+            else_=literal(0, BigInteger)
+        )
+        age_group = case(
+            (User.age < 1, "infant"),
+            (User.age < 18, "child"),
+            (User.age < 65, "adult"),
+            (User.age >= 65, "senior"),
+            else_="adult"
+        )
+        per_user = (
+            select(
+                func.coalesce(User.location, "Unknown").label("location"),
+                age_group.label("age_group"),
+                func.coalesce(func.bit_or(bit_case), 0).label("mask")
+            )
+            .select_from(User)
+            .outerjoin(VaccinationRecord, VaccinationRecord.user_id == User.id)
+            .where(User.is_active.is_(True))
+            .group_by(User.id, User.location, User.age)
+            .subquery()
+        )
+        return (
+            select(per_user.c.location, per_user.c.age_group, per_user.c.mask, func.count().label("users"))
+            .group_by(per_user.c.location, per_user.c.age_group, per_user.c.mask)
+        )
+
+    def _evaluate(self, rows) -> Dict[str, Any]:
+        """Vectorized evaluation of cohort rows (location, age_group, mask, users)"""
+        if not rows:
+            return {"locations": {}}
+
+        locations = sorted({row[0] for row in rows})
+        location_index = {name: i for i, name in enumerate(locations)}
+        group_index = {name: i for i, name in enumerate(AGE_GROUPS)}
+
+        loc = np.fromiter((location_index[r[0]] for r in rows), dtype=np.int64, count=len(rows))
+        group = np.fromiter((group_index.get(r[1], group_index["adult"]) for r in rows), dtype=np.int64, count=len(rows))
+        mask = np.fromiter((int(r[2] or 0) for r in rows), dtype=np.int64, count=len(rows))
+        users = np.fromiter((int(r[3]) for r in rows), dtype=np.float64, count=len(rows))
+
+        required = np.array([REQUIRED_MASKS[g] for g in AGE_GROUPS], dtype=np.int64)[group]
+        bits = np.arange(len(VACCINE_NAMES), dtype=np.int64)
+        have = (mask[:, None] >> bits) & 1
+        eligible = (required[:, None] >> bits) & 1
+        covered = have & eligible
+
+        n_loc = len(locations)
+        population = np.bincount(loc, weights=users, minlength=n_loc)
+        fully = np.bincount(loc, weights=users * ((required & ~mask) == 0), minlength=n_loc)
+        completion = covered.sum(axis=1) / np.maximum(eligible.sum(axis=1), 1)
+        completion_sum = np.bincount(loc, weights=users * completion, minlength=n_loc)
+
+        # Per location x vaccine sums of eligible and covered users
+        eligible_users = np.zeros((n_loc, len(bits)))
+        covered_users = np.zeros((n_loc, len(bits)))
+        np.add.at(eligible_users, loc, eligible * users[:, None])
+        np.add.at(covered_users, loc, covered * users[:, None])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            vaccine_pct = np.where(eligible_users > 0, 100.0 * covered_users / eligible_users, np.nan)
+
+        result = {}
+        for i, name in enumerate(locations):
+            result[name] = {
+                "population": int(population[i]),
+                "fully_vaccinated_pct": round(100.0 * fully[i] / population[i], 2),
+                "mean_completion_pct": round(100.0 * completion_sum[i] / population[i], 2),
+                "vaccines": {
+                    VACCINE_NAMES[b]: round(float(vaccine_pct[i, b]), 2)
+                    for b in bits if not np.isnan(vaccine_pct[i, b])
+                },
+            }
+        return {"locations": result}
+
+    def refresh_snapshot(self) -> Dict[str, Any]:
+        """Recompute the snapshot and publish it for all API processes"""
+        snapshot = self.compute_snapshot()
+        _local_snapshot.update(snapshot=snapshot, loaded_at=time.monotonic())
+        try:
+            import redis
+
+            client = redis.Redis.from_url(settings.redis_url)
+            client.set(_SNAPSHOT_KEY, json.dumps(snapshot), ex=settings.coverage_snapshot_refresh_seconds * 3)
+        except Exception as e:
+            logger.warning(f"Could not publish coverage snapshot to Redis: {str(e)}")
+        return snapshot
+
+    async def get_snapshot(self) -> Dict[str, Any]:
+        """
+        Latest snapshot: process memo, then Redis, then a fresh computation
+
+        Only one request per process computes at a time. Requests that miss
+        while it runs get the stale snapshot if there is one, otherwise they
+        wait for the computation instead of starting their own.
+        """
+        global _refresh_lock
+        snapshot = self._fresh_local_snapshot()
+        if snapshot is not None:
+            return snapshot
+
+        try:
+            import redis.asyncio as aioredis
+
+            client = aioredis.from_url(settings.redis_url)
+            try:
+                raw = await client.get(_SNAPSHOT_KEY)
+            finally:
+                await client.aclose()
+            if raw:
+                snapshot = json.loads(raw)
+                _local_snapshot.update(snapshot=snapshot, loaded_at=time.monotonic())
+                return snapshot
+        except Exception as e:
+            logger.warning(f"Could not load coverage snapshot from Redis: {str(e)}")
+
+        if _refresh_lock is None:
+            _refresh_lock = asyncio.Lock()
+        if _refresh_lock.locked() and "snapshot" in _local_snapshot:
+            return _local_snapshot["snapshot"]
+        async with _refresh_lock:
+            snapshot = self._fresh_local_snapshot()  # refreshed while we waited
+            if snapshot is not None:
+                return snapshot
+            return await asyncio.to_thread(self.refresh_snapshot)
+
+    def _fresh_local_snapshot(self) -> Optional[Dict[str, Any]]:
+        loaded_at = _local_snapshot.get("loaded_at")
+        if loaded_at is not None and time.monotonic() - loaded_at < settings.coverage_snapshot_refresh_seconds:
+            return _local_snapshot["snapshot"]
+        return None
+
+    async def get_location_coverage(self, location: Optional[str] = None) -> Dict[str, Any]:
+        """Coverage percentages for one location, or all locations"""
+        try:
+            snapshot = await self.get_snapshot()
+            locations = snapshot.get("locations", {})
+            if location:
+                wanted = location.strip().lower()
+                locations = {k: v for k, v in locations.items() if k.lower() == wanted}
+            return {"generated_at": snapshot.get("generated_at"), "locations": locations}
+        except Exception as e:
+            logger.error(f"Error getting vaccination coverage: {str(e)}")
+            return {"generated_at": None, "locations": {}, "error": str(e)}
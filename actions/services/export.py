@@ -0,0 +1,227 @@
+"""
+Streaming analytics export of symptom reports and outbreak alerts
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import logging
+
+from sqlalchemy import Boolean, DateTime, Integer, select, tuple_
+
+from config import settings
+from database import engine, OutbreakAlert, SymptomReport
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet is optional; CSV export still works
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_TABLES = {
+    "symptom_reports": SymptomReport,
+    "outbreak_alerts": OutbreakAlert,
+}
+
+
+def _arrow_type(column):
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    return pa.string()
+
+
+def _plain(value):
+    """Flatten a column value for columnar/CSV output"""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+class _CsvPartWriter:
+    def __init__(self, path: str, columns: List[str]):
+        self._file = gzip.open(path, "wt", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, rows: List[Tuple]):
+        self._writer.writerows(
+            [[v.isoformat() if isinstance(v, datetime) else v for v in row] for row in rows]
+        )
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetPartWriter:
+    def __init__(self, path: str, schema):
+        self._schema = schema
+        self._writer = pq.ParquetWriter(path, schema, compression="zstd")
+
+    def write(self, rows: List[Tuple]):
+        columns = list(zip(*rows))
+        self._writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, self._schema)],
+            schema=self._schema
+        ))
+
+    def close(self):
+        self._writer.close()
+
+
+class DataExportService:
+    """
+    Exports time-partitioned tables to month-partitioned Parquet or CSV files
+
+    Rows are read in created_at order through a server-side cursor and written
+    one batch at a time, so memory use is bounded by the batch size whatever the
+    table size. Output goes to <output_dir>/<table>/month=YYYY-MM/. A per-table
+    watermark of the last published (created_at, id) makes each run incremental;
+    it advances with every part file, so a failed run resumes after its last part.
+    """
+
+    def __init__(self, output_dir: Optional[str] = None, file_format: Optional[str] = None):
+        self.output_dir = output_dir or settings.export_dir
+        self.format = (file_format or settings.export_format).lower()
+        if self.format == "parquet" and pa is None:
+            logger.warning("pyarrow is not installed; exporting gzip CSV instead of Parquet")
+            self.format = "csv"
+        self.batch_size = settings.export_batch_size
+
+    def export_all(self, full: bool = False) -> Dict[str, Dict[str, Any]]:
+        return {table: self.export_table(table, full=full) for table in EXPORT_TABLES}
+
+    def export_table(self, table: str, full: bool = False) -> Dict[str, Any]:
+        """
+        Export rows created since the table's watermark (or all rows if `full`)
+
+        Returns:
+            Dict with rows exported, files written and the new watermark
+        """
+        model = EXPORT_TABLES[table]
+        columns = [c for c in model.__table__.columns]
+        table_dir = os.path.join(self.output_dir, table)
+        os.makedirs(table_dir, exist_ok=True)
+
+        watermark = None if full else self._load_watermark(table_dir)
+        # Leave recent rows for the next run so in-flight transactions can't be skipped
+        upper = datetime.utcnow() - timedelta(seconds=settings.export_settle_seconds)
+
+        query = select(*columns).where(model.created_at < upper).order_by(model.created_at, model.id)
+        if watermark is not None:
+            query = query.where(tuple_(model.created_at, model.id) > watermark)
+
+        run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        files, rows_exported, last_key = [], 0, watermark
+        writer, month, pending_path = None, None, None
+        try:
+            for batch in self._stream(query):
+                for batch_month, rows in self._split_by_month(batch):
+                    if batch_month != month:
+                        if writer is not None:
+                            writer.close()
+                            writer = None
+                            files.append(self._publish(table_dir, pending_path, last_key))
+                        month = batch_month
+                        pending_path = self._part_path(table_dir, month, run_id)
+                        writer = self._open_writer(pending_path + ".tmp", columns)
+                    writer.write([tuple(_plain(v) for v in row) for row in rows])
+                    rows_exported += len(rows)
+                    last_key = (rows[-1].created_at, rows[-1].id)
+            if writer is not None:
+                writer.close()
+                writer = None
+                files.append(self._publish(table_dir, pending_path, last_key))
+        finally:
+            if writer is not None:
+                writer.close()
+                os.remove(pending_path + ".tmp")
+
+        logger.info(f"Exported {rows_exported} {table} rows to {len(files)} {self.format} files")
+        return {
+            "rows": rows_exported,
+            "files": files,
+            "watermark": last_key[0].isoformat() if last_key else None,
+        }
+
+    def _stream(self, query) -> Iterator[List[Any]]:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=self.batch_size).execute(query)
+            for batch in result.partitions(self.batch_size):
+                yield batch
+
+    def _split_by_month(self, batch):
+        for month, rows in groupby(batch, key=lambda row: row.created_at.strftime("%Y-%m")):
+            yield month, list(rows)
+
+    def _part_path(self, table_dir: str, month: str, run_id: str) -> str:
+        month_dir = os.path.join(table_dir, f"month={month}")
+        os.makedirs(month_dir, exist_ok=True)
+        extension = "parquet" if self.format == "parquet" else "csv.gz"
+        return os.path.join(month_dir, f"part-{run_id}.{extension}")
+
+    def _open_writer(self, path: str, columns):
+        if self.format == "parquet":
+            schema = pa.schema([(c.name, _arrow_type(c)) for c in columns])
+            return _ParquetPartWriter(path, schema)
+        return _CsvPartWriter(path, [c.name for c in columns])
+
+    def _publish(self, table_dir: str, path: str, last_key: Tuple[datetime, Any]) -> str:
+        """
+        Move a finished part into place and advance the watermark past its rows
+
+        Doing both per part means a run that fails later never leaves published
+        rows behind the watermark, so the next run doesn't export them again.
+        """
+        os.replace(path + ".tmp", path)
+        self._store_watermark(table_dir, last_key)
+        return path
+
+    def _load_watermark(self, table_dir: str) -> Optional[Tuple[datetime, uuid.UUID]]:
+        path = os.path.join(table_dir, "_watermark.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            data = json.load(f)
+        return datetime.fromisoformat(data["created_at"]), uuid.UUID(data["id"])
+
+    def _store_watermark(self, table_dir: str, key: Tuple[datetime, Any]):
+        path = os.path.join(table_dir, "_watermark.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump({"created_at": key[0].isoformat(), "id": str(key[1])}, f)
+        os.replace(path + ".tmp", path)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Export symptom and outbreak data for analytics")
+    parser.add_argument("--table", choices=sorted(EXPORT_TABLES), help="Export one table (default: all)")
+    parser.add_argument("--format", choices=["parquet", "csv"], help="Output format (default: EXPORT_FORMAT)")
+    parser.add_argument("--output", help="Output directory (default: EXPORT_DIR)")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and export everything (use an empty output directory)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    service = DataExportService(output_dir=args.output, file_format=args.format)
+    if args.table:
+        result = {args.table: service.export_table(args.table, full=args.full)}
+    else:
+        result = service.export_all(full=args.full)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,8 @@ from datetime import datetime
 import logging
 
 from config import settings
-from database import get_db, SymptomReport, User
+from database import AsyncSessionLocal, SymptomReport, User
+from .surveillance import get_spike_detector
 
 logger = logging.getLogger(__name__)
 
@@ -125,7 +126,7 @@ class HealthAnalysisService:
             is_emergency = self._check_emergency_conditions(symptoms, emergency_indicators)
             
             # Store analysis in database
-            await self._store_analysis(symptoms, overall_severity, recommendation, analysis_results)
+            await self._store_analysis(symptoms, overall_severity, recommendation, analysis_results, location)
             
             return {
                 "severity": overall_severity,
@@ -251,24 +252,25 @@ class HealthAnalysisService:
         symptoms: List[str], 
         severity: str, 
         recommendation: str, 
-        detailed_analysis: List[Dict]
+        detailed_analysis: List[Dict],
+        location: Optional[str] = None
     ):
-        """Store analysis results in database"""
+        """Store analysis results in database and feed the spike detector"""
         try:
-            db = next(get_db())
-            
-            symptom_report = SymptomReport(
-                symptoms=symptoms,
-                severity=severity,
-                analysis_result=recommendation,
-                recommendation=recommendation
-            )
+            async with AsyncSessionLocal() as db:
+                symptom_report = SymptomReport(
+                    symptoms=symptoms,
+                    severity=severity,
+                    analysis_result=recommendation,
+                    recommendation=recommendation,
+                    location=location
+                )
+                
+                db.add(symptom_report)
+                await db.commit()
             
-            db.add(symptom_report)
-            db.commit()
+            if settings.spike_detection_enabled:
+                await get_spike_detector().observe_report(location, symptoms)
             
         except Exception as e:
             logger.error(f"Error storing analysis: {str(e)}")
-            db.rollback()
-        finally:
-            db.close()
@@ -0,0 +1,209 @@
+"""
+Database maintenance: partition upkeep and data retention
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from sqlalchemy import text
+
+from config import settings
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+# Range-partitioned by month on created_at (migrations/004_indexes_and_partitions.sql)
+PARTITIONED_TABLES = ("symptom_reports", "outbreak_alerts")
+
+
+class PartitionMaintenanceService:
+    """Keeps monthly partitions created ahead of incoming rows"""
+
+    def ensure_partitions(self) -> Dict[str, int]:
+        """
+        Create any missing monthly partitions up to the configured horizon
+
+        Returns:
+            Dict of table name to number of partitions created
+        """
+        created = {}
+        with engine.begin() as conn:
+            for table in PARTITIONED_TABLES:
+                created[table] = conn.execute(
+                    text("SELECT ensure_monthly_partitions(:parent, :months_ahead)"),
+                    {"parent": table, "months_ahead": settings.partition_months_ahead}
+                ).scalar_one()
+        if any(created.values()):
+            logger.info(f"Created monthly partitions: {created}")
+        return created
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """Raw rows older than `keep_days` are rolled up by `rollup_sql` and removed"""
+
+    table: str
+    keep_days: int
+    # Statements reading the expiring rows from {source}
+    rollup_sql: Tuple[str, ...]
+
+
+SYMPTOM_REPORT_ROLLUP = (
+    """
+    INSERT INTO symptom_report_daily (day, location, severity, reports)
+    SELECT created_at::date, COALESCE(location, 'Unknown'), COALESCE(severity, 'unknown'), count(*)
+    FROM {source} GROUP BY 1, 2, 3
+    ON CONFLICT (day, location, severity)
+    DO UPDATE SET reports = symptom_report_daily.reports + EXCLUDED.reports
+    """,
+    """
+    INSERT INTO symptom_daily (day, location, symptom, mentions)
+    SELECT created_at::date, COALESCE(location, 'Unknown'), left(lower(s.symptom), 100), count(*)
+    FROM {source},
+         jsonb_array_elements_text(CASE WHEN jsonb_typeof(symptoms) = 'array' THEN symptoms ELSE '[]' END) AS s(symptom)
+    GROUP BY 1, 2, 3
+    ON CONFLICT (day, location, symptom)
+    DO UPDATE SET mentions = symptom_daily.mentions + EXCLUDED.mentions
+    """,
+)
+
+OUTBREAK_ALERT_ROLLUP = (
+    """
+    INSERT INTO outbreak_alert_monthly (month, location, disease_name, severity_level, verified, alerts, cases)
+    SELECT date_trunc('month', created_at)::date, COALESCE(location, 'Unknown'), COALESCE(disease_name, 'Unknown'),
+           COALESCE(severity_level, 'moderate'), COALESCE(verified, false), count(*), COALESCE(sum(cases_count), 0)
+    FROM {source} GROUP BY 1, 2, 3, 4, 5
+    ON CONFLICT (month, location, disease_name, severity_level, verified)
+    DO UPDATE SET alerts = outbreak_alert_monthly.alerts + EXCLUDED.alerts,
+                  cases = outbreak_alert_monthly.cases + EXCLUDED.cases
+    """,
+)
+
+
+def retention_policies() -> List[RetentionPolicy]:
+    return [
+        RetentionPolicy("symptom_reports", settings.retention_symptom_reports_days, SYMPTOM_REPORT_ROLLUP),
+        RetentionPolicy("outbreak_alerts", settings.retention_outbreak_alerts_days, OUTBREAK_ALERT_ROLLUP),
+    ]
+
+
+def expired_partitions(table: str, partitions: List[str], cutoff: datetime) -> List[str]:
+    """Monthly partitions (<table>_pYYYYMM) whose whole range is older than `cutoff`"""
+    expired = []
+    for name in partitions:
+        suffix = name[len(table) + 2:] if name.startswith(f"{table}_p") else ""
+        if len(suffix) != 6 or not suffix.isdigit():
+            continue  # default partition or foreign naming
+        year, month = int(suffix[:4]), int(suffix[4:])
+        upper = datetime(year + month // 12, month % 12 + 1, 1)
+        if upper <= cutoff:
+            expired.append(name)
+    return sorted(expired)
+
+
+class RetentionService:
+    """
+    Applies retention policies: roll up, then remove expired raw rows
+
+    Whole expired monthly partitions are rolled up, detached and dropped,
+    which frees their space immediately without touching live data. Anything
+    left (default partition, unpartitioned tables) is deleted in small batches,
+    each rolled up and deleted in its own short transaction so no long locks are
+    held, then the table is vacuumed so the space is reusable.
+    """
+
+    def __init__(self, policies: Optional[List[RetentionPolicy]] = None):
+        self.policies = policies or retention_policies()
+        self.batch_size = settings.retention_batch_size
+
+    def apply(self, now: Optional[datetime] = None) -> Dict[str, Dict[str, Any]]:
+        now = now or datetime.utcnow()
+        report = {}
+        for policy in self.policies:
+            try:
+                report[policy.table] = self._apply_policy(policy, now - timedelta(days=policy.keep_days))
+            except Exception as e:
+                logger.error(f"Error applying retention to {policy.table}: {str(e)}")
+                report[policy.table] = {"error": str(e)}
+        return report
+
+    def _apply_policy(self, policy: RetentionPolicy, cutoff: datetime) -> Dict[str, Any]:
+        started = time.monotonic()
+        bytes_before = self._table_bytes(policy.table)
+
+        dropped = []
+        for partition in expired_partitions(policy.table, self._partitions(policy.table), cutoff):
+            self._drop_partition(policy, partition)
+            dropped.append(partition)
+
+        deleted = 0
+        while True:
+            batch = self._delete_batch(policy, cutoff)
+            deleted += batch
+            if batch < self.batch_size:
+                break
+            time.sleep(settings.retention_batch_pause_seconds)
+        if deleted:
+            self._vacuum(policy.table)
+
+        bytes_after = self._table_bytes(policy.table)
+        result = {
+            "cutoff": cutoff.isoformat(),
+            "partitions_dropped": dropped,
+            "rows_deleted": deleted,
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+            "reclaimed_bytes": max(bytes_before - bytes_after, 0),
+            "duration_seconds": round(time.monotonic() - started, 3),
+        }
+        logger.info(f"Retention {policy.table}: {result}")
+        return result
+
+    def _partitions(self, table: str) -> List[str]:
+        with engine.connect() as conn:
+            return list(conn.execute(text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(:table)"
+            ), {"table": table}).scalars())
+
+    def _table_bytes(self, table: str) -> int:
+        with engine.connect() as conn:
+            return int(conn.execute(text(
+                "SELECT COALESCE(sum(pg_total_relation_size(relid)), 0) FROM pg_partition_tree(to_regclass(:table))"
+            ), {"table": table}).scalar_one())
+
+    def _drop_partition(self, policy: RetentionPolicy, partition: str):
+        # Partition names come from pg_catalog and match <table>_pYYYYMM
+        with engine.begin() as conn:
+            for statement in policy.rollup_sql:
+                conn.execute(text(statement.format(source=f'"{partition}"')))
+            conn.execute(text(f'ALTER TABLE "{policy.table}" DETACH PARTITION "{partition}"'))
+            conn.execute(text(f'DROP TABLE "{partition}"'))
+
+    def _delete_batch(self, policy: RetentionPolicy, cutoff: datetime) -> int:
+        with engine.begin() as conn:
+            conn.execute(text(
+                f'CREATE TEMP TABLE retention_batch (LIKE "{policy.table}") ON COMMIT DROP'
+            ))
+            deleted = conn.execute(text(f"""
+                WITH doomed AS (
+                    DELETE FROM "{policy.table}"
+                    WHERE (id, created_at) IN (
+                        SELECT id, created_at FROM "{policy.table}"
+                        WHERE created_at < :cutoff
+                        LIMIT :batch_size
+                    )
+                    RETURNING *
+                )
+                INSERT INTO retention_batch SELECT * FROM doomed
+            """), {"cutoff": cutoff, "batch_size": self.batch_size}).rowcount
+            for statement in policy.rollup_sql:
+                conn.execute(text(statement.format(source="retention_batch")))
+        return deleted
+
+    def _vacuum(self, table: str):
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f'VACUUM (ANALYZE) "{table}"'))
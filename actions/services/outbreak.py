@@ -4,13 +4,16 @@ Outbreak Service for government API integration and real-time alerts
 
 import asyncio
 from typing import Dict, Any, Optional, List
-import httpx
 from datetime import datetime, timedelta
 import logging
 
 from config import settings
-from database import get_db, OutbreakAlert
+from celery import signature
+from sqlalchemy import func, select
+
+from database import AsyncSessionLocal, OutbreakAlert, User, read_session
 from auth import generate_hmac_signature
+from async_runtime import shared_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -61,19 +64,19 @@ class OutbreakService:
     async def _check_mofhw_outbreaks(self, location: Optional[str]) -> List[Dict[str, Any]]:
         """Check MOFHW database for outbreaks"""
         try:
-            async with httpx.AsyncClient() as client:
-                url = f"{settings.mofhw_base_url}/outbreaks"
-                headers = {
-                    "Authorization": f"Bearer {settings.mofhw_api_key}",
-                    "Content-Type": "application/json"
-                }
-                params = {"location": location} if location else {}
+            client = shared_http_client()
+            url = f"{settings.mofhw_base_url}/outbreaks"
+            headers = {
+                "Authorization": f"Bearer {settings.mofhw_api_key}",
+                "Content-Type": "application/json"
+            }
+            params = {"location": location} if location else {}
                 
-                response = await client.get(url, headers=headers, params=params, timeout=10)
+            response = await client.get(url, headers=headers, params=params, timeout=10)
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    return self._parse_mofhw_data(data)
+            if response.status_code == 200:
+                data = response.json()
+                return self._parse_mofhw_data(data)
                 
         except Exception as e:
             logger.error(f"Error checking MOFHW outbreaks: {str(e)}")
@@ -83,19 +86,19 @@ class OutbreakService:
     async def _check_idsp_outbreaks(self, location: Optional[str]) -> List[Dict[str, Any]]:
         """Check IDSP database for outbreaks"""
         try:
-            async with httpx.AsyncClient() as client:
-                url = f"{settings.idsp_base_url}/outbreaks"
-                headers = {
-                    "Authorization": f"Bearer {settings.idsp_api_key}",
-                    "Content-Type": "application/json"
-                }
-                params = {"location": location} if location else {}
+            client = shared_http_client()
+            url = f"{settings.idsp_base_url}/outbreaks"
+            headers = {
+                "Authorization": f"Bearer {settings.idsp_api_key}",
+                "Content-Type": "application/json"
+            }
+            params = {"location": location} if location else {}
                 
-                response = await client.get(url, headers=headers, params=params, timeout=10)
+            response = await client.get(url, headers=headers, params=params, timeout=10)
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    return self._parse_idsp_data(data)
+            if response.status_code == 200:
+                data = response.json()
+                return self._parse_idsp_data(data)
                 
         except Exception as e:
             logger.error(f"Error checking IDSP outbreaks: {str(e)}")
@@ -105,17 +108,16 @@ class OutbreakService:
     async def _check_local_outbreaks(self, location: Optional[str]) -> List[Dict[str, Any]]:
         """Check local database for recent outbreak alerts"""
         try:
-            db = next(get_db())
-            
-            query = db.query(OutbreakAlert).filter(
+            query = select(OutbreakAlert).where(
                 OutbreakAlert.verified == True,
                 OutbreakAlert.created_at >= datetime.utcnow() - timedelta(days=30)
             )
             
             if location:
-                query = query.filter(OutbreakAlert.location.ilike(f"%{location}%"))
+                query = query.where(OutbreakAlert.location.ilike(f"%{location}%"))
             
-            alerts = query.all()
+            async with read_session() as db:
+                alerts = (await db.execute(query)).scalars().all()
             
             return [
                 {
@@ -134,8 +136,6 @@ class OutbreakService:
         except Exception as e:
             logger.error(f"Error checking local outbreaks: {str(e)}")
             return []
-        finally:
-            db.close()
     
     def _parse_mofhw_data(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Parse MOFHW API response"""
@@ -198,11 +198,19 @@ class OutbreakService:
         }
         return severity_scores.get(severity.lower(), 2)
     
-    async def process_outbreak_alert(self, alert_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Process incoming outbreak alert from government systems"""
+    async def process_outbreak_alert(self, alert_data: Dict[str, Any], verified: bool = True) -> Dict[str, Any]:
+        """
+        Process an outbreak alert
+        
+        Args:
+            alert_data: Alert payload
+            verified: False for internal candidate alerts (e.g. symptom spikes),
+                which are stored for review without notifying users
+        
+        Returns:
+            Dict with processing result
+        """
         try:
-            db = next(get_db())
-            
             # Create outbreak alert record
             outbreak_alert = OutbreakAlert(
                 disease_name=alert_data.get("disease_name", "Unknown"),
@@ -212,14 +220,16 @@ class OutbreakService:
                 alert_message=alert_data.get("alert_message", ""),
                 precautions=alert_data.get("precautions", []),
                 source=alert_data.get("source", "Government"),
-                verified=True
+                verified=verified
             )
             
-            db.add(outbreak_alert)
-            db.commit()
+            async with AsyncSessionLocal() as db:
+                db.add(outbreak_alert)
+                await db.commit()
             
             # Trigger notifications to users in affected area
-            await self._notify_users_in_area(outbreak_alert.location, outbreak_alert)
+            if verified:
+                await self._notify_users_in_area(outbreak_alert.location, outbreak_alert)
             
             return {
                 "success": True,
@@ -229,63 +239,74 @@ class OutbreakService:
             
         except Exception as e:
             logger.error(f"Error processing outbreak alert: {str(e)}")
-            db.rollback()
             return {
                 "success": False,
                 "error": str(e)
             }
-        finally:
-            db.close()
     
     async def _notify_users_in_area(self, location: str, alert: OutbreakAlert):
-        """Notify users in the affected area about the outbreak"""
+        """Fan the alert out to active users in the area as bulk alert tasks"""
         try:
-            # This would integrate with notification services
-            # For now, we'll just log the notification
-            logger.info(f"Notifying users in {location} about {alert.disease_name} outbreak")
+            message = self._format_alert_message(alert)
+            chunk_size = settings.bulk_alert_chunk_size
+            recipients = tasks = 0
+            last_id = None
             
-            # In a real implementation, this would:
-            # 1. Query users in the affected area
-            # 2. Send WhatsApp/SMS notifications
-            # 3. Update user dashboards
-            # 4. Trigger push notifications
+            while True:
+                query = select(User.id, User.phone_number).where(
+                    User.is_active.is_(True),
+                    User.location == location,
+                    User.phone_number.isnot(None)
+                ).order_by(User.id).limit(chunk_size)
+                if last_id is not None:
+                    query = query.where(User.id > last_id)
+                
+                async with read_session() as db:
+                    rows = (await db.execute(query)).all()
+                if not rows:
+                    break
+                
+                bulk_alert = signature(
+                    "actions.send_bulk_alert_task",
+                    args=([r.phone_number for r in rows], message),
+                    kwargs={"idempotency_key": f"outbreak:{alert.id}"}
+                )
+                await asyncio.to_thread(bulk_alert.apply_async)
+                recipients += len(rows)
+                tasks += 1
+                last_id = rows[-1].id
+                if len(rows) < chunk_size:
+                    break
+            
+            logger.info(f"Notifying {recipients} users in {location} about {alert.disease_name} outbreak ({tasks} bulk tasks)")
             
         except Exception as e:
             logger.error(f"Error notifying users: {str(e)}")
     
+    def _format_alert_message(self, alert: OutbreakAlert) -> str:
+        message = f"Health alert for {alert.location}: {alert.disease_name} outbreak ({alert.severity_level})."
+        if alert.alert_message:
+            message += f" {alert.alert_message}"
+        if alert.precautions:
+            message += " Precautions: " + "; ".join(str(p) for p in alert.precautions[:3])
+        return message
+    
     async def get_outbreak_statistics(self, days: int = 30) -> Dict[str, Any]:
         """Get outbreak statistics for the specified period"""
         try:
-            db = next(get_db())
-            
             start_date = datetime.utcnow() - timedelta(days=days)
             
-            # Get outbreak counts by disease
-            disease_counts = db.query(
-                OutbreakAlert.disease_name,
-                db.func.count(OutbreakAlert.id)
-            ).filter(
-                OutbreakAlert.created_at >= start_date,
-                OutbreakAlert.verified == True
-            ).group_by(OutbreakAlert.disease_name).all()
-            
-            # Get outbreak counts by location
-            location_counts = db.query(
-                OutbreakAlert.location,
-                db.func.count(OutbreakAlert.id)
-            ).filter(
-                OutbreakAlert.created_at >= start_date,
-                OutbreakAlert.verified == True
-            ).group_by(OutbreakAlert.location).all()
+            def counts_by(column):
+                return select(column, func.count(OutbreakAlert.id)).where(
+                    OutbreakAlert.created_at >= start_date,
+                    OutbreakAlert.verified == True
+                ).group_by(column)
             
-            # Get severity distribution
-            severity_counts = db.query(
-                OutbreakAlert.severity_level,
-                db.func.count(OutbreakAlert.id)
-            ).filter(
-                OutbreakAlert.created_at >= start_date,
-                OutbreakAlert.verified == True
-            ).group_by(OutbreakAlert.severity_level).all()
+            async with read_session() as db:
+                # Get outbreak counts by disease, location and severity
+                disease_counts = (await db.execute(counts_by(OutbreakAlert.disease_name))).all()
+                location_counts = (await db.execute(counts_by(OutbreakAlert.location))).all()
+                severity_counts = (await db.execute(counts_by(OutbreakAlert.severity_level))).all()
             
             return {
                 "period_days": days,
@@ -306,5 +327,3 @@ class OutbreakService:
                 "severity_distribution": {},
                 "error": str(e)
             }
-        finally:
-            db.close()
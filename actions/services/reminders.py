@@ -0,0 +1,159 @@
+"""
+Vaccination reminder scheduler: range scans of due dates in time buckets
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import logging
+
+from celery import group, signature
+from sqlalchemy import select, tuple_
+
+from config import settings
+from database import get_db, User, VaccinationRecord
+
+logger = logging.getLogger(__name__)
+
+_WATERMARK_KEY = "reminders:vaccination:watermark"
+_ENQUEUED_PREFIX = "reminders:vaccination:enqueued"
+
+
+class VaccinationReminderService:
+    """
+    Enqueues reminders for vaccination records that fall due soon.
+
+    Due dates are scanned in fixed time buckets through the index on
+    `vaccination_records.next_due_date`. A Redis watermark records the last
+    fully processed bucket, so missed runs are caught up on the next run.
+    Records can be written after their bucket was scanned (a next dose due
+    within the lead time, a backfill, a dose that is already overdue), so each
+    run also rescans from one lead time before now up to the watermark.
+    Per-reminder marks in Redis keep rescanned records from being enqueued twice.
+    """
+
+    def __init__(self, redis_client=None):
+        self.bucket = timedelta(minutes=settings.reminder_bucket_minutes)
+        self.lead = timedelta(hours=settings.reminder_lead_hours)
+        self.batch_size = settings.reminder_batch_size
+        self._redis = redis_client
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            import redis
+
+            self._redis = redis.Redis.from_url(settings.redis_url, decode_responses=True)
+        return self._redis
+
+    def scan(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Enqueue reminders for every complete bucket up to now + lead time
+
+        Returns:
+            Dict with the number of buckets scanned and reminders enqueued
+        """
+        now = now or datetime.utcnow()
+        horizon = self._bucket_start(now + self.lead)
+
+        watermark = self._load_watermark()
+        if watermark is None:
+            watermark = self._bucket_start(now)
+        # Don't let a long outage turn into an unbounded catch-up in one run
+        watermark = max(watermark, horizon - self.bucket * settings.reminder_max_catch_up_buckets)
+
+        # Late writes below the watermark; only reminders not enqueued before go out
+        rescan_from = self._bucket_start(now - self.lead)
+        enqueued = self._scan_bucket(rescan_from, watermark) if rescan_from < watermark else 0
+
+        buckets = 0
+        while watermark < horizon:
+            enqueued += self._scan_bucket(watermark, watermark + self.bucket)
+            watermark += self.bucket
+            buckets += 1
+            self._store_watermark(watermark)
+
+        logger.info(f"Vaccination reminder scan: {buckets} buckets, {enqueued} reminders enqueued")
+        return {"buckets": buckets, "enqueued": enqueued, "watermark": watermark.isoformat()}
+
+    def _scan_bucket(self, start: datetime, end: datetime) -> int:
+        """Keyset-paginated scan of one due-date bucket, enqueuing one batch at a time"""
+        enqueued = 0
+        last_key = None
+        db = next(get_db())
+        try:
+            while True:
+                query = (
+                    select(VaccinationRecord.id, VaccinationRecord.vaccine_name,
+                           VaccinationRecord.next_due_date, User.phone_number)
+                    .join(User, User.id == VaccinationRecord.user_id)
+                    .where(
+                        VaccinationRecord.next_due_date >= start,
+                        VaccinationRecord.next_due_date < end,
+                        User.is_active.is_(True)
+                    )
+                    .order_by(VaccinationRecord.next_due_date, VaccinationRecord.id)
+                    .limit(self.batch_size)
+                )
+                if last_key is not None:
+                    query = query.where(
+                        tuple_(VaccinationRecord.next_due_date, VaccinationRecord.id) > last_key
+                    )
+
+                rows = db.execute(query).all()
+                if not rows:
+                    break
+
+                enqueued += self._enqueue(rows)
+                last_key = (rows[-1].next_due_date, rows[-1].id)
+                if len(rows) < self.batch_size:
+                    break
+        finally:
+            db.close()
+        return enqueued
+
+    def _enqueue(self, rows: List[Any]) -> int:
+        """Publish one batch of send_reminder tasks over a single producer"""
+        reminders = [
+            signature(
+                "tasks.send_reminder",
+                args=(row.phone_number, self._message(row.vaccine_name, row.next_due_date)),
+                kwargs={"idempotency_key": self._reminder_key(row)},
+                queue="reminders"
+            )
+            for row in self._not_yet_enqueued([row for row in rows if row.phone_number])
+        ]
+        if reminders:
+            group(reminders).apply_async()
+        return len(reminders)
+
+    def _reminder_key(self, row) -> str:
+        return f"reminder:{row.id}:{row.next_due_date.date().isoformat()}"
+
+    def _not_yet_enqueued(self, rows: List[Any]) -> List[Any]:
+        """Rows whose reminder this scanner hasn't enqueued yet, marking them as enqueued"""
+        if not rows:
+            return []
+        # A due date stays within the rescanned range for about two lead times
+        ttl = int((2 * self.lead + 2 * self.bucket).total_seconds())
+        pipe = self.redis.pipeline(transaction=False)
+        for row in rows:
+            pipe.set(f"{_ENQUEUED_PREFIX}:{self._reminder_key(row)}", 1, nx=True, ex=ttl)
+        return [row for row, new in zip(rows, pipe.execute()) if new]
+
+    def _message(self, vaccine_name: str, due: datetime) -> str:
+        return (
+            f"Reminder: your next {vaccine_name} dose is due on {due.date().isoformat()}. "
+            "Reply with 'vaccination schedule' to view your schedule."
+        )
+
+    def _bucket_start(self, moment: datetime) -> datetime:
+        size = int(self.bucket.total_seconds())
+        epoch = int((moment - datetime(1970, 1, 1)).total_seconds())
+        return datetime(1970, 1, 1) + timedelta(seconds=epoch - epoch % size)
+
+    def _load_watermark(self) -> Optional[datetime]:
+        raw = self.redis.get(_WATERMARK_KEY)
+        return datetime.fromisoformat(raw) if raw else None
+
+    def _store_watermark(self, watermark: datetime):
+        self.redis.set(_WATERMARK_KEY, watermark.isoformat())
@@ -0,0 +1,392 @@
+"""
+Canonical vaccination schedule model: immutable display schedules shared by
+all service instances, and an interval index over dose due windows
+"""
+
+import json
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Vaccine:
+    name: str
+    age: str
+    disease: str
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Vaccine":
+        return cls(
+            name=str(data.get("name", "")),
+            age=str(data.get("age", "")),
+            disease=str(data.get("disease", ""))
+        )
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"name": self.name, "age": self.age, "disease": self.disease}
+
+
+@dataclass(frozen=True)
+class ScheduleOverlay:
+    """Government additions to a base schedule, frozen so it can key the view cache"""
+
+    additional_vaccines: Tuple[Vaccine, ...] = ()
+    # Canonical JSON, since government recommendations are free-form
+    recommendations_json: Optional[str] = None
+
+    @classmethod
+    def from_government(cls, gov_schedule: Dict[str, Any]) -> "ScheduleOverlay":
+        recommendations = gov_schedule.get("recommendations")
+        return cls(
+            additional_vaccines=tuple(
+                Vaccine.from_dict(v) for v in gov_schedule.get("additional_vaccines") or []
+                if isinstance(v, dict)
+            ),
+            recommendations_json=(
+                json.dumps(recommendations, sort_keys=True) if recommendations is not None else None
+            )
+        )
+
+
+@dataclass(frozen=True)
+class Schedule:
+    age_range: str
+    vaccines: Tuple[Vaccine, ...]
+    recommendations_json: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Fresh JSON-ready copy; callers may mutate it without touching shared state"""
+        data = {
+            "age_range": self.age_range,
+            "vaccines": [v.to_dict() for v in self.vaccines],
+        }
+        if self.recommendations_json is not None:
+            data["recommendations"] = json.loads(self.recommendations_json)
+        return data
+
+
+@lru_cache(maxsize=1024)
+def merge_schedule(base: Schedule, overlay: ScheduleOverlay) -> Schedule:
+    """
+    Copy-on-write merge of a government overlay into a base schedule
+
+    Views are memoized on (base, overlay), so each distinct location view is
+    built once and reused; the base schedule is never modified.
+    """
+    known = set(base.vaccines)
+    additions = tuple(v for v in overlay.additional_vaccines if v not in known)
+    return Schedule(
+        age_range=base.age_range,
+        vaccines=base.vaccines + tuple(dict.fromkeys(additions)),
+        recommendations_json=(
+            overlay.recommendations_json
+            if overlay.recommendations_json is not None
+            else base.recommendations_json
+        )
+    )
+
+
+
+# ---------------------------------------------------------------------------
+# Canonical dose windows
+# ---------------------------------------------------------------------------
+
+def _weeks(n: float) -> int:
+    return round(7 * n)
+
+
+def _months(n: float) -> int:
+    return round(30.4375 * n)
+
+
+def _years(n: float) -> int:
+    return round(365.25 * n)
+
+
+@dataclass(frozen=True)
+class DoseWindow:
+    """
+    One dose of a vaccine, with its due window as age in days since birth
+
+    The dose is due on [start_day, end_day) and overdue from end_day until
+    catch_up_until (open-ended when None). Recurring vaccines set repeat_days
+    and are due again once that long has passed since the last dose.
+    """
+
+    vaccine: str
+    dose: int
+    disease: str
+    age: str
+    start_day: int
+    end_day: Optional[int] = None
+    catch_up_until: Optional[int] = None
+    repeat_days: Optional[int] = None
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        return (self.vaccine.lower(), self.dose)
+
+    def to_dict(self, date_of_birth: Optional[date] = None) -> Dict[str, Any]:
+        data = {
+            "name": self.vaccine,
+            "dose": self.dose,
+            "disease": self.disease,
+            "age": self.age,
+            "due_from_day": self.start_day,
+            "due_until_day": self.end_day,
+        }
+        if date_of_birth:
+            data["due_from"] = (date_of_birth + timedelta(days=self.start_day)).isoformat()
+            data["due_until"] = (
+                (date_of_birth + timedelta(days=self.end_day)).isoformat() if self.end_day is not None else None
+            )
+        return data
+
+
+class IntervalIndex:
+    """
+    Static stabbing-query index over half-open [start, end) intervals
+
+    Interval endpoints split the age axis into elementary segments whose
+    active sets are precomputed, so a lookup is one bisect: O(log n) plus the
+    size of the answer. end=None means the interval never closes.
+    """
+
+    def __init__(self, intervals: List[Tuple[int, Optional[int], Any]]):
+        bounds = sorted({start for start, _, _ in intervals} | {end for _, end, _ in intervals if end is not None})
+        self._bounds = bounds
+        self._active = tuple(
+            tuple(item for start, end, item in intervals if start <= b and (end is None or b < end))
+            for b in bounds
+        )
+
+    def stab(self, point: int) -> Tuple[Any, ...]:
+        i = bisect_right(self._bounds, point) - 1
+        return self._active[i] if i >= 0 else ()
+
+
+class ScheduleIndex:
+    """Due / overdue / upcoming dose lookups over the canonical dose windows"""
+
+    def __init__(self, windows: List[DoseWindow]):
+        self.windows = tuple(sorted(windows, key=lambda w: (w.start_day, w.vaccine, w.dose)))
+        self._starts = [w.start_day for w in self.windows]
+        self._due = IntervalIndex([(w.start_day, w.end_day, w) for w in self.windows])
+        self._overdue = IntervalIndex([
+            (w.end_day, w.catch_up_until, w) for w in self.windows
+            if w.end_day is not None and (w.catch_up_until is None or w.catch_up_until > w.end_day)
+        ])
+
+    def lookup(
+        self,
+        date_of_birth: date,
+        history: Optional[List[Dict[str, Any]]] = None,
+        on: Optional[date] = None,
+        upcoming_limit: int = 3
+    ) -> Dict[str, Any]:
+        """
+        Exact due, overdue and upcoming doses for a person
+
+        Args:
+            date_of_birth: Person's date of birth
+            history: Administered doses as dicts with `vaccine_name` and
+                optionally `date_administered` (date, datetime or ISO string)
+            on: Reference date, defaults to today
+            upcoming_limit: Number of future doses to return
+
+        Returns:
+            Dict with `age_days` and `due`, `overdue`, `upcoming` dose lists
+        """
+        on = on or date.today()
+        age_days = (on - date_of_birth).days
+        counts, last_given = self._summarize(history or [])
+
+        due, seen = [], set()
+        for window in self._due.stab(age_days):
+            if window.key in seen:
+                continue
+            if window.repeat_days:
+                last = last_given.get(window.key[0])
+                pending = last is None or (on - last).days >= window.repeat_days
+            else:
+                pending = counts.get(window.key[0], 0) < window.dose
+            if pending:
+                seen.add(window.key)
+                due.append(window)
+
+        overdue = []
+        for window in self._overdue.stab(age_days):
+            if window.key in seen or counts.get(window.key[0], 0) >= window.dose:
+                continue
+            seen.add(window.key)
+            overdue.append(window)
+
+        upcoming = []
+        for window in self.windows[bisect_right(self._starts, age_days):]:
+            if len(upcoming) >= upcoming_limit:
+                break
+            if window.key not in seen and counts.get(window.key[0], 0) < window.dose:
+                seen.add(window.key)
+                upcoming.append(window)
+
+        return {
+            "age_days": age_days,
+            "due": [w.to_dict(date_of_birth) for w in due],
+            "overdue": [w.to_dict(date_of_birth) for w in sorted(overdue, key=lambda w: w.end_day)],
+            "upcoming": [w.to_dict(date_of_birth) for w in upcoming],
+        }
+
+    def next_due_after(self, vaccine_name: str, doses_given: int, administered_on: date) -> Optional[date]:
+        """
+        Due date of the dose following the `doses_given`-th dose of a vaccine
+
+        Series doses are spaced by the gap between their window starts;
+        recurring vaccines are due again after their repeat interval.
+        Returns None when the vaccine needs no further dose.
+        """
+        name = vaccine_name.lower()
+        series = {w.dose: w for w in self.windows if w.key[0] == name and not w.repeat_days}
+        following, current = series.get(doses_given + 1), series.get(doses_given)
+        if following and current:
+            return administered_on + timedelta(days=max(following.start_day - current.start_day, 1))
+
+        repeat_days = [w.repeat_days for w in self.windows if w.key[0] == name and w.repeat_days]
+        if repeat_days:
+            return administered_on + timedelta(days=min(repeat_days))
+        return None
+
+    @staticmethod
+    def _summarize(history: List[Dict[str, Any]]) -> Tuple[Dict[str, int], Dict[str, date]]:
+        counts: Dict[str, int] = {}
+        last_given: Dict[str, date] = {}
+        for record in history:
+            name = str(record.get("vaccine_name") or "").lower()
+            if not name:
+                continue
+            counts[name] = counts.get(name, 0) + 1
+            given = record.get("date_administered")
+            if isinstance(given, str):
+                given = datetime.fromisoformat(given)
+            if isinstance(given, datetime):
+                given = given.date()
+            if isinstance(given, date) and (name not in last_given or given > last_given[name]):
+                last_given[name] = given
+        return counts, last_given
+
+
+def _build(definitions: Dict[str, Dict[str, Any]]) -> Tuple[Mapping[str, Schedule], ScheduleIndex]:
+    schedules = {}
+    windows = {}
+    for group, data in definitions.items():
+        vaccines = []
+        for entry in data["vaccines"]:
+            vaccine = Vaccine(name=entry["name"], age=entry["age"], disease=entry["disease"])
+            vaccines.append(vaccine)
+            for dose, (start, end) in enumerate(entry["doses"], start=1):
+                window = DoseWindow(
+                    vaccine=vaccine.name,
+                    dose=dose,
+                    disease=vaccine.disease,
+                    age=vaccine.age,
+                    start_day=start,
+                    end_day=end,
+                    catch_up_until=entry.get("catch_up_until"),
+                    repeat_days=entry.get("repeat_days")
+                )
+                # Age groups overlap (e.g. adult and senior); keep one window per timing
+                windows.setdefault((window.key, start, end), window)
+        schedules[group] = Schedule(age_range=data["age_range"], vaccines=tuple(vaccines))
+    return MappingProxyType(schedules), ScheduleIndex(list(windows.values()))
+
+
+_SERIES_6_10_14_WEEKS = [(_weeks(6), _weeks(10)), (_weeks(10), _weeks(14)), (_weeks(14), _weeks(18))]
+
+# Single source for both the displayed schedules and the dose-window index
+VACCINATION_SCHEDULES, SCHEDULE_INDEX = _build({
+    "infant": {
+        "age_range": "0-12 months",
+        "vaccines": [
+            {"name": "BCG", "age": "At birth", "disease": "Tuberculosis",
+             "doses": [(0, _weeks(2))], "catch_up_until": _years(1)},
+            {"name": "Hepatitis B", "age": "At birth", "disease": "Hepatitis B",
+             "doses": [(0, _weeks(2))], "catch_up_until": _years(18)},
+            {"name": "OPV", "age": "6, 10, 14 weeks", "disease": "Polio",
+             "doses": _SERIES_6_10_14_WEEKS, "catch_up_until": _years(5)},
+            {"name": "DPT", "age": "6, 10, 14 weeks", "disease": "Diphtheria, Pertussis, Tetanus",
+             "doses": _SERIES_6_10_14_WEEKS, "catch_up_until": _years(7)},
+            {"name": "Hib", "age": "6, 10, 14 weeks", "disease": "Haemophilus influenzae type b",
+             "doses": _SERIES_6_10_14_WEEKS, "catch_up_until": _years(5)},
+            {"name": "PCV", "age": "6, 10, 14 weeks", "disease": "Pneumococcal disease",
+             "doses": _SERIES_6_10_14_WEEKS, "catch_up_until": _years(2)},
+            {"name": "Rotavirus", "age": "6, 10, 14 weeks", "disease": "Rotavirus gastroenteritis",
+             "doses": _SERIES_6_10_14_WEEKS, "catch_up_until": _years(1)},
+            {"name": "Measles", "age": "9 months", "disease": "Measles",
+             "doses": [(_months(9), _months(12))], "catch_up_until": _years(5)},
+            {"name": "JE", "age": "9-12 months", "disease": "Japanese Encephalitis",
+             "doses": [(_months(9), _months(12))], "catch_up_until": _years(15)}
+        ]
+    },
+    "child": {
+        "age_range": "1-18 years",
+        "vaccines": [
+            {"name": "MMR", "age": "15-18 months", "disease": "Measles, Mumps, Rubella",
+             "doses": [(_months(15), _months(18))], "catch_up_until": _years(18)},
+            {"name": "DPT Booster", "age": "16-18 months", "disease": "Diphtheria, Pertussis, Tetanus",
+             "doses": [(_months(16), _months(18))], "catch_up_until": _years(7)},
+            {"name": "OPV Booster", "age": "16-18 months", "disease": "Polio",
+             "doses": [(_months(16), _months(18))], "catch_up_until": _years(5)},
+            {"name": "Hepatitis A", "age": "12-18 months", "disease": "Hepatitis A",
+             "doses": [(_months(12), _months(18))], "catch_up_until": _years(18)},
+            {"name": "Typhoid", "age": "2 years", "disease": "Typhoid fever",
+             "doses": [(_years(2), _years(3))], "catch_up_until": _years(18)},
+            {"name": "Varicella", "age": "12-15 months", "disease": "Chickenpox",
+             "doses": [(_months(12), _months(15))], "catch_up_until": _years(18)},
+            {"name": "HPV", "age": "9-14 years (girls)", "disease": "Human Papillomavirus",
+             "doses": [(_years(9), _years(15))], "catch_up_until": _years(18)},
+            {"name": "Tdap", "age": "11-12 years", "disease": "Tetanus, Diphtheria, Pertussis",
+             "doses": [(_years(11), _years(13))], "catch_up_until": _years(18)}
+        ]
+    },
+    "adult": {
+        "age_range": "18+ years",
+        "vaccines": [
+            {"name": "COVID-19", "age": "18+ years", "disease": "COVID-19",
+             "doses": [(_years(18), None)]},
+            {"name": "Influenza", "age": "Annually", "disease": "Seasonal flu",
+             "doses": [(_years(18), None)], "repeat_days": 365},
+            {"name": "Tdap", "age": "Every 10 years", "disease": "Tetanus, Diphtheria, Pertussis",
+             "doses": [(_years(18), None)], "repeat_days": _years(10)},
+            {"name": "Hepatitis B", "age": "If not vaccinated", "disease": "Hepatitis B",
+             "doses": [(_years(18), None)]},
+            {"name": "MMR", "age": "If not vaccinated", "disease": "Measles, Mumps, Rubella",
+             "doses": [(_years(18), None)]},
+            {"name": "Varicella", "age": "If not vaccinated", "disease": "Chickenpox",
+             "doses": [(_years(18), None)]},
+            {"name": "HPV", "age": "Up to 26 years", "disease": "Human Papillomavirus",
+             "doses": [(_years(18), _years(27))], "catch_up_until": _years(27)},
+            {"name": "Pneumococcal", "age": "65+ years", "disease": "Pneumococcal disease",
+             "doses": [(_years(65), None)]},
+            {"name": "Shingles", "age": "50+ years", "disease": "Herpes Zoster",
+             "doses": [(_years(50), None)]}
+        ]
+    },
+    "senior": {
+        "age_range": "65+ years",
+        "vaccines": [
+            {"name": "Pneumococcal", "age": "65+ years", "disease": "Pneumococcal disease",
+             "doses": [(_years(65), None)]},
+            {"name": "Influenza", "age": "Annually", "disease": "Seasonal flu",
+             "doses": [(_years(65), None)], "repeat_days": 365},
+            {"name": "Tdap", "age": "Every 10 years", "disease": "Tetanus, Diphtheria, Pertussis",
+             "doses": [(_years(65), None)], "repeat_days": _years(10)},
+            {"name": "Shingles", "age": "50+ years", "disease": "Herpes Zoster",
+             "doses": [(_years(50), None)]},
+            {"name": "COVID-19", "age": "As recommended", "disease": "COVID-19",
+             "doses": [(_years(65), None)]}
+        ]
+    }
+})
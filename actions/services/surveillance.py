@@ -0,0 +1,241 @@
+"""
+Streaming symptom surveillance: per district x symptom spike detection
+"""
+
+import math
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+from config import settings
+from .outbreak import OutbreakService
+
+logger = logging.getLogger(__name__)
+
+State = Dict[str, Any]
+Update = Callable[[Optional[State]], Tuple[State, Optional[Dict[str, Any]]]]
+
+
+class InMemoryDetectorStore:
+    """Per-process detector state, bounded with LRU eviction of idle keys"""
+
+    def __init__(self, max_keys: int = 50000):
+        self.max_keys = max_keys
+        self._states: "OrderedDict[str, State]" = OrderedDict()
+
+    async def update(self, key: str, fn: Update) -> Optional[Dict[str, Any]]:
+        # No await between read and write, so the update is atomic on the event loop
+        state, result = fn(self._states.get(key))
+        self._states[key] = state
+        self._states.move_to_end(key)
+        while len(self._states) > self.max_keys:
+            self._states.popitem(last=False)
+        return result
+
+
+class RedisDetectorStore:
+    """Detector state shared across processes, one Redis hash per key"""
+
+    _FLOAT_FIELDS = ("mean", "var", "cusum")
+
+    def __init__(self, redis_url: str, prefix: str = "surveillance", ttl_seconds: int = 60 * 24 * 3600):
+        import redis.asyncio as aioredis
+
+        self.client = aioredis.from_url(redis_url, decode_responses=True)
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+
+    async def update(self, key: str, fn: Update) -> Optional[Dict[str, Any]]:
+        redis_key = f"{self.prefix}:{key}"
+
+        async def _transaction(pipe):
+            raw = await pipe.hgetall(redis_key)
+            state, result = fn(self._decode(raw) if raw else None)
+            pipe.multi()
+            pipe.hset(redis_key, mapping={k: str(v) for k, v in state.items()})
+            pipe.expire(redis_key, self.ttl_seconds)
+            return result
+
+        # Optimistic WATCH/MULTI; retried by redis-py if another worker raced us
+        return await self.client.transaction(_transaction, redis_key, value_from_callable=True)
+
+    def _decode(self, raw: Dict[str, str]) -> State:
+        return {
+            k: float(v) if k in self._FLOAT_FIELDS else int(v)
+            for k, v in raw.items()
+        }
+
+
+class SpikeDetector:
+    """
+    Incremental EWMA + CUSUM detector over symptom report counts.
+
+    Reports are counted in fixed time buckets per (district, symptom). When a
+    bucket closes its count is folded into an exponentially weighted mean and
+    variance; the open bucket is scored against that baseline on every report,
+    so each update is O(1) and no table scans are needed.
+    """
+
+    # Upper bound on empty buckets folded in when a key has been idle
+    MAX_GAP_BUCKETS = 168
+
+    def __init__(
+        self,
+        store=None,
+        bucket_minutes: int = None,
+        alpha: float = None,
+        z_threshold: float = None,
+        cusum_k: float = None,
+        cusum_h: float = None,
+        min_reports: int = None,
+        warmup_buckets: int = None,
+        min_std: float = 1.0,
+        alert_sink: Optional[Callable] = None,
+    ):
+        self.store = store or InMemoryDetectorStore()
+        self.bucket_seconds = 60 * (bucket_minutes or settings.spike_bucket_minutes)
+        self.alpha = alpha if alpha is not None else settings.spike_ewma_alpha
+        self.z_threshold = z_threshold if z_threshold is not None else settings.spike_z_threshold
+        self.cusum_k = cusum_k if cusum_k is not None else settings.spike_cusum_k
+        self.cusum_h = cusum_h if cusum_h is not None else settings.spike_cusum_h
+        self.min_reports = min_reports if min_reports is not None else settings.spike_min_reports
+        self.warmup_buckets = warmup_buckets if warmup_buckets is not None else settings.spike_warmup_buckets
+        self.min_std = min_std
+        self.alert_sink = alert_sink or self._raise_candidate_alert
+
+    async def observe_report(
+        self,
+        location: Optional[str],
+        symptoms: List[str],
+        reported_at: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Record one stored symptom report and raise candidate alerts for any spikes
+
+        Args:
+            location: District of the reporting user
+            symptoms: Symptoms in the report
+            reported_at: Report timestamp (UTC); defaults to now
+
+        Returns:
+            List of spikes detected by this report
+        """
+        district = self._normalize(location)
+        if not district or not symptoms:
+            return []
+
+        reported_at = reported_at or datetime.utcnow()
+        bucket = int(reported_at.replace(tzinfo=timezone.utc).timestamp() // self.bucket_seconds)
+
+        spikes = []
+        for symptom in {self._normalize(s) for s in symptoms if s}:
+            if not symptom:
+                continue
+            try:
+                spike = await self.store.update(
+                    f"{district}|{symptom}",
+                    lambda state: self._advance(state, bucket)
+                )
+            except Exception as e:
+                logger.error(f"Error updating spike detector for {district}/{symptom}: {str(e)}")
+                continue
+
+            if spike:
+                spike.update({"district": district, "symptom": symptom})
+                spikes.append(spike)
+                await self.alert_sink(spike)
+
+        return spikes
+
+    def _advance(self, state: Optional[State], bucket: int) -> Tuple[State, Optional[Dict[str, Any]]]:
+        """Apply one report to the state of a single key"""
+        if not state:
+            state = {"bucket": bucket, "count": 0, "mean": 0.0, "var": 0.0, "cusum": 0.0, "n": 0, "alerted": -1}
+
+        if bucket < state["bucket"]:
+            # Late report for an already closed bucket; the baseline has moved on
+            return state, None
+
+        if bucket > state["bucket"]:
+            self._fold(state, state["count"])
+            for _ in range(min(bucket - state["bucket"] - 1, self.MAX_GAP_BUCKETS)):
+                self._fold(state, 0)
+            state["bucket"] = bucket
+            state["count"] = 0
+
+        state["count"] += 1
+
+        std = max(math.sqrt(state["var"]), self.min_std)
+        z_score = (state["count"] - state["mean"]) / std
+        cusum = max(0.0, state["cusum"] + z_score - self.cusum_k)
+
+        tripped = (
+            state["n"] >= self.warmup_buckets
+            and state["count"] >= self.min_reports
+            and state["alerted"] != bucket
+            and (z_score >= self.z_threshold or cusum >= self.cusum_h)
+        )
+        if not tripped:
+            return state, None
+
+        state["alerted"] = bucket
+        return state, {
+            "count": state["count"],
+            "baseline": round(state["mean"], 3),
+            "z_score": round(z_score, 3),
+            "cusum": round(cusum, 3),
+            "bucket_start": datetime.utcfromtimestamp(bucket * self.bucket_seconds).isoformat(),
+        }
+
+    def _fold(self, state: State, count: int):
+        """Fold a closed bucket count into the EWMA baseline and CUSUM statistic"""
+        if state["n"] == 0:
+            state["mean"] = float(count)
+            state["var"] = 0.0
+        else:
+            std = max(math.sqrt(state["var"]), self.min_std)
+            state["cusum"] = max(0.0, state["cusum"] + (count - state["mean"]) / std - self.cusum_k)
+            diff = count - state["mean"]
+            increment = self.alpha * diff
+            state["mean"] += increment
+            state["var"] = (1 - self.alpha) * (state["var"] + diff * increment)
+        state["n"] += 1
+
+    async def _raise_candidate_alert(self, spike: Dict[str, Any]):
+        """Store an unverified outbreak alert for review"""
+        severity = "high" if spike["z_score"] >= 2 * self.z_threshold else "moderate"
+        alert_data = {
+            "disease_name": f"Symptom spike: {spike['symptom']}",
+            "location": spike["district"],
+            "cases_count": spike["count"],
+            "severity_level": severity,
+            "alert_message": (
+                f"{spike['count']} '{spike['symptom']}' reports in {spike['district']} since "
+                f"{spike['bucket_start']} (baseline {spike['baseline']}, z={spike['z_score']}, "
+                f"CUSUM={spike['cusum']})"
+            ),
+            "precautions": [],
+            "source": "SYMPTOM_SURVEILLANCE",
+        }
+        logger.warning(f"Symptom spike detected: {alert_data['alert_message']}")
+        await OutbreakService().process_outbreak_alert(alert_data, verified=False)
+
+    @staticmethod
+    def _normalize(value: Optional[str]) -> str:
+        return " ".join(str(value).lower().split()) if value else ""
+
+
+_detector: Optional[SpikeDetector] = None
+
+
+def get_spike_detector() -> SpikeDetector:
+    """Process-wide detector configured from settings"""
+    global _detector
+    if _detector is None:
+        if settings.spike_state_backend == "redis":
+            store = RedisDetectorStore(settings.redis_url)
+        else:
+            store = InMemoryDetectorStore()
+        _detector = SpikeDetector(store=store)
+    return _detector
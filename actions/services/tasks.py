@@ -1,7 +1,31 @@
+import asyncio
 from celery import shared_task
+from celery.signals import worker_process_shutdown, worker_shutdown
 from .health_analysis import HealthAnalysisService
-import asyncio
-from typing import List, Optional
+from .coverage import VaccinationCoverageService
+from .reminders import VaccinationReminderService
+from .maintenance import PartitionMaintenanceService, RetentionService
+from .export import DataExportService
+from async_runtime import shutdown_runtime
+from config import settings
+from database import dispose_async_engines, run_async
+from typing import Any, Dict, List, Optional
+
+# Stateless services are built once per worker process, not per task
+_health_service: Optional[HealthAnalysisService] = None
+
+
+def _health_analysis() -> HealthAnalysisService:
+    global _health_service
+    if _health_service is None:
+        _health_service = HealthAnalysisService()
+    return _health_service
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _close_async_runtime(**kwargs):
+    shutdown_runtime(dispose_async_engines())
 
 
 @shared_task(name="services.analyze_symptoms_task")
@@ -11,6 +35,64 @@ def analyze_symptoms_task(symptoms: List[str], age: Optional[str] = None, gender
     Celery autodiscovery will find this module because it's named tasks.py
     inside the 'services' package.
     """
-    service = HealthAnalysisService()
-    # health analysis functions are async; run in a fresh event loop
-    return asyncio.run(service.analyze_symptoms(symptoms, age=age, gender=gender, location=location))
+    # Runs on the worker's long-lived event loop, reusing its DB and HTTP pools
+    return run_async(_health_analysis().analyze_symptoms(symptoms, age=age, gender=gender, location=location))
+
+
+@shared_task(name="services.analyze_symptoms_batch_task")
+def analyze_symptoms_batch_task(requests: List[Dict[str, Any]]):
+    """
+    Analyse many symptom reports in one task, concurrently on the worker's loop.
+
+    Each request has the keyword arguments of analyze_symptoms_task. Results
+    come back in request order.
+    """
+    service = _health_analysis()
+
+    async def analyze_all():
+        limit = asyncio.Semaphore(settings.async_task_batch_concurrency)
+
+        async def analyze(request: Dict[str, Any]):
+            async with limit:
+                return await service.analyze_symptoms(
+                    request.get("symptoms", []), age=request.get("age"),
+                    gender=request.get("gender"), location=request.get("location")
+                )
+
+        return await asyncio.gather(*(analyze(r) for r in requests))
+
+    return run_async(analyze_all())
+
+
+@shared_task(name="services.refresh_coverage_snapshot")
+def refresh_coverage_snapshot():
+    """Periodic (Celery beat) refresh of the population vaccination coverage snapshot."""
+    snapshot = VaccinationCoverageService().refresh_snapshot()
+    return {"locations": len(snapshot["locations"]), "generated_at": snapshot["generated_at"]}
+
+
+@shared_task(name="services.scan_vaccination_reminders")
+def scan_vaccination_reminders():
+    """Periodic (Celery beat) scan of due-soon vaccination records into send_reminder tasks."""
+    return VaccinationReminderService().scan()
+
+
+@shared_task(name="services.ensure_partitions")
+def ensure_partitions():
+    """Periodic (Celery beat) creation of upcoming monthly table partitions."""
+    return PartitionMaintenanceService().ensure_partitions()
+
+
+@shared_task(name="services.export_analytics_data")
+def export_analytics_data(table: Optional[str] = None, full: bool = False):
+    """Incremental export of symptom/outbreak data to Parquet or gzip CSV files."""
+    service = DataExportService()
+    if table:
+        return {table: service.export_table(table, full=full)}
+    return service.export_all(full=full)
+
+
+@shared_task(name="services.apply_retention")
+def apply_retention():
+    """Periodic (Celery beat) rollup and removal of expired symptom/outbreak rows."""
+    return RetentionService().apply()
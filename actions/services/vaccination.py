@@ -3,73 +3,56 @@ Vaccination Service for managing vaccination schedules and government integratio
 """
 
 import asyncio
+import time
+from collections import deque
 from typing import Dict, Any, Optional, List
 import httpx
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import logging
 
 from config import settings
-from database import get_db, VaccinationRecord, User
+from sqlalchemy import func, select, update
+
+from async_runtime import shared_http_client
+from database import AsyncSessionLocal, VaccinationRecord, User, mark_write, read_session
+from .cache import TTLCache
+from .coverage import VACCINE_BITS, vaccine_mask
+from .schedules import SCHEDULE_INDEX, VACCINATION_SCHEDULES, Schedule, ScheduleOverlay, merge_schedule
 
 logger = logging.getLogger(__name__)
 
+
+class _LatencyWindow:
+    """Rolling window of request latencies used to pick the hedge delay"""
+    
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+    
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+    
+    def hedge_delay(self) -> float:
+        """p95 of recent latencies, clamped to the configured bounds"""
+        if len(self.samples) < 20:
+            return settings.gov_schedule_hedge_max_seconds
+        ordered = sorted(self.samples)
+        p95 = ordered[int(0.95 * (len(ordered) - 1))]
+        return min(max(p95, settings.gov_schedule_hedge_min_seconds), settings.gov_schedule_hedge_max_seconds)
+
+
+# Shared across service instances; schedules change only a few times a year
+_NOT_CACHED = object()
+_government_schedule_cache = TTLCache(maxsize=settings.gov_schedule_cache_size)
+# Fetches in progress per cache key; concurrent misses for a key share one
+_government_schedule_fetches: Dict[tuple, "asyncio.Task"] = {}
+_mofhw_latency = _LatencyWindow()
+
 class VaccinationService:
     """Service for vaccination schedule management and government database integration"""
     
     def __init__(self):
-        self.vaccination_schedules = {
-            "infant": {
-                "age_range": "0-12 months",
-                "vaccines": [
-                    {"name": "BCG", "age": "At birth", "disease": "Tuberculosis"},
-                    {"name": "Hepatitis B", "age": "At birth", "disease": "Hepatitis B"},
-                    {"name": "OPV", "age": "6, 10, 14 weeks", "disease": "Polio"},
-                    {"name": "DPT", "age": "6, 10, 14 weeks", "disease": "Diphtheria, Pertussis, Tetanus"},
-                    {"name": "Hib", "age": "6, 10, 14 weeks", "disease": "Haemophilus influenzae type b"},
-                    {"name": "PCV", "age": "6, 10, 14 weeks", "disease": "Pneumococcal disease"},
-                    {"name": "Rotavirus", "age": "6, 10, 14 weeks", "disease": "Rotavirus gastroenteritis"},
-                    {"name": "Measles", "age": "9 months", "disease": "Measles"},
-                    {"name": "JE", "age": "9-12 months", "disease": "Japanese Encephalitis"}
-                ]
-            },
-            "child": {
-                "age_range": "1-18 years",
-                "vaccines": [
-                    {"name": "MMR", "age": "15-18 months", "disease": "Measles, Mumps, Rubella"},
-                    {"name": "DPT Booster", "age": "16-18 months", "disease": "Diphtheria, Pertussis, Tetanus"},
-                    {"name": "OPV Booster", "age": "16-18 months", "disease": "Polio"},
-                    {"name": "Hepatitis A", "age": "12-18 months", "disease": "Hepatitis A"},
-                    {"name": "Typhoid", "age": "2 years", "disease": "Typhoid fever"},
-                    {"name": "Varicella", "age": "12-15 months", "disease": "Chickenpox"},
-                    {"name": "HPV", "age": "9-14 years (girls)", "disease": "Human Papillomavirus"},
-                    {"name": "Tdap", "age": "11-12 years", "disease": "Tetanus, Diphtheria, Pertussis"}
-                ]
-            },
-            "adult": {
-                "age_range": "18+ years",
-                "vaccines": [
-                    {"name": "COVID-19", "age": "18+ years", "disease": "COVID-19"},
-                    {"name": "Influenza", "age": "Annually", "disease": "Seasonal flu"},
-                    {"name": "Tdap", "age": "Every 10 years", "disease": "Tetanus, Diphtheria, Pertussis"},
-                    {"name": "Hepatitis B", "age": "If not vaccinated", "disease": "Hepatitis B"},
-                    {"name": "MMR", "age": "If not vaccinated", "disease": "Measles, Mumps, Rubella"},
-                    {"name": "Varicella", "age": "If not vaccinated", "disease": "Chickenpox"},
-                    {"name": "HPV", "age": "Up to 26 years", "disease": "Human Papillomavirus"},
-                    {"name": "Pneumococcal", "age": "65+ years", "disease": "Pneumococcal disease"},
-                    {"name": "Shingles", "age": "50+ years", "disease": "Herpes Zoster"}
-                ]
-            },
-            "senior": {
-                "age_range": "65+ years",
-                "vaccines": [
-                    {"name": "Pneumococcal", "age": "65+ years", "disease": "Pneumococcal disease"},
-                    {"name": "Influenza", "age": "Annually", "disease": "Seasonal flu"},
-                    {"name": "Tdap", "age": "Every 10 years", "disease": "Tetanus, Diphtheria, Pertussis"},
-                    {"name": "Shingles", "age": "50+ years", "disease": "Herpes Zoster"},
-                    {"name": "COVID-19", "age": "As recommended", "disease": "COVID-19"}
-                ]
-            }
-        }
+        # Frozen, precomputed at import and shared by every instance
+        self.vaccination_schedules = VACCINATION_SCHEDULES
     
     async def get_vaccination_schedule(
         self, 
@@ -104,7 +87,7 @@ class VaccinationService:
             
             return {
                 "age_group": age_group,
-                "schedule": schedule,
+                "schedule": schedule.to_dict(),
                 "next_vaccine": next_vaccine,
                 "location_specific": location is not None,
                 "last_updated": datetime.utcnow().isoformat()
@@ -114,7 +97,7 @@ class VaccinationService:
             logger.error(f"Error getting vaccination schedule: {str(e)}")
             return {
                 "age_group": "adult",
-                "schedule": self.vaccination_schedules["adult"],
+                "schedule": self.vaccination_schedules["adult"].to_dict(),
                 "next_vaccine": "COVID-19 vaccine",
                 "location_specific": False,
                 "error": str(e)
@@ -139,72 +122,137 @@ class VaccinationService:
             return "adult"
     
     async def _get_government_schedule(self, location: str, age_group: str) -> Optional[Dict]:
-        """Get vaccination schedule from government APIs"""
+        """Get vaccination schedule from government APIs, cached per (location, age_group)"""
+        key = (location.strip().lower(), age_group)
+        cached = _government_schedule_cache.get(key, _NOT_CACHED)
+        if cached is not _NOT_CACHED:
+            return cached
+        
+        fetch = _government_schedule_fetches.get(key)
+        if fetch is None:
+            fetch = asyncio.create_task(self._fetch_and_cache_government_schedule(key, location, age_group))
+            _government_schedule_fetches[key] = fetch
+            fetch.add_done_callback(lambda _: _government_schedule_fetches.pop(key, None))
+        # Shielded so a caller that gives up doesn't cancel the fetch the others are waiting on
+        return await asyncio.shield(fetch)
+    
+    async def _fetch_and_cache_government_schedule(self, key: tuple, location: str, age_group: str) -> Optional[Dict]:
+        schedule = await self._fetch_government_schedule_hedged(location, age_group)
+        
+        # Misses are cached too, for a shorter time, so outages don't hammer the APIs
+        ttl = settings.gov_schedule_cache_ttl_seconds if schedule else settings.gov_schedule_negative_ttl_seconds
+        _government_schedule_cache.set(key, schedule, ttl=ttl)
+        return schedule
+    
+    async def _fetch_government_schedule_hedged(self, location: str, age_group: str) -> Optional[Dict]:
+        """
+        Query MOFHW, hedging to IDSP if MOFHW hasn't answered within its p95 latency
+        
+        The first successful response wins and the other request is cancelled.
+        """
+        params = {"location": location, "age_group": age_group}
         try:
-            async with httpx.AsyncClient() as client:
-                # Try MOFHW API first
-                mofhw_url = f"{settings.mofhw_base_url}/vaccination/schedule"
-                headers = {"Authorization": f"Bearer {settings.mofhw_api_key}"}
-                params = {"location": location, "age_group": age_group}
-                
-                response = await client.get(mofhw_url, headers=headers, params=params)
-                
-                if response.status_code == 200:
-                    return response.json()
-                
-                # Fallback to IDSP API
-                idsp_url = f"{settings.idsp_base_url}/vaccination/schedule"
-                headers = {"Authorization": f"Bearer {settings.idsp_api_key}"}
-                
-                response = await client.get(idsp_url, headers=headers, params=params)
-                
-                if response.status_code == 200:
-                    return response.json()
-                
+            client = shared_http_client()
+            primary = asyncio.create_task(self._fetch_schedule(client, "mofhw", params))
+            pending = {primary}
+            try:
+                done, pending = await asyncio.wait(pending, timeout=_mofhw_latency.hedge_delay())
+                if primary in done and primary.result() is not None:
+                    return primary.result()
+                    
+                pending.add(asyncio.create_task(self._fetch_schedule(client, "idsp", params)))
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.result() is not None:
+                            return task.result()
+            finally:
+                # Cancel the losing request
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
         except Exception as e:
             logger.error(f"Error fetching government schedule: {str(e)}")
         
         return None
     
-    def _merge_schedules(self, base_schedule: Dict, gov_schedule: Dict) -> Dict:
-        """Merge base schedule with government data"""
-        # Add government-specific vaccines
-        if "additional_vaccines" in gov_schedule:
-            base_schedule["vaccines"].extend(gov_schedule["additional_vaccines"])
-        
-        # Update recommendations
-        if "recommendations" in gov_schedule:
-            base_schedule["recommendations"] = gov_schedule["recommendations"]
+    async def _fetch_schedule(self, client: httpx.AsyncClient, source: str, params: Dict[str, str]) -> Optional[Dict]:
+        """Fetch a schedule from one government source; None on any failure"""
+        base_url, api_key = {
+            "mofhw": (settings.mofhw_base_url, settings.mofhw_api_key),
+            "idsp": (settings.idsp_base_url, settings.idsp_api_key),
+        }[source]
+        started = time.monotonic()
+        try:
+            response = await client.get(
+                f"{base_url}/vaccination/schedule",
+                headers={"Authorization": f"Bearer {api_key}"},
+                params=params,
+                timeout=settings.gov_api_timeout_seconds
+            )
+            if response.status_code == 200:
+                return response.json()
+        except Exception as e:
+            logger.warning(f"Error fetching {source.upper()} vaccination schedule: {str(e)}")
+        finally:
+            if source == "mofhw":
+                # Cancelled requests are recorded too, as a lower bound on latency
+                _mofhw_latency.record(time.monotonic() - started)
         
-        return base_schedule
+        return None
+    
+    def _merge_schedules(self, base_schedule: Schedule, gov_schedule: Dict) -> Schedule:
+        """Merge base schedule with government data into a cached, copy-on-write view"""
+        return merge_schedule(base_schedule, ScheduleOverlay.from_government(gov_schedule))
     
-    def _get_next_vaccine(self, schedule: Dict, age: Optional[str]) -> Dict[str, Any]:
-        """Get next recommended vaccine"""
-        vaccines = schedule.get("vaccines", [])
+    def _get_next_vaccine(self, schedule: Schedule, age: Optional[str]) -> Dict[str, Any]:
+        """Get next recommended vaccine from the dose-window index"""
+        date_of_birth = self._estimate_date_of_birth(age)
+        if date_of_birth:
+            lookup = SCHEDULE_INDEX.lookup(date_of_birth, upcoming_limit=1)
+            for bucket, reason in (("due", "Due now"), ("overdue", "Overdue"), ("upcoming", "Next in schedule")):
+                if lookup[bucket]:
+                    return {**lookup[bucket][0], "reason": reason}
         
-        if not vaccines:
+        if not schedule.vaccines:
             return {"name": "COVID-19", "reason": "General recommendation"}
         
-        # Simple logic to determine next vaccine
-        # In a real implementation, this would consider user's vaccination history
-        for vaccine in vaccines:
-            if vaccine["name"] == "COVID-19":
-                return {
-                    "name": vaccine["name"],
-                    "age": vaccine["age"],
-                    "disease": vaccine["disease"],
-                    "reason": "High priority due to ongoing pandemic"
-                }
-        
-        # Return first vaccine if COVID-19 not found
-        first_vaccine = vaccines[0]
         return {
-            "name": first_vaccine["name"],
-            "age": first_vaccine["age"],
-            "disease": first_vaccine["disease"],
+            **schedule.vaccines[0].to_dict(),
             "reason": "Next in schedule"
         }
     
+    def _estimate_date_of_birth(self, age: Optional[str]) -> Optional[date]:
+        """Approximate date of birth from an age in whole years"""
+        try:
+            years = int(age)
+        except (TypeError, ValueError):
+            return None
+        return date.today() - timedelta(days=round(years * 365.25))
+    
+    async def get_due_vaccines(
+        self,
+        date_of_birth: date,
+        user_id: Optional[str] = None,
+        history: Optional[List[Dict[str, Any]]] = None,
+        on: Optional[date] = None
+    ) -> Dict[str, Any]:
+        """
+        Get exact due, overdue and upcoming doses for a person
+        
+        Args:
+            date_of_birth: Person's date of birth
+            user_id: Loads vaccination history from the database when given
+            history: Explicit vaccination history, used instead of user_id
+            on: Reference date, defaults to today
+        
+        Returns:
+            Dict with `due`, `overdue` and `upcoming` dose lists
+        """
+        if history is None:
+            history = await self.get_vaccination_history(user_id) if user_id else []
+        return SCHEDULE_INDEX.lookup(date_of_birth, history, on=on)
+    
     async def record_vaccination(
         self, 
         user_id: str, 
@@ -212,19 +260,39 @@ class VaccinationService:
         date_administered: datetime,
         location: str
     ) -> Dict[str, Any]:
-        """Record a vaccination in the database"""
+        """Record a vaccination in the database, with the due date of the following dose"""
         try:
-            db = next(get_db())
-            
-            vaccination_record = VaccinationRecord(
-                user_id=user_id,
-                vaccine_name=vaccine_name,
-                date_administered=date_administered,
-                location=location
+            same_vaccine = (
+                VaccinationRecord.user_id == user_id,
+                func.lower(VaccinationRecord.vaccine_name) == vaccine_name.lower()
             )
             
-            db.add(vaccination_record)
-            db.commit()
+            async with AsyncSessionLocal() as db:
+                doses_given = await db.scalar(
+                    select(func.count(VaccinationRecord.id)).where(*same_vaccine)
+                ) + 1
+                
+                # Earlier records of this vaccine are fulfilled; keep only the latest due date open
+                await db.execute(
+                    update(VaccinationRecord)
+                    .where(*same_vaccine, VaccinationRecord.next_due_date.isnot(None))
+                    .values(next_due_date=None)
+                    .execution_options(synchronize_session=False)
+                )
+                
+                next_due = SCHEDULE_INDEX.next_due_after(vaccine_name, doses_given, date_administered.date())
+                vaccination_record = VaccinationRecord(
+                    user_id=user_id,
+                    vaccine_name=vaccine_name,
+                    date_administered=date_administered,
+                    next_due_date=datetime.combine(next_due, datetime.min.time()) if next_due else None,
+                    location=location
+                )
+                
+                db.add(vaccination_record)
+                # Mark before committing so no read can reach a lagging replica in between
+                await mark_write(user_id)
+                await db.commit()
             
             return {
                 "success": True,
@@ -234,22 +302,20 @@ class VaccinationService:
             
         except Exception as e:
             logger.error(f"Error recording vaccination: {str(e)}")
-            db.rollback()
             return {
                 "success": False,
                 "error": str(e)
             }
-        finally:
-            db.close()
     
     async def get_vaccination_history(self, user_id: str) -> List[Dict[str, Any]]:
         """Get user's vaccination history"""
         try:
-            db = next(get_db())
-            
-            records = db.query(VaccinationRecord).filter(
-                VaccinationRecord.user_id == user_id
-            ).order_by(VaccinationRecord.date_administered.desc()).all()
+            async with read_session(user_id) as db:
+                records = (await db.execute(
+                    select(VaccinationRecord).where(
+                        VaccinationRecord.user_id == user_id
+                    ).order_by(VaccinationRecord.date_administered.desc())
+                )).scalars().all()
             
             return [
                 {
@@ -263,8 +329,6 @@ class VaccinationService:
         except Exception as e:
             logger.error(f"Error getting vaccination history: {str(e)}")
             return []
-        finally:
-            db.close()
     
     async def check_vaccination_status(self, user_id: str, age: str) -> Dict[str, Any]:
         """Check user's vaccination status against recommended schedule"""
@@ -275,20 +339,26 @@ class VaccinationService:
             # Get user's vaccination history
             history = await self.get_vaccination_history(user_id)
             
-            # Check which vaccines are missing
+            # Check which vaccines are missing with bitsets instead of list scans
             recommended_vaccines = [v["name"] for v in schedule["schedule"]["vaccines"]]
-            administered_vaccines = [h["vaccine_name"] for h in history]
+            missing_mask = vaccine_mask(recommended_vaccines) & ~vaccine_mask(h["vaccine_name"] for h in history)
+            administered_names = {h["vaccine_name"].lower() for h in history}
             
-            missing_vaccines = [
-                v for v in recommended_vaccines 
-                if v not in administered_vaccines
-            ]
+            def is_missing(name: str) -> bool:
+                bit = VACCINE_BITS.get(name.lower())
+                if bit is None:
+                    # Government additions outside the known bitset
+                    return name.lower() not in administered_names
+                return bool(missing_mask >> bit & 1)
+            
+            missing_vaccines = [v for v in recommended_vaccines if is_missing(v)]
+            completed = len(recommended_vaccines) - len(missing_vaccines)
             
             return {
                 "up_to_date": len(missing_vaccines) == 0,
                 "missing_vaccines": missing_vaccines,
                 "next_recommended": missing_vaccines[0] if missing_vaccines else None,
-                "completion_percentage": (len(administered_vaccines) / len(recommended_vaccines)) * 100
+                "completion_percentage": (completed / len(recommended_vaccines)) * 100 if recommended_vaccines else 100.0
             }
             
         except Exception as e:
@@ -12,13 +12,11 @@ import logging
 from datetime import datetime
 import hmac
 import hashlib
+import base64
+import binascii
+import re
 
-try:
-    import pytesseract  # optional OCR
-    from PIL import Image
-    PYTESS_AVAILABLE = True
-except Exception:
-    PYTESS_AVAILABLE = False
+from async_runtime import shared_http_client
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -153,21 +151,60 @@ async def award_rewards(data: Dict[str, Any]):
 
 
 # =====================
-# OCR / Image Analysis (placeholders)
+# OCR / Image Analysis
 # =====================
+ML_SERVICE_URL = os.getenv("ML_SERVICE_URL", "http://ml-service:8001")
+
+def _decode_image(payload: Dict[str, Any]) -> bytes:
+    data = payload.get("image_base64") or ""
+    if data.startswith("data:"):
+        data = data.split(",", 1)[-1]  # data URL from FileReader.readAsDataURL
+    try:
+        content = base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        content = b""
+    if not content:
+        raise HTTPException(status_code=400, detail="image_base64 must be a base64-encoded image")
+    return content
+
+async def _ml_ocr(content: bytes) -> Optional[Dict[str, Any]]:
+    """OCR through the ML service; only byte-identical images are answered from its cache"""
+    try:
+        resp = await shared_http_client().post(
+            f"{ML_SERVICE_URL}/ocr", files={"file": ("image", content, "application/octet-stream")}, timeout=30
+        )
+        resp.raise_for_status()
+        return resp.json()
+    except Exception as e:
+        logger.warning(f"ML OCR unavailable: {str(e)}")
+        return None
+
+def _medicine_fields(text: str) -> Dict[str, str]:
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    patterns = {
+        "batchNumber": r"(?:B\.?\s*No|Batch(?:\s*No)?|LOT)\.?\s*[:\-]?\s*([A-Z0-9][A-Z0-9\-/]{2,})",
+        "expiryDate": r"(?:EXP(?:IRY)?(?:\s*DATE)?)\.?\s*[:\-]?\s*([0-9]{1,2}\s*[/\-\.]\s*[0-9]{2,4}|[A-Z]{3}\.?\s*[0-9]{2,4})",
+        "manufacturer": r"(?:Mfd\.?|Mfg\.?|Manufactured|Marketed)\s*by\s*[:\-]?\s*(.+)",
+        "dosage": r"\b([0-9]+(?:\.[0-9]+)?\s?(?:mg|mcg|g|ml|IU))\b",
+    }
+    fields = {}
+    for field, pattern in patterns.items():
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            fields[field] = match.group(1).strip()
+    name = next((line for line in lines if sum(c.isalpha() for c in line) >= 3), None)
+    if name:
+        fields["medicineName"] = name
+    return fields
+
 @app.post("/api/ocr/medicine")
 async def ocr_medicine(payload: Dict[str, Any]):
-    # Implement base64 decoding + pytesseract when available
-    if PYTESS_AVAILABLE:
-        logger.info("pytesseract available: wire actual OCR in production")
-    return {
-        "medicineName": "Ibuprofen 400mg",
-        "manufacturer": "HealthCare Ltd.",
-        "batchNumber": "IBU2024A1",
-        "expiryDate": "2026-03-15",
-        "dosage": "400mg",
-        "warnings": "Do not exceed recommended dose"
-    }
+    content = _decode_image(payload)
+    ocr = await _ml_ocr(content)
+    if ocr is None:
+        # Never answer with sample medicine data: batch and expiry must come from this image
+        raise HTTPException(status_code=503, detail="Medicine scanning is temporarily unavailable")
+    return {**_medicine_fields(ocr.get("text") or ""), "text": ocr.get("text") or "", "cache": ocr.get("cache")}
 
 
 @app.post("/api/image/analyze")
@@ -0,0 +1,227 @@
+"""
+Celery queue depth, task lag, runtime and retry metrics for worker autoscaling
+
+Producers stamp each message with its enqueue time. Workers record queue wait,
+runtime and retries into Redis hashes, so every pool and prefork child adds to
+the same numbers. The exporter (worker/app/metrics_exporter.py) reads those
+plus the broker's queue lists and serves them in the Prometheus text format.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional
+import logging
+
+from celery.signals import before_task_publish, task_postrun, task_prerun, task_retry
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "celery:metrics"
+RUNTIME_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+WAIT_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+
+def monitored_queues(app) -> List[str]:
+    """Queues named by the app's routes and queue declarations"""
+    names = {app.conf.task_default_queue}
+    for route in (app.conf.task_routes or {}).values():
+        queue = route.get("queue") if isinstance(route, dict) else None
+        if queue:
+            names.add(getattr(queue, "name", queue))
+    names.update(q.name for q in app.conf.task_queues or ())
+    return sorted(n for n in names if n)
+
+
+def _priority_keys(app, queue: str) -> List[str]:
+    """Redis lists behind one queue: one per priority step"""
+    options = app.conf.broker_transport_options or {}
+    sep = options.get("sep", "\x06\x16")
+    steps = options.get("priority_steps", [0, 3, 6, 9])
+    return [queue] + [f"{queue}{sep}{step}" for step in steps if step]
+
+
+def _bucket_field(value: float, buckets: Iterable[float]) -> str:
+    for bound in buckets:
+        if value <= bound:
+            return str(bound)
+    return "+Inf"
+
+
+class TaskMetricsRecorder:
+    """Adds task observations to Redis; never lets a metrics error fail a task"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def observe(self, name: str, labels: Dict[str, str], value: float, buckets: Iterable[float]):
+        key = f"{PREFIX}:{name}:" + ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.hincrby(key, _bucket_field(value, buckets), 1)
+            pipe.hincrby(key, "count", 1)
+            pipe.hincrbyfloat(key, "sum", value)
+            pipe.sadd(f"{PREFIX}:{name}:series", key)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not record {name} metric: {str(e)}")
+
+    def increment(self, name: str, label: str):
+        try:
+            self.client.hincrby(f"{PREFIX}:{name}", label, 1)
+        except Exception as e:
+            logger.warning(f"Could not record {name} metric: {str(e)}")
+
+
+_recorder: Optional[TaskMetricsRecorder] = None
+_started: Dict[str, float] = {}
+_started_lock = threading.Lock()
+
+
+def _get_recorder(app) -> TaskMetricsRecorder:
+    global _recorder
+    if _recorder is None:
+        import redis
+
+        _recorder = TaskMetricsRecorder(redis.Redis.from_url(app.conf.broker_url))
+    return _recorder
+
+
+def _stamp_enqueued_at(headers=None, **kwargs):
+    if headers is not None and "enqueued_at" not in headers:
+        headers["enqueued_at"] = time.time()
+
+
+def _on_prerun(task_id=None, task=None, **kwargs):
+    with _started_lock:
+        _started[task_id] = time.monotonic()
+    enqueued_at = getattr(task.request, "enqueued_at", None)
+    if enqueued_at is None or getattr(task.request, "eta", None):
+        return  # countdown/eta tasks wait on purpose
+    queue = (task.request.delivery_info or {}).get("routing_key") or "unknown"
+    _get_recorder(task.app).observe("queue_wait", {"queue": queue}, max(time.time() - enqueued_at, 0.0),
+                                    WAIT_BUCKETS)
+
+
+def _on_postrun(task_id=None, task=None, state=None, **kwargs):
+    with _started_lock:
+        started = _started.pop(task_id, None)
+    if started is not None:
+        _get_recorder(task.app).observe("runtime", {"task": task.name, "state": state or "UNKNOWN"},
+                                        time.monotonic() - started, RUNTIME_BUCKETS)
+
+
+def _on_retry(sender=None, request=None, **kwargs):
+    if sender is not None:
+        _get_recorder(sender.app).increment("retries", sender.name)
+
+
+def instrument_tasks():
+    """Connect the publish/run/retry signal handlers (idempotent)"""
+    before_task_publish.connect(_stamp_enqueued_at, weak=False, dispatch_uid="task_metrics.publish")
+    task_prerun.connect(_on_prerun, weak=False, dispatch_uid="task_metrics.prerun")
+    task_postrun.connect(_on_postrun, weak=False, dispatch_uid="task_metrics.postrun")
+    task_retry.connect(_on_retry, weak=False, dispatch_uid="task_metrics.retry")
+
+
+def _oldest_enqueued_at(client, keys: List[str]) -> Optional[float]:
+    oldest = None
+    for raw in _pipelined(client, keys):
+        if not raw:
+            continue
+        try:
+            enqueued_at = json.loads(raw)["headers"].get("enqueued_at")
+        except (ValueError, KeyError, TypeError):
+            continue
+        if enqueued_at is not None and (oldest is None or enqueued_at < oldest):
+            oldest = enqueued_at
+    return oldest
+
+
+def _pipelined(client, keys: List[str]):
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        # Redis queues are LPUSHed and BRPOPed, so the oldest message is last
+        pipe.lindex(key, -1)
+    return pipe.execute()
+
+
+def _histogram(lines: List[str], metric: str, help_text: str, client, name: str, buckets: Iterable[float]):
+    lines.append(f"# HELP {metric} {help_text}")
+    lines.append(f"# TYPE {metric} histogram")
+    for key in sorted(k.decode() if isinstance(k, bytes) else k for k in client.smembers(f"{PREFIX}:{name}:series")):
+        values = {
+            (f.decode() if isinstance(f, bytes) else f): float(v)
+            for f, v in client.hgetall(key).items()
+        }
+        labels = key.split(":", 3)[3]
+        label_text = ",".join(f'{k}="{v}"' for k, v in (pair.split("=", 1) for pair in labels.split(",") if pair))
+        cumulative = 0.0
+        for bound in [str(b) for b in buckets] + ["+Inf"]:
+            cumulative += values.get(bound, 0.0)
+            lines.append(f'{metric}_bucket{{{label_text},le="{bound}"}} {int(cumulative)}')
+        lines.append(f"{metric}_sum{{{label_text}}} {values.get('sum', 0.0)}")
+        lines.append(f"{metric}_count{{{label_text}}} {int(values.get('count', 0))}")
+
+
+def render_metrics(app, client=None, now: Optional[float] = None) -> str:
+    """Current metrics in the Prometheus text exposition format"""
+    import redis
+
+    client = client or redis.Redis.from_url(app.conf.broker_url)
+    now = now or time.time()
+    lines = [
+        "# HELP celery_queue_length Messages waiting in the broker queue (all priorities)",
+        "# TYPE celery_queue_length gauge",
+    ]
+    ages = []
+    for queue in monitored_queues(app):
+        keys = _priority_keys(app, queue)
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.llen(key)
+        lines.append(f'celery_queue_length{{queue="{queue}"}} {sum(pipe.execute())}')
+        oldest = _oldest_enqueued_at(client, keys)
+        ages.append((queue, max(now - oldest, 0.0) if oldest else 0.0))
+
+    lines.append("# HELP celery_queue_oldest_message_age_seconds Age of the oldest waiting message (0 if empty)")
+    lines.append("# TYPE celery_queue_oldest_message_age_seconds gauge")
+    lines.extend(f'celery_queue_oldest_message_age_seconds{{queue="{q}"}} {age:.3f}' for q, age in ages)
+
+    _histogram(lines, "celery_task_queue_wait_seconds", "Time from publish to task start",
+               client, "queue_wait", WAIT_BUCKETS)
+    _histogram(lines, "celery_task_runtime_seconds", "Task execution time",
+               client, "runtime", RUNTIME_BUCKETS)
+
+    lines.append("# HELP celery_task_retries_total Task retries requested")
+    lines.append("# TYPE celery_task_retries_total counter")
+    for task, count in sorted(client.hgetall(f"{PREFIX}:retries").items()):
+        task = task.decode() if isinstance(task, bytes) else task
+        lines.append(f'celery_task_retries_total{{task="{task}"}} {int(count)}')
+    return "\n".join(lines) + "\n"
+
+
+def serve(app, port: int):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            try:
+                body, status = render_metrics(app).encode(), 200
+            except Exception as e:
+                logger.error(f"Error collecting Celery metrics: {str(e)}")
+                body, status = str(e).encode(), 503
+            self.send_response(status)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    logger.info(f"Serving Celery metrics on :{port}/metrics")
+    ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler).serve_forever()
+
@@ -0,0 +1,87 @@
+"""
+Celery queue topology shared by the worker app and the actions server
+
+Every task is routed to a queue served by its own worker pool, so a backlog
+in one workload (a reminder scan, a bulk outbreak fan-out) can't delay
+another. Within a queue, messages carry a priority (Redis transport: lower
+is served first).
+"""
+
+from typing import Any, Dict
+
+from kombu import Exchange, Queue
+
+# Redis emulates priorities with one list per step; tasks are rounded to a step
+PRIORITY_EMERGENCY = 0
+PRIORITY_ALERT = 3
+PRIORITY_ROUTINE = 6
+PRIORITY_BACKGROUND = 9
+
+EMERGENCY_QUEUE = "emergency"
+ALERTS_QUEUE = "alerts"
+REMINDERS_QUEUE = "reminders"
+ANALYSIS_QUEUE = "analysis"
+REWARDS_QUEUE = "rewards"
+MAINTENANCE_QUEUE = "maintenance"
+
+_exchange = Exchange("tasks", type="direct")
+
+TASK_QUEUES = tuple(
+    Queue(name, _exchange, routing_key=name)
+    for name in (EMERGENCY_QUEUE, ALERTS_QUEUE, REMINDERS_QUEUE, ANALYSIS_QUEUE, REWARDS_QUEUE, MAINTENANCE_QUEUE)
+)
+
+TASK_ROUTES: Dict[str, Dict[str, Any]] = {
+    # actions/tasks.py
+    "actions.send_alert_task": {"queue": ALERTS_QUEUE, "priority": PRIORITY_ALERT},
+    "actions.send_bulk_alert_task": {"queue": ALERTS_QUEUE, "priority": PRIORITY_ROUTINE},
+    # actions/services/tasks.py
+    "services.analyze_symptoms_task": {"queue": ANALYSIS_QUEUE, "priority": PRIORITY_ALERT},
+    "services.analyze_symptoms_batch_task": {"queue": ANALYSIS_QUEUE, "priority": PRIORITY_ROUTINE},
+    "services.scan_vaccination_reminders": {"queue": MAINTENANCE_QUEUE, "priority": PRIORITY_ROUTINE},
+    "services.refresh_coverage_snapshot": {"queue": MAINTENANCE_QUEUE, "priority": PRIORITY_BACKGROUND},
+    "services.ensure_partitions": {"queue": MAINTENANCE_QUEUE, "priority": PRIORITY_ROUTINE},
+    "services.export_analytics_data": {"queue": MAINTENANCE_QUEUE, "priority": PRIORITY_BACKGROUND},
+    "services.apply_retention": {"queue": MAINTENANCE_QUEUE, "priority": PRIORITY_BACKGROUND},
+    # worker/app/tasks.py
+    "tasks.send_reminder": {"queue": REMINDERS_QUEUE, "priority": PRIORITY_ROUTINE},
+    "tasks.send_outbreak_alert": {"queue": ALERTS_QUEUE, "priority": PRIORITY_ALERT},
+    "tasks.credit_reward": {"queue": REWARDS_QUEUE, "priority": PRIORITY_BACKGROUND},
+}
+
+# Worker pools (see docker-compose.yml / infra/k8s.yaml): queues, concurrency, prefetch.
+# Latency-sensitive pools prefetch one message per process so nothing waits behind
+# a slow send; throughput pools prefetch more.
+WORKER_POOLS: Dict[str, Dict[str, Any]] = {
+    "alerts": {"queues": [EMERGENCY_QUEUE, ALERTS_QUEUE], "concurrency": 8, "prefetch_multiplier": 1},
+    "reminders": {"queues": [REMINDERS_QUEUE], "concurrency": 8, "prefetch_multiplier": 4},
+    "default": {"queues": [ANALYSIS_QUEUE, REWARDS_QUEUE, MAINTENANCE_QUEUE], "concurrency": 4,
+                "prefetch_multiplier": 1},
+}
+
+
+def emergency_options() -> Dict[str, Any]:
+    """apply_async options sending an alert ahead of every other workload"""
+    return {"queue": EMERGENCY_QUEUE, "priority": PRIORITY_EMERGENCY}
+
+
+def configure_queues(app):
+    """Apply the queue topology to a Celery app (producers and workers alike)"""
+    app.conf.task_queues = TASK_QUEUES
+    app.conf.task_routes = TASK_ROUTES
+    # Anything unrouted lands with the background work, never ahead of alerts
+    app.conf.task_default_queue = MAINTENANCE_QUEUE
+    app.conf.task_default_exchange = _exchange.name
+    app.conf.task_default_routing_key = MAINTENANCE_QUEUE
+    app.conf.task_default_priority = PRIORITY_ROUTINE
+    app.conf.broker_transport_options = {
+        **(app.conf.broker_transport_options or {}),
+        "queue_order_strategy": "priority",
+        "priority_steps": [PRIORITY_EMERGENCY, PRIORITY_ALERT, PRIORITY_ROUTINE, PRIORITY_BACKGROUND],
+        "sep": ":",
+    }
+    # A worker killed mid-send hands the message back instead of losing it;
+    # alert dedupe keeps the redelivery from sending twice
+    app.conf.task_acks_late = True
+    app.conf.task_reject_on_worker_lost = True
+    return app
@@ -1,22 +1,61 @@
 import os
+import json
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from celery import shared_task
-from typing import Dict
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from alert_dedupe import alert_key, get_alert_deduplicator
+from provider_router import get_provider_router
+from rate_limit import countdown, get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
 
+def _pooled_session(pool_size: int) -> requests.Session:
+    """HTTP session keeping up to `pool_size` keep-alive connections per host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
 class TwilioClient:
-    """Thin Twilio client abstraction used by send_alert_task.
+    """Thin Twilio client used by the alert tasks.
 
-    In production, replace the `send` method implementation with Twilio's SDK.
-    For testing, we patch this class to assert calls.
+    Messages go through the Programmable Messaging API over one pooled HTTP
+    session. When `TWILIO_NOTIFY_SERVICE_SID` is set, batches go through
+    Twilio Notify, which accepts up to 10,000 recipients per request.
+    For testing, we patch this class to assert calls or point
+    `TWILIO_API_URL` / `TWILIO_NOTIFY_URL` at a stub server.
     """
 
+    NOTIFY_MAX_BINDINGS = 10000
+
     def __init__(self):
         self.account_sid = os.getenv("TWILIO_ACCOUNT_SID", "")
         self.auth_token = os.getenv("TWILIO_AUTH_TOKEN", "")
         self.from_number = os.getenv("TWILIO_NUMBER", "")
+        self.api_url = os.getenv("TWILIO_API_URL", "https://api.twilio.com").rstrip("/")
+        self.notify_url = os.getenv("TWILIO_NOTIFY_URL", "https://notify.twilio.com").rstrip("/")
+        self.notify_service_sid = os.getenv("TWILIO_NOTIFY_SERVICE_SID", "")
+        self.concurrency = int(os.getenv("TWILIO_BATCH_CONCURRENCY", "8"))
+        self.timeout = float(os.getenv("ALERT_PROVIDER_TIMEOUT_SECONDS", "10"))
+        self.session = _pooled_session(self.concurrency)
+
+    @property
+    def sender(self) -> str:
+        """Sending number; Twilio limits throughput per number."""
+        return self.from_number
+
+    def _check_configured(self):
+        if not self.account_sid or not self.auth_token or not self.from_number:
+            raise Exception("Twilio credentials are not configured")
 
     def send(self, user_id: str, message: str) -> None:
         """Send an alert message to a user via Twilio.
@@ -28,23 +67,86 @@ class TwilioClient:
         Raises:
             Exception: If sending fails for any reason.
         """
-        # Placeholder: implement with Twilio SDK in real deployments.
-        if not self.account_sid or not self.auth_token or not self.from_number:
-            raise Exception("Twilio credentials are not configured")
-        logger.info(f"[Twilio] Sending alert to {user_id}: {message}")
-        # Simulate success; replace with SDK call.
+        self._check_configured()
+        response = self.session.post(
+            f"{self.api_url}/2010-04-01/Accounts/{self.account_sid}/Messages.json",
+            data={"To": user_id, "From": self.from_number, "Body": message},
+            auth=(self.account_sid, self.auth_token),
+            timeout=self.timeout,
+        )
+        if response.status_code >= 300:
+            raise Exception(f"Twilio rejected message ({response.status_code}): {response.text[:200]}")
+        logger.info(f"[Twilio] Sent alert to {user_id}")
         return None
 
+    def send_batch(self, user_ids: List[str], message: str) -> Dict[str, Optional[str]]:
+        """Send one message to many users via Twilio.
+
+        Args:
+            user_ids: Recipient identifiers.
+            message: Message body to send.
+
+        Returns:
+            Dict[str, Optional[str]]: Recipient to error message, or `None`
+            when the message was accepted.
+        """
+        self._check_configured()
+        if self.notify_service_sid:
+            return self._send_notify(user_ids, message)
+
+        def attempt(user_id: str) -> Optional[str]:
+            try:
+                self.send(user_id=user_id, message=message)
+                return None
+            except Exception as e:
+                return str(e)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            return dict(zip(user_ids, pool.map(attempt, user_ids)))
+
+    def _send_notify(self, user_ids: List[str], message: str) -> Dict[str, Optional[str]]:
+        outcomes: Dict[str, Optional[str]] = {}
+        for start in range(0, len(user_ids), self.NOTIFY_MAX_BINDINGS):
+            chunk = user_ids[start:start + self.NOTIFY_MAX_BINDINGS]
+            try:
+                response = self.session.post(
+                    f"{self.notify_url}/v1/Services/{self.notify_service_sid}/Notifications",
+                    data={
+                        "Body": message,
+                        "ToBinding": [json.dumps({"binding_type": "sms", "address": u}) for u in chunk],
+                    },
+                    auth=(self.account_sid, self.auth_token),
+                    timeout=self.timeout,
+                )
+                error = None if response.status_code < 300 else \
+                    f"Twilio Notify rejected batch ({response.status_code}): {response.text[:200]}"
+            except Exception as e:
+                error = str(e)
+            outcomes.update((u, error) for u in chunk)
+        return outcomes
+
 
 class GupshupClient:
-    """Thin Gupshup client abstraction used by send_alert_task.
+    """Thin Gupshup client used by the alert tasks.
 
-    In production, replace the `send` method implementation with Gupshup's API.
-    For testing, we patch this class to assert calls.
+    Uses the Gupshup enterprise SMS gateway, which accepts a comma-separated
+    recipient list and reports a status line per recipient.
+    For testing, we patch this class to assert calls or point
+    `GUPSHUP_API_URL` at a stub server.
     """
 
     def __init__(self):
         self.api_key = os.getenv("GUPSHUP_API_KEY", "")
+        self.user_id = os.getenv("GUPSHUP_USER_ID", "")
+        self.api_url = os.getenv("GUPSHUP_API_URL", "https://enterprise.smsgupshup.com/GatewayAPI/rest")
+        self.batch_size = int(os.getenv("GUPSHUP_BATCH_SIZE", "100"))
+        self.timeout = float(os.getenv("ALERT_PROVIDER_TIMEOUT_SECONDS", "10"))
+        self.session = _pooled_session(4)
+
+    @property
+    def sender(self) -> str:
+        """Gupshup account; Gupshup limits throughput per account."""
+        return self.user_id
 
     def send(self, user_id: str, message: str) -> None:
         """Send an alert message to a user via Gupshup.
@@ -56,46 +158,296 @@ class GupshupClient:
         Raises:
             Exception: If sending fails for any reason.
         """
+        error = self.send_batch([user_id], message)[user_id]
+        if error:
+            raise Exception(error)
+        logger.info(f"[Gupshup] Sent alert to {user_id}")
+        return None
+
+    def send_batch(self, user_ids: List[str], message: str) -> Dict[str, Optional[str]]:
+        """Send one message to many users via Gupshup's bulk gateway.
+
+        Args:
+            user_ids: Recipient identifiers.
+            message: Message body to send.
+
+        Returns:
+            Dict[str, Optional[str]]: Recipient to error message, or `None`
+            when the message was accepted.
+        """
         if not self.api_key:
             raise Exception("Gupshup API key is not configured")
-        logger.info(f"[Gupshup] Sending alert to {user_id}: {message}")
-        return None
+
+        outcomes: Dict[str, Optional[str]] = {}
+        for start in range(0, len(user_ids), self.batch_size):
+            chunk = user_ids[start:start + self.batch_size]
+            try:
+                response = self.session.post(
+                    self.api_url,
+                    data={
+                        "method": "SendMessage",
+                        "send_to": ",".join(chunk),
+                        "msg": message,
+                        "msg_type": "TEXT",
+                        "userid": self.user_id,
+                        "password": self.api_key,
+                        "auth_scheme": "plain",
+                        "v": "1.1",
+                        "format": "text",
+                    },
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+                outcomes.update(self._parse_statuses(chunk, response.text))
+            except Exception as e:
+                outcomes.update((u, str(e)) for u in chunk)
+        return outcomes
+
+    @staticmethod
+    def _parse_statuses(user_ids: List[str], body: str) -> Dict[str, Optional[str]]:
+        """Parse `status | phone | detail` lines; recipients not echoed back failed."""
+        outcomes: Dict[str, Optional[str]] = {u: "No status returned by Gupshup" for u in user_ids}
+        wanted = {u.lstrip("+"): u for u in user_ids}
+        for line in body.splitlines():
+            parts = [p.strip() for p in line.split("|")]
+            if len(parts) >= 2 and parts[1].lstrip("+") in wanted:
+                detail = parts[2] if len(parts) > 2 else ""
+                outcomes[wanted[parts[1].lstrip("+")]] = None if parts[0].lower() == "success" else detail or parts[0]
+        return outcomes
+
+
+# One client per provider class per worker process, so HTTP connections are reused
+_clients: Dict[Any, Any] = {}
+
+
+def _client(cls):
+    client = _clients.get(cls)
+    if client is None:
+        client = _clients[cls] = cls()
+    return client
+
+
+def _requeue_options(task) -> Dict[str, Any]:
+    """Keep a deferred task on the queue and priority it was consumed from."""
+    info = task.request.delivery_info or {}
+    options = {"queue": info["routing_key"]} if info.get("routing_key") else {}
+    if info.get("priority") is not None:
+        options["priority"] = info["priority"]
+    return options
+
+
+def _providers() -> Dict[str, Any]:
+    # Looked up at call time so tests can patch the client classes
+    return {"twilio": TwilioClient, "gupshup": GupshupClient}
 
 
 @shared_task(name="actions.send_alert_task")
-def send_alert_task(user_id: str, message: str) -> Dict[str, str]:
-    """Send an alert to a user with a primary provider and fallback.
+def send_alert_task(user_id: str, message: str, reserved_provider: Optional[str] = None,
+                    idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+    """Send an alert to a user through the healthiest available provider.
+
+    Providers are tried in the order chosen by the provider router: Twilio
+    then Gupshup while both are healthy, skipping a provider whose circuit is
+    open and favouring the healthier one when they degrade. Each attempt's
+    outcome and latency feed back into the router. Raises the last exception
+    if every provider fails.
+
+    Every send takes a token from the provider/sender rate limiter first. A
+    provider that is over its rate is skipped; if no provider could take the
+    message, a token is reserved on the one that frees up first and the task
+    is re-queued with a countdown matching that wait.
 
-    Attempts to send via Twilio first. If it fails, logs a warning and retries
-    with Gupshup as a fallback. Raises the last exception if both providers
-    fail.
+    The delivery is claimed under its idempotency key before sending, so a
+    duplicate enqueue or a redelivered task is dropped instead of paying for
+    the same message twice.
 
     Args:
         user_id: Recipient identifier (e.g., phone number in E.164 format).
         message: The message body to send to the user.
+        reserved_provider: Provider a send token was already reserved on by
+            an earlier, deferred run of this task.
+        idempotency_key: Identifies this alert across retries and duplicate
+            enqueues (e.g., `reminder:<record id>:<due date>`). Defaults to the
+            task id, which only drops redeliveries of this task.
 
     Returns:
-        Dict[str, str]: A result payload containing at least a `status` key and
+        Dict[str, Any]: A result payload containing at least a `status` key and
         the `provider` that handled the message. Example:
-        `{"status": "sent", "provider": "twilio"}`.
+        `{"status": "sent", "provider": "twilio"}`,
+        `{"status": "deferred", "provider": "twilio", "countdown": 2.5}`, or
+        `{"status": "duplicate", "key": "reminder:..."}`.
 
     Raises:
-        Exception: If both the primary and fallback providers fail to send the
-        alert, the last encountered exception is raised.
+        Exception: If all providers fail to send the alert, the last
+        encountered exception is raised.
     """
-    primary = TwilioClient()
+    key = alert_key(idempotency_key, send_alert_task.request.id)
+    dedupe = get_alert_deduplicator()
+    if key and not dedupe.claim(key, [user_id]):
+        return {"status": "duplicate", "key": key}
+
     try:
-        primary.send(user_id=user_id, message=message)
-        logger.info("Alert sent via Twilio")
-        return {"status": "sent", "provider": "twilio"}
-    except Exception as primary_err:
-        logger.warning(f"Primary provider failed (Twilio). Falling back. Error: {primary_err}")
-        fallback = GupshupClient()
+        result = _send_alert(user_id, message, reserved_provider)
+    except Exception:
+        if key:
+            dedupe.release(key, [user_id])
+        raise
+
+    if result["status"] == "sent":
+        if key:
+            dedupe.mark_sent(key, [user_id])
+        return result
+
+    # Deferred: let the re-queued run (a new task id) claim the delivery under the same key
+    if key:
+        dedupe.release(key, [user_id])
+    send_alert_task.apply_async(
+        args=(user_id, message),
+        kwargs={"reserved_provider": result.pop("reserved", None), "idempotency_key": key},
+        countdown=result["countdown"],
+        **_requeue_options(send_alert_task),
+    )
+    return result
+
+
+def _send_alert(user_id: str, message: str, reserved_provider: Optional[str]) -> Dict[str, Any]:
+    router = get_provider_router()
+    limiter = get_rate_limiter()
+    providers = _providers()
+    order = router.order(list(providers))
+    if reserved_provider in order:
+        order.remove(reserved_provider)
+        order.insert(0, reserved_provider)
+
+    last_err = None
+    waits: Dict[str, float] = {}
+    for name in order:
+        client = _client(providers[name])
+        if name != reserved_provider:
+            decision = limiter.acquire(name, client.sender)
+            if not decision.granted:
+                waits[name] = decision.wait_seconds
+                continue
+        started = time.monotonic()
         try:
-            fallback.send(user_id=user_id, message=message)
-            logger.info("Alert sent via Gupshup (fallback)")
-            return {"status": "sent", "provider": "gupshup"}
-        except Exception as fallback_err:
-            logger.error(f"Fallback provider failed (Gupshup). Error: {fallback_err}")
-            # Re-raise the fallback error to surface failure to caller
-            raise fallback_err
+            client.send(user_id=user_id, message=message)
+        except Exception as err:
+            router.record(name, time.monotonic() - started, failures=1)
+            logger.warning(f"Provider {name} failed to send alert. Error: {err}")
+            last_err = err
+            continue
+        router.record(name, time.monotonic() - started, successes=1)
+        logger.info(f"Alert sent via {name}")
+        return {"status": "sent", "provider": name}
+
+    for name in sorted(waits, key=waits.get):
+        decision = limiter.acquire(name, _client(providers[name]).sender, reserve=True)
+        if decision.reserved:
+            logger.info(f"Alert deferred {decision.wait_seconds:.2f}s for {name} rate limit")
+            return {"status": "deferred", "provider": name,
+                    "countdown": countdown(decision.wait_seconds), "reserved": name}
+    if waits and last_err is None:
+        # Backlog beyond the reservation horizon; come back when the first bucket refills
+        name = min(waits, key=waits.get)
+        logger.warning(f"Alert deferred {waits[name]:.2f}s; {name} send backlog is full")
+        return {"status": "deferred", "provider": name, "countdown": countdown(waits[name])}
+
+    logger.error(f"All providers failed to send alert. Error: {last_err}")
+    # Re-raise the last error to surface failure to caller
+    raise last_err
+
+
+@shared_task(name="actions.send_bulk_alert_task")
+def send_bulk_alert_task(user_ids: List[str], message: str, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+    """Send one alert to a chunk of recipients with batch provider calls.
+
+    The whole chunk goes to the batch path of the provider the router ranks
+    first; recipients it fails for are retried as one batch on the next.
+    Partial failures are reported per recipient rather than raised, so a
+    retry never re-sends to recipients that already received the alert.
+
+    Each provider only gets as many recipients as its rate limiter has tokens
+    for. Recipients no provider had capacity for are re-queued as a new task
+    with a countdown until the limiter can take the next burst.
+
+    Recipients are claimed under the alert's idempotency key first; those
+    already sent or being sent by another task are reported as duplicates.
+
+    Args:
+        user_ids: Recipient identifiers (e.g., phone numbers), typically a few
+            hundred per task.
+        message: The message body to send to every recipient.
+        idempotency_key: Identifies this alert across tasks and retries
+            (e.g., `outbreak:<alert id>`). Defaults to the task id.
+
+    Returns:
+        Dict[str, Any]: Counts of `sent`, `failed`, `deferred` and `duplicate`
+        recipients and a `results` mapping of recipient to
+        `{"status", "provider"}` (plus `error` for failures).
+    """
+    results: Dict[str, Dict[str, str]] = {}
+    recipients = list(dict.fromkeys(user_ids))
+    key = alert_key(idempotency_key, send_bulk_alert_task.request.id)
+    dedupe = get_alert_deduplicator()
+    pending = dedupe.claim(key, recipients) if key else recipients
+    claimed = set(pending)
+    for user_id in recipients:
+        if user_id not in claimed:
+            results[user_id] = {"status": "duplicate"}
+    # Recipients a provider had no capacity for, with the wait until it does
+    limited: Dict[str, Dict[str, float]] = {}
+
+    try:
+        router = get_provider_router()
+        limiter = get_rate_limiter()
+        providers = _providers()
+        for name in router.order(list(providers)):
+            if not pending:
+                break
+            client = _client(providers[name])
+            decision = limiter.acquire(name, client.sender, tokens=len(pending), partial=True)
+            batch, rest = pending[:decision.granted], pending[decision.granted:]
+            for user_id in rest:
+                limited.setdefault(user_id, {})[name] = decision.wait_seconds
+            if not batch:
+                continue
+
+            started = time.monotonic()
+            try:
+                outcomes = client.send_batch(batch, message)
+            except Exception as e:
+                logger.warning(f"Provider {name} unavailable for bulk alert: {e}")
+                outcomes = {u: str(e) for u in batch}
+            failures = sum(1 for error in outcomes.values() if error is not None)
+            router.record(name, time.monotonic() - started, successes=len(outcomes) - failures, failures=failures)
+
+            for user_id, error in outcomes.items():
+                results[user_id] = {"status": "sent", "provider": name} if error is None else \
+                    {"status": "failed", "provider": name, "error": error}
+            pending = [u for u in pending if results.get(u, {}).get("status") != "sent"]
+    finally:
+        if key:
+            sent = {u for u in claimed if results.get(u, {}).get("status") == "sent"}
+            dedupe.mark_sent(key, list(sent))
+            dedupe.release(key, [u for u in claimed if u not in sent])
+
+    deferred = [u for u in pending if u in limited]
+    if deferred:
+        waits = {name: wait for u in deferred for name, wait in limited[u].items()}
+        name = min(waits, key=waits.get)
+        send_bulk_alert_task.apply_async(
+            args=(deferred, message), kwargs={"idempotency_key": key},
+            countdown=countdown(waits[name]),
+            **_requeue_options(send_bulk_alert_task),
+        )
+        for user_id in deferred:
+            results[user_id] = {"status": "deferred", "provider": name}
+        logger.info(f"Bulk alert: {len(deferred)} recipients deferred {waits[name]:.2f}s for {name} rate limit")
+
+    counts = {status: sum(1 for r in results.values() if r["status"] == status)
+              for status in ("sent", "failed", "deferred", "duplicate")}
+    logger.info(
+        f"Bulk alert: {counts['sent']} sent, {counts['failed']} failed, "
+        f"{counts['deferred']} deferred, {counts['duplicate']} duplicate"
+    )
+    return {**counts, "results": results}
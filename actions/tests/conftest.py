@@ -0,0 +1,40 @@
+import os
+import sys
+
+# Service modules import siblings as top-level modules (`from config import settings`),
+# matching how the actions server is run from this directory.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fresh_provider_router(monkeypatch):
+    """Provider health is process-wide; give every test a clean in-memory router."""
+    import provider_router
+
+    monkeypatch.setattr(provider_router, "_router", None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limiter(monkeypatch):
+    """Send-rate buckets are process-wide too; start every test with full buckets."""
+    import rate_limit
+
+    monkeypatch.setattr(rate_limit, "_limiter", None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_alert_deduplicator(monkeypatch):
+    """Delivery records are process-wide; don't let one test's alerts dedupe another's."""
+    import alert_dedupe
+
+    monkeypatch.setattr(alert_dedupe, "_deduplicator", None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_admission(monkeypatch):
+    """Admission limits adapt per process; start every test from the configured limits."""
+    import admission
+
+    monkeypatch.setattr(admission, "_controllers", {})
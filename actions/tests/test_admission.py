@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from admission import (
+    CRITICAL, LOW, NORMAL, AdaptiveLimit, AdmissionController, Overloaded, classify_action, classify_text,
+)
+
+
+def test_messages_are_classified_by_keywords_and_action():
+    assert classify_text("My father has chest pain") == CRITICAL
+    assert classify_text("Give me a health quiz") == LOW
+    assert classify_text("Any tips for monsoon?") == LOW
+    assert classify_text("I have a fever") == NORMAL
+    assert classify_action({"next_action": "action_health_tips", "tracker": {"latest_message": {"text": "tips"}}}) == LOW
+    assert classify_action(
+        {"next_action": "action_health_tips", "tracker": {"latest_message": {"text": "urgent, call ambulance"}}}
+    ) == CRITICAL
+
+
+def test_limit_grows_while_fast_and_backs_off_when_slow():
+    limit = AdaptiveLimit(target_latency=1.0, initial=10, min_limit=2)
+    for _ in range(10):
+        limit.record(0.1, ok=True, in_use=10)
+    assert limit.limit == pytest.approx(11, abs=0.1)
+
+    limit.record(2.0, ok=True, in_use=10)
+    limit.record(2.0, ok=True, in_use=10)  # same latency window: cut once
+    assert limit.limit == pytest.approx(11 * 0.8, abs=0.1)
+
+
+def test_low_priority_is_shed_first_and_critical_always_admitted():
+    async def scenario():
+        controller = AdmissionController("chat", AdaptiveLimit(10.0, initial=2), queue_timeout=0.05)
+        release = asyncio.Event()
+        outcomes = []
+
+        async def request(priority):
+            try:
+                async with controller.admit(priority):
+                    await release.wait()
+                outcomes.append((priority, "done"))
+            except Overloaded:
+                outcomes.append((priority, "shed"))
+
+        holders = [asyncio.create_task(request(NORMAL)) for _ in range(2)]
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(request(NORMAL))
+        await request(LOW)
+        critical = asyncio.create_task(request(CRITICAL))
+        await asyncio.sleep(0.1)  # queued normal request times out
+        in_flight = controller.in_flight
+        release.set()
+        await asyncio.gather(*holders, waiting, critical)
+        return outcomes, in_flight, controller.snapshot()
+
+    outcomes, in_flight, snapshot = asyncio.run(scenario())
+
+    assert outcomes[:2] == [(LOW, "shed"), (NORMAL, "shed")]
+    assert sorted(outcomes[2:]) == [(CRITICAL, "done"), (NORMAL, "done"), (NORMAL, "done")]
+    assert in_flight == 3
+    assert snapshot["in_flight"] == 0
+    assert snapshot["shed"] == {CRITICAL: 0, NORMAL: 1, LOW: 1}
+
+
+def test_queued_request_takes_a_released_slot():
+    async def scenario():
+        controller = AdmissionController("actions", AdaptiveLimit(10.0, initial=1), queue_timeout=1.0)
+        order = []
+
+        async def request(name, hold):
+            async with controller.admit(NORMAL):
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        await asyncio.gather(request("first", 0.05), request("second", 0))
+        return order, controller.in_flight
+
+    assert asyncio.run(scenario()) == (["first", "second"], 0)
@@ -0,0 +1,124 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import actions.tasks as tasks_mod
+import alert_dedupe
+from alert_dedupe import AlertDeduplicator, InMemoryDedupeStore, RedisDedupeStore
+
+
+def test_claims_each_delivery_once_and_counts_drops():
+    dedupe = AlertDeduplicator(store=InMemoryDedupeStore(), ttl_seconds=60, lease_seconds=30)
+
+    assert dedupe.claim("outbreak:1", ["+911", "+912"]) == ["+911", "+912"]
+    dedupe.mark_sent("outbreak:1", ["+911"])
+    dedupe.release("outbreak:1", ["+912"])
+
+    assert dedupe.claim("outbreak:1", ["+911", "+912", "+913"]) == ["+912", "+913"]
+    assert dedupe.claim("outbreak:1", ["+912"]) == []
+    assert dedupe.claim("outbreak:2", ["+911"]) == ["+911"]
+    assert dedupe.dropped() == 2
+
+
+def test_stale_claim_is_taken_over_after_lease(monkeypatch):
+    dedupe = AlertDeduplicator(store=InMemoryDedupeStore(), ttl_seconds=600, lease_seconds=30)
+    now = 1000.0
+    monkeypatch.setattr(alert_dedupe.time, "time", lambda: now)
+    dedupe.claim("reminder:1", ["+911"])
+
+    now += 31
+    assert dedupe.claim("reminder:1", ["+911"]) == ["+911"]
+
+
+def fake_redis_store():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    store = RedisDedupeStore.__new__(RedisDedupeStore)
+    store.client = fakeredis.FakeRedis(decode_responses=True)
+    store.prefix = "test"
+    store._claim = store.client.register_script(alert_dedupe.CLAIM_LUA)
+    store._release = store.client.register_script(alert_dedupe.RELEASE_LUA)
+    return store
+
+
+def test_redis_store_matches_in_memory_store():
+    store = fake_redis_store()
+    dedupe = AlertDeduplicator(store=store, ttl_seconds=60, lease_seconds=30)
+
+    assert dedupe.claim("a", ["+911", "+912"]) == ["+911", "+912"]
+    dedupe.mark_sent("a", ["+911"])
+    dedupe.release("a", ["+912"])
+    assert dedupe.claim("a", ["+911", "+912"]) == ["+912"]
+    assert dedupe.dropped() == 1
+    assert 0 < store.client.ttl("test:a") <= 60
+
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_late_release_keeps_a_send_made_after_the_lease_expired(backend, monkeypatch):
+    store = InMemoryDedupeStore() if backend == "memory" else fake_redis_store()
+    dedupe = AlertDeduplicator(store=store, ttl_seconds=600, lease_seconds=30)
+    now = 1000.0
+    monkeypatch.setattr(alert_dedupe.time, "time", lambda: now)
+
+    assert dedupe.claim("a", ["+911"]) == ["+911"]  # run A stalls past its lease
+    now += 31
+    assert dedupe.claim("a", ["+911"]) == ["+911"]  # run B takes over and sends
+    dedupe.mark_sent("a", ["+911"])
+    dedupe.release("a", ["+911"])  # run A finally fails
+
+    assert dedupe.claim("a", ["+911"]) == []
+
+def test_redelivered_alert_task_is_dropped():
+    twilio = MagicMock(sender="+15550000000")
+    with patch.object(tasks_mod, "TwilioClient", return_value=twilio), \
+         patch.object(tasks_mod, "GupshupClient"):
+        first = tasks_mod.send_alert_task("+911", "Dose due", idempotency_key="reminder:7:2026-10-20")
+        again = tasks_mod.send_alert_task("+911", "Dose due", idempotency_key="reminder:7:2026-10-20")
+
+    assert first == {"status": "sent", "provider": "twilio"}
+    assert again == {"status": "duplicate", "key": "reminder:7:2026-10-20"}
+    twilio.send.assert_called_once()
+
+
+def test_failed_alert_can_be_retried():
+    twilio, gupshup = MagicMock(sender="+15550000000"), MagicMock(sender="acct")
+    twilio.send.side_effect = Exception("down")
+    gupshup.send.side_effect = [Exception("down"), None]
+    with patch.object(tasks_mod, "TwilioClient", return_value=twilio), \
+         patch.object(tasks_mod, "GupshupClient", return_value=gupshup):
+        with pytest.raises(Exception):
+            tasks_mod.send_alert_task("+911", "Dose due")
+        result = tasks_mod.send_alert_task("+911", "Dose due")
+
+    assert result == {"status": "sent", "provider": "gupshup"}
+
+
+def test_overlapping_bulk_chunks_send_once_per_recipient():
+    twilio = MagicMock(sender="+15550000000")
+    twilio.send_batch.side_effect = lambda users, message: {u: None for u in users}
+    with patch.object(tasks_mod, "TwilioClient", return_value=twilio), \
+         patch.object(tasks_mod, "GupshupClient"):
+        tasks_mod.send_bulk_alert_task(["+911", "+912"], "Outbreak", idempotency_key="outbreak:9")
+        result = tasks_mod.send_bulk_alert_task(["+912", "+913"], "Outbreak", idempotency_key="outbreak:9")
+
+    assert result["sent"] == 1 and result["duplicate"] == 1
+    assert result["results"]["+912"] == {"status": "duplicate"}
+    assert twilio.send_batch.call_args_list[1].args == (["+913"], "Outbreak")
+    assert alert_dedupe.get_alert_deduplicator().dropped() == 1
+
+
+def test_same_text_without_a_key_is_a_new_alert():
+    twilio = MagicMock(sender="+15550000000")
+    with patch.object(tasks_mod, "TwilioClient", return_value=twilio), \
+         patch.object(tasks_mod, "GupshupClient"):
+        results = [tasks_mod.send_alert_task("+911", "Clinic closed today") for _ in range(2)]
+
+    assert results == [{"status": "sent", "provider": "twilio"}] * 2
+    assert twilio.send.call_count == 2
+
+
+def test_alert_key_falls_back_to_the_task_id():
+    assert alert_dedupe.alert_key("reminder:7", "abc") == "reminder:7"
+    assert alert_dedupe.alert_key(None, "abc") == "task:abc"
+    assert alert_dedupe.alert_key(None, None) is None
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+import async_runtime
+from async_runtime import AsyncRuntime, get_runtime, shared_http_client, shutdown_runtime
+
+
+@pytest.fixture
+def runtime():
+    runtime = AsyncRuntime()
+    yield runtime
+    runtime.close()
+
+
+@pytest.fixture
+def process_runtime():
+    yield
+    shutdown_runtime()
+
+
+def test_calls_share_one_loop_and_http_client(runtime):
+    async def loop_and_client():
+        return asyncio.get_running_loop(), shared_http_client()
+
+    first_loop, first_client = runtime.run(loop_and_client())
+    second_loop, second_client = runtime.run(loop_and_client())
+
+    assert first_loop is second_loop is runtime.loop
+    assert first_client is second_client
+
+
+def test_errors_and_timeouts_reach_the_caller(runtime):
+    async def fail():
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        runtime.run(fail())
+    with pytest.raises(Exception):
+        runtime.run(asyncio.sleep(5), timeout=0.05)
+    assert runtime.run(asyncio.sleep(0, result="still serving")) == "still serving"
+
+
+def test_forked_process_gets_its_own_runtime(monkeypatch, process_runtime):
+    parent = get_runtime()
+    assert get_runtime() is parent
+
+    monkeypatch.setattr(async_runtime.os, "getpid", lambda: parent.pid + 1)
+    child = get_runtime()
+
+    assert child is not parent and child.loop is not parent.loop
+    parent.close()
+
+
+def test_batch_task_runs_requests_concurrently_on_one_service(monkeypatch, process_runtime):
+    from services import tasks as service_tasks
+
+    class SlowService:
+        running = peak = 0
+
+        async def analyze_symptoms(self, symptoms, age=None, gender=None, location=None):
+            SlowService.running += 1
+            SlowService.peak = max(SlowService.peak, SlowService.running)
+            await asyncio.sleep(0.05)
+            SlowService.running -= 1
+            return {"symptoms": symptoms, "location": location}
+
+    monkeypatch.setattr(service_tasks, "_health_service", SlowService())
+    monkeypatch.setattr(service_tasks.settings, "async_task_batch_concurrency", 4)
+    requests = [{"symptoms": [f"fever {i}"], "location": "Pune"} for i in range(10)]
+
+    results = service_tasks.analyze_symptoms_batch_task(requests)
+
+    assert [r["symptoms"] for r in results] == [[f"fever {i}"] for i in range(10)]
+    assert SlowService.peak == 4
+    assert service_tasks.analyze_symptoms_task(["cough"])["symptoms"] == ["cough"]
@@ -0,0 +1,109 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+import actions.tasks as tasks_mod
+import rate_limit
+
+
+class StubProvider(BaseHTTPRequestHandler):
+    """Local stand-in for the Twilio, Twilio Notify and Gupshup endpoints."""
+
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+        StubProvider.requests.append((self.path, self.client_address[1], form))
+
+        if self.path.endswith("/Messages.json"):
+            to = form["To"][0]
+            self.reply(400 if to.endswith("9") else 201, json.dumps({"sid": "SM1", "to": to}))
+        elif "/Notifications" in self.path:
+            self.reply(201, json.dumps({"sid": "NT1"}))
+        elif self.path == "/gupshup":
+            lines = [
+                f"error | {n} | Invalid number" if n.endswith("99") else f"success | {n} | 3046"
+                for n in form["send_to"][0].split(",")
+            ]
+            self.reply(200, "\n".join(lines))
+        else:
+            self.reply(404, "")
+
+    def reply(self, status, body):
+        payload = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubProvider)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    StubProvider.requests = []
+    for key, value in {
+        "TWILIO_ACCOUNT_SID": "AC123", "TWILIO_AUTH_TOKEN": "token", "TWILIO_NUMBER": "+15550000000",
+        "TWILIO_API_URL": base, "TWILIO_NOTIFY_URL": base, "TWILIO_BATCH_CONCURRENCY": "4",
+        "GUPSHUP_API_KEY": "key", "GUPSHUP_API_URL": f"{base}/gupshup", "GUPSHUP_BATCH_SIZE": "50",
+    }.items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.delenv("TWILIO_NOTIFY_SERVICE_SID", raising=False)
+    monkeypatch.setattr(tasks_mod, "_clients", {})
+    # Send rates are covered in test_rate_limit.py
+    monkeypatch.setattr(rate_limit, "_limiter", rate_limit.ProviderRateLimiter(limits={}))
+    yield StubProvider
+    server.shutdown()
+    server.server_close()
+
+
+def test_bulk_alert_reports_per_recipient_outcomes_with_fallback(provider):
+    recipients = [f"+9198765{i:05d}" for i in range(100)]
+
+    result = tasks_mod.send_bulk_alert_task(recipients, "Dengue alert")
+
+    results = result["results"]
+    assert results["+919876500001"] == {"status": "sent", "provider": "twilio"}
+    assert results["+919876500009"] == {"status": "sent", "provider": "gupshup"}
+    assert results["+919876500099"] == {"status": "failed", "provider": "gupshup", "error": "Invalid number"}
+    assert result["sent"] == 99 and result["failed"] == 1
+
+    # Only Twilio's failures were retried, as a single Gupshup batch
+    gupshup_calls = [form for path, _, form in provider.requests if path == "/gupshup"]
+    assert len(gupshup_calls) == 1
+    assert len(gupshup_calls[0]["send_to"][0].split(",")) == 10
+
+
+def test_bulk_alert_reuses_pooled_clients_and_connections(provider):
+    recipients = [f"+9198765{i:05d}" for i in range(0, 80, 2)]
+
+    tasks_mod.send_bulk_alert_task(recipients[:20], "first")
+    client = tasks_mod._clients[tasks_mod.TwilioClient]
+    tasks_mod.send_bulk_alert_task(recipients[20:], "second")
+
+    assert tasks_mod._clients[tasks_mod.TwilioClient] is client
+    twilio_calls = [port for path, port, _ in provider.requests if path.endswith("/Messages.json")]
+    assert len(twilio_calls) == 40
+    assert len(set(twilio_calls)) <= 4
+
+
+def test_bulk_alert_uses_twilio_notify_batch_when_configured(provider, monkeypatch):
+    monkeypatch.setenv("TWILIO_NOTIFY_SERVICE_SID", "IS1")
+    recipients = [f"+9198765{i:05d}" for i in range(300)]
+
+    result = tasks_mod.send_bulk_alert_task(recipients, "Dengue alert")
+
+    assert result["sent"] == 300
+    [(path, _, form)] = provider.requests
+    assert path == "/v1/Services/IS1/Notifications"
+    assert len(form["ToBinding"]) == 300
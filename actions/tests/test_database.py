@@ -0,0 +1,10 @@
+from database import _async_database_url
+
+
+def test_async_url_swaps_sync_postgres_driver():
+    assert _async_database_url("postgresql://u:p@db:5432/app") == "postgresql+asyncpg://u:p@db:5432/app"
+    assert _async_database_url("postgresql+psycopg2://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+
+
+def test_async_url_keeps_explicit_async_driver():
+    assert _async_database_url("postgresql+asyncpg://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
@@ -0,0 +1,100 @@
+import csv
+import gzip
+import json
+import uuid
+from collections import namedtuple
+from datetime import datetime
+
+import pytest
+
+from database import OutbreakAlert
+from services.export import DataExportService
+
+Row = namedtuple("Row", [c.name for c in OutbreakAlert.__table__.columns])
+
+
+def alert(created_at, **overrides):
+    values = dict(
+        id=uuid.uuid4(), disease_name="Dengue", location="Pune", cases_count=12,
+        severity_level="high", alert_message="", precautions=["Use nets"],
+        source="IDSP", verified=True, created_at=created_at
+    )
+    values.update(overrides)
+    return Row(**values)
+
+
+@pytest.fixture
+def rows():
+    return [alert(datetime(2025, 1, 30, 12)), alert(datetime(2025, 1, 31, 8)), alert(datetime(2025, 2, 2, 9))]
+
+
+def fake_stream(batches):
+    def stream(query):
+        yield from batches
+    return stream
+
+
+def test_parquet_export_partitions_by_month_and_advances_watermark(tmp_path, rows):
+    pq = pytest.importorskip("pyarrow.parquet")
+    service = DataExportService(output_dir=str(tmp_path), file_format="parquet")
+    service._stream = fake_stream([rows[:2], rows[2:]])
+
+    result = service.export_table("outbreak_alerts")
+
+    assert result["rows"] == 3
+    assert [p.split("/")[-2] for p in result["files"]] == ["month=2025-01", "month=2025-02"]
+    january = pq.read_table(result["files"][0]).to_pylist()
+    assert [r["id"] for r in january] == [str(rows[0].id), str(rows[1].id)]
+    assert json.loads(january[0]["precautions"]) == ["Use nets"]
+
+    watermark = json.loads((tmp_path / "outbreak_alerts" / "_watermark.json").read_text())
+    assert watermark == {"created_at": rows[2].created_at.isoformat(), "id": str(rows[2].id)}
+    assert service._load_watermark(str(tmp_path / "outbreak_alerts")) == (rows[2].created_at, rows[2].id)
+
+
+def test_csv_export_is_gzipped_and_empty_runs_write_nothing(tmp_path, rows):
+    service = DataExportService(output_dir=str(tmp_path), file_format="csv")
+    service._stream = fake_stream([rows])
+    [january, february] = service.export_table("outbreak_alerts")["files"]
+
+    with gzip.open(january, "rt", newline="") as f:
+        records = list(csv.DictReader(f))
+    assert [r["created_at"] for r in records] == ["2025-01-30T12:00:00", "2025-01-31T08:00:00"]
+
+    service._stream = fake_stream([])
+    assert service.export_table("outbreak_alerts") == {
+        "rows": 0, "files": [], "watermark": rows[2].created_at.isoformat()
+    }
+
+
+def test_failed_export_leaves_no_partial_files(tmp_path, rows):
+    service = DataExportService(output_dir=str(tmp_path), file_format="csv")
+
+    def broken(query):
+        yield rows[:1]
+        raise RuntimeError("connection lost")
+
+    service._stream = broken
+    with pytest.raises(RuntimeError):
+        service.export_table("outbreak_alerts")
+
+    assert not list((tmp_path / "outbreak_alerts").rglob("*.csv.gz*"))
+    assert not (tmp_path / "outbreak_alerts" / "_watermark.json").exists()
+
+
+def test_run_failing_after_a_published_part_resumes_after_it(tmp_path, rows):
+    service = DataExportService(output_dir=str(tmp_path), file_format="csv")
+
+    def broken(query):
+        yield rows
+        raise RuntimeError("connection lost")
+
+    service._stream = broken
+    with pytest.raises(RuntimeError):
+        service.export_table("outbreak_alerts")
+
+    table_dir = tmp_path / "outbreak_alerts"
+    assert [p.parent.name for p in table_dir.rglob("*.csv.gz")] == ["month=2025-01"]
+    assert not list(table_dir.rglob("*.tmp"))
+    # January was published, so the watermark is past it; February is exported again
+    assert service._load_watermark(str(table_dir)) == (rows[1].created_at, rows[1].id)
@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from pool_metrics import InstrumentedQueuePool, instrument_pool
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=1, pool_timeout=0.05
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_pool_metrics_count_checkouts_overflow_and_timeouts(engine):
+    metrics = instrument_pool(engine.pool, "test")
+
+    first = engine.connect()
+    second = engine.connect()
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+
+    snapshot = metrics.snapshot()
+    assert snapshot["checkouts"] == 2
+    assert snapshot["overflow_events"] == 1
+    assert snapshot["timeouts"] == 1
+    assert snapshot["checked_out"] == 2
+
+    first.close()
+    second.close()
+    assert metrics.snapshot()["checked_out"] == 0
+
+
+def test_pool_metrics_survive_dispose(engine):
+    metrics = instrument_pool(engine.pool, "test")
+    engine.dispose()
+
+    engine.connect().close()
+
+    assert engine.pool.metrics is metrics
+    assert metrics.snapshot()["checkouts"] == 1
@@ -0,0 +1,70 @@
+import random
+import time
+
+from provider_router import InMemoryHealthStore, ProviderRouter
+
+
+def make_router(**overrides):
+    options = dict(
+        store=InMemoryHealthStore(), window_seconds=60, min_samples=10,
+        failure_threshold=0.5, healthy_success_rate=0.9, cooldown=30.0, rng=random.Random(7),
+    )
+    options.update(overrides)
+    return ProviderRouter(**options)
+
+
+def test_healthy_providers_keep_configured_order():
+    router = make_router()
+    router.record("twilio", latency=2.0, successes=50)
+    router.record("gupshup", latency=0.5, successes=50)
+
+    assert router.order(["twilio", "gupshup"]) == ["twilio", "gupshup"]
+
+
+def test_sustained_failures_open_the_circuit():
+    router = make_router()
+    for _ in range(9):
+        router.record("twilio", latency=0.2, failures=1)
+    assert router.order(["twilio", "gupshup"])[0] in ("twilio", "gupshup")
+    assert router.health(["twilio"])["twilio"]["circuit"] == "closed"
+
+    router.record("twilio", latency=0.2, failures=1)
+
+    assert router.health(["twilio"])["twilio"]["circuit"] == "open"
+    assert router.order(["twilio", "gupshup"]) == ["gupshup"]
+
+
+def test_half_open_probe_closes_circuit_on_success(monkeypatch):
+    router = make_router()
+    router.record("twilio", latency=0.2, failures=20)
+    assert router.order(["twilio", "gupshup"]) == ["gupshup"]
+
+    later = time.time() + 31
+    monkeypatch.setattr("provider_router.time.time", lambda: later)
+    assert "twilio" in router.order(["twilio", "gupshup"])
+    # Only one caller gets the probe
+    assert router.order(["twilio", "gupshup"]) == ["gupshup"]
+
+    router.record("twilio", latency=0.2, successes=1)
+
+    assert router.health(["twilio"])["twilio"]["circuit"] == "closed"
+    assert router.order(["twilio", "gupshup"]) == ["twilio", "gupshup"]
+
+
+def test_degraded_provider_gets_less_traffic():
+    router = make_router(failure_threshold=0.9)
+    router.record("twilio", latency=30.0, successes=60, failures=40)
+    router.record("gupshup", latency=30.0, successes=100)
+
+    firsts = [router.order(["twilio", "gupshup"])[0] for _ in range(500)]
+
+    assert firsts.count("gupshup") > 400
+    assert "twilio" in firsts
+
+
+def test_all_circuits_open_falls_back_to_configured_order():
+    router = make_router()
+    router.record("twilio", latency=0.2, failures=20)
+    router.record("gupshup", latency=0.2, failures=20)
+
+    assert router.order(["twilio", "gupshup"]) == ["twilio", "gupshup"]
@@ -0,0 +1,125 @@
+"""
+Query-plan regression tests for migrations/ indexes and partitions.
+
+Needs a disposable Postgres: set TEST_DATABASE_URL to run. Migrations are
+applied into a throwaway schema, seeded with generate_series and analyzed,
+then EXPLAIN is checked for index scans and partition pruning.
+"""
+
+import json
+import os
+import uuid
+from datetime import date
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+MIGRATIONS = Path(__file__).resolve().parents[2] / "migrations"
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+SEED = """
+INSERT INTO vaccination_records (user_id, vaccine_name, date_administered)
+SELECT md5((g % 5000)::text)::uuid, (ARRAY['BCG', 'OPV', 'DTP', 'Measles'])[1 + g % 4], now() - g * interval '1 hour'
+FROM generate_series(1, 50000) g;
+
+SELECT ensure_monthly_partitions('outbreak_alerts', 3, (now() - interval '24 months')::date);
+INSERT INTO outbreak_alerts (disease_name, location, cases_count, verified, created_at)
+SELECT 'Dengue', 'District ' || (g % 50), g % 100, g % 100 = 0, now() - (g % 730) * interval '1 day' - (g % 24) * interval '1 hour'
+FROM generate_series(1, 200000) g;
+
+SELECT ensure_monthly_partitions('symptom_reports', 3, (now() - interval '24 months')::date);
+INSERT INTO symptom_reports (user_id, symptoms, severity, location, created_at)
+SELECT md5((g % 5000)::text)::uuid, '["fever"]'::jsonb, 'mild', 'District ' || (g % 50), now() - (g % 730) * interval '1 day'
+FROM generate_series(1, 200000) g;
+
+ANALYZE;
+"""
+
+
+@pytest.fixture(scope="module")
+def conn():
+    engine = create_engine(TEST_DATABASE_URL)
+    schema = f"plan_test_{uuid.uuid4().hex[:8]}"
+    with engine.connect() as connection:
+        connection.exec_driver_sql(f"CREATE SCHEMA {schema}")
+        connection.exec_driver_sql(f"SET search_path TO {schema}, public")
+        for migration in sorted(MIGRATIONS.glob("*.sql")):
+            connection.exec_driver_sql(migration.read_text())
+        connection.exec_driver_sql(SEED)
+        connection.commit()
+        try:
+            yield connection
+        finally:
+            connection.rollback()
+            connection.exec_driver_sql(f"DROP SCHEMA {schema} CASCADE")
+            connection.commit()
+    engine.dispose()
+
+
+def plan_nodes(conn, sql, params=None):
+    raw = conn.execute(text("EXPLAIN (FORMAT JSON) " + sql), params or {}).scalar_one()
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    nodes, stack = [], [plan]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node.get("Plans", []))
+    return nodes
+
+
+def scans(nodes):
+    return [n for n in nodes if "Relation Name" in n or "Index Name" in n]
+
+
+def uses_index(nodes, fragment):
+    return any(fragment in n.get("Index Name", "") for n in nodes)
+
+
+def month_suffix(months_ago):
+    today = date.today()
+    year, month = divmod(today.year * 12 + today.month - 1 - months_ago, 12)
+    return f"_p{year}{month + 1:02d}"
+
+
+def test_vaccination_history_uses_user_index(conn):
+    nodes = plan_nodes(
+        conn,
+        "SELECT * FROM vaccination_records WHERE user_id = :user_id ORDER BY date_administered DESC",
+        {"user_id": str(uuid.UUID(bytes=bytes(16)))}
+    )
+    assert uses_index(nodes, "ix_vaccination_records_user_administered")
+
+
+def test_dose_count_uses_vaccine_expression_index(conn):
+    nodes = plan_nodes(
+        conn,
+        "SELECT count(id) FROM vaccination_records WHERE user_id = :user_id AND lower(vaccine_name) = 'opv'",
+        {"user_id": str(uuid.UUID(bytes=bytes(16)))}
+    )
+    assert uses_index(nodes, "ix_vaccination_records_user_vaccine")
+
+
+def test_recent_verified_outbreaks_prune_partitions_and_use_index(conn):
+    nodes = plan_nodes(
+        conn,
+        "SELECT * FROM outbreak_alerts WHERE verified = true AND created_at >= now() - interval '30 days'"
+    )
+    scanned = {n.get("Relation Name") for n in scans(nodes)} - {None}
+    old_partitions = {f"outbreak_alerts{month_suffix(m)}" for m in range(3, 25)}
+
+    assert scanned and not scanned & old_partitions
+    assert uses_index(nodes, "verified_created_at")
+
+
+def test_symptom_reports_by_district_use_location_index(conn):
+    nodes = plan_nodes(
+        conn,
+        "SELECT count(*) FROM symptom_reports WHERE location = 'District 7' AND created_at >= now() - interval '7 days'"
+    )
+    scanned = {n.get("Relation Name") for n in scans(nodes)} - {None}
+
+    assert f"symptom_reports{month_suffix(12)}" not in scanned
+    assert uses_index(nodes, "location_created_at")
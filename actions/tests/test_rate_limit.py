@@ -0,0 +1,132 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import actions.tasks as tasks_mod
+import rate_limit
+from rate_limit import InMemoryBucketStore, ProviderRateLimiter, RedisBucketStore, _take
+
+
+def use_limits(monkeypatch, **limits):
+    limiter = ProviderRateLimiter(store=InMemoryBucketStore(), limits=limits, max_reservation_seconds=60)
+    monkeypatch.setattr(rate_limit, "_limiter", limiter)
+    return limiter
+
+
+def test_bucket_refills_at_rate_up_to_burst():
+    tokens, decision = _take(5, 0, rate=2, capacity=5, requested=5, partial=False, max_debt=0)
+    assert decision.granted == 5 and tokens == 0
+
+    tokens, decision = _take(tokens, 0.25, rate=2, capacity=5, requested=1, partial=False, max_debt=0)
+    assert decision.granted == 0
+    assert decision.wait_seconds == pytest.approx(0.25)
+
+    tokens, decision = _take(tokens, 100, rate=2, capacity=5, requested=1, partial=False, max_debt=0)
+    assert decision.granted == 1 and tokens == 4
+
+
+def test_partial_grant_waits_for_next_burst():
+    tokens, decision = _take(3, 0, rate=1, capacity=4, requested=10, partial=True, max_debt=0)
+
+    assert decision.granted == 3
+    assert decision.wait_seconds == pytest.approx(4)
+
+
+def test_reservations_queue_up_behind_each_other():
+    tokens, first = _take(0, 0, rate=2, capacity=5, requested=1, partial=False, max_debt=2)
+    tokens, second = _take(tokens, 0, rate=2, capacity=5, requested=1, partial=False, max_debt=2)
+    tokens, third = _take(tokens, 0, rate=2, capacity=5, requested=1, partial=False, max_debt=2)
+
+    assert first.reserved and first.wait_seconds == pytest.approx(0.5)
+    assert second.reserved and second.wait_seconds == pytest.approx(1.0)
+    # Beyond the reservation horizon: refused without booking anything
+    assert not third.reserved and third.granted == 0
+    assert tokens == -2
+
+
+def test_buckets_are_per_provider_and_sender():
+    limiter = ProviderRateLimiter(store=InMemoryBucketStore(), limits={"twilio": (1, 1)})
+
+    assert limiter.acquire("twilio", "+15550000001").granted == 1
+    assert limiter.acquire("twilio", "+15550000001").granted == 0
+    assert limiter.acquire("twilio", "+15550000002").granted == 1
+    assert limiter.acquire("gupshup", "acct").granted == 1
+
+
+def test_limiter_fails_open_when_store_is_down():
+    store = MagicMock()
+    store.take.side_effect = ConnectionError("redis down")
+    limiter = ProviderRateLimiter(store=store, limits={"twilio": (1, 1)})
+
+    assert limiter.acquire("twilio", "+15550000001", tokens=3).granted == 3
+
+
+def test_redis_script_matches_in_memory_bucket():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    store = RedisBucketStore.__new__(RedisBucketStore)
+    store.client = fakeredis.FakeRedis(decode_responses=True)
+    store.prefix = "test"
+    store._script = store.client.register_script(rate_limit.TOKEN_BUCKET_LUA)
+
+    assert store.take("twilio:a", 1, 3, 2, False, 0).granted == 2
+    short = store.take("twilio:a", 1, 3, 2, False, 0)
+    assert short.granted == 0 and 0.9 < short.wait_seconds <= 1.0
+    partial = store.take("twilio:a", 1, 3, 5, True, 0)
+    assert partial.granted == 1 and partial.wait_seconds == pytest.approx(3, abs=0.1)
+    reserved = store.take("twilio:a", 1, 3, 1, False, 10)
+    assert reserved.reserved and reserved.wait_seconds == pytest.approx(1, abs=0.1)
+
+
+def mock_providers():
+    twilio, gupshup = MagicMock(), MagicMock()
+    twilio.sender, gupshup.sender = "+15550000000", "acct"
+    return patch.object(tasks_mod, "TwilioClient", return_value=twilio), \
+        patch.object(tasks_mod, "GupshupClient", return_value=gupshup), twilio, gupshup
+
+
+def test_alert_spills_to_fallback_then_defers_with_reservation(monkeypatch):
+    use_limits(monkeypatch, twilio=(1, 1), gupshup=(0.5, 1))
+    twilio_patch, gupshup_patch, twilio, gupshup = mock_providers()
+
+    with twilio_patch, gupshup_patch, patch.object(tasks_mod.send_alert_task, "apply_async") as defer:
+        assert tasks_mod.send_alert_task("+911", "m")["provider"] == "twilio"
+        assert tasks_mod.send_alert_task("+912", "m")["provider"] == "gupshup"
+        result = tasks_mod.send_alert_task("+913", "m")
+
+    assert result["status"] == "deferred" and result["provider"] == "twilio"
+    assert 0.9 < result["countdown"] <= 1.0
+    defer.assert_called_once()
+    assert defer.call_args.kwargs["args"] == ("+913", "m")
+    assert defer.call_args.kwargs["kwargs"] == {"reserved_provider": "twilio", "idempotency_key": None}
+    assert twilio.send.call_count == 1 and gupshup.send.call_count == 1
+
+
+def test_reserved_run_sends_without_taking_another_token(monkeypatch):
+    limiter = use_limits(monkeypatch, twilio=(1, 1), gupshup=(1, 1))
+    twilio_patch, gupshup_patch, twilio, gupshup = mock_providers()
+    limiter.acquire("twilio", "+15550000000")
+
+    with twilio_patch, gupshup_patch:
+        result = tasks_mod.send_alert_task("+913", "m", reserved_provider="twilio")
+
+    assert result == {"status": "sent", "provider": "twilio"}
+    twilio.send.assert_called_once_with(user_id="+913", message="m")
+    gupshup.send.assert_not_called()
+
+
+def test_bulk_alert_sends_within_limits_and_defers_the_rest(monkeypatch):
+    use_limits(monkeypatch, twilio=(1, 5), gupshup=(1, 3))
+    twilio_patch, gupshup_patch, twilio, gupshup = mock_providers()
+    twilio.send_batch.side_effect = lambda users, message: {u: None for u in users}
+    gupshup.send_batch.side_effect = lambda users, message: {u: None for u in users}
+    recipients = [f"+91{i}" for i in range(10)]
+
+    with twilio_patch, gupshup_patch, patch.object(tasks_mod.send_bulk_alert_task, "apply_async") as defer:
+        result = tasks_mod.send_bulk_alert_task(recipients, "m")
+
+    assert (result["sent"], result["failed"], result["deferred"]) == (8, 0, 2)
+    twilio.send_batch.assert_called_once_with(recipients[:5], "m")
+    gupshup.send_batch.assert_called_once_with(recipients[5:8], "m")
+    assert defer.call_args.kwargs["args"] == (recipients[8:], "m")
+    assert 1.9 < defer.call_args.kwargs["countdown"] <= 2.0
@@ -0,0 +1,106 @@
+"""
+Read/write routing tests. Routing logic runs against stub engines; the
+integration test needs two Postgres instances (TEST_DATABASE_URL and
+TEST_REPLICA_DATABASE_URL) and is skipped otherwise.
+"""
+
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database import ReadRouter, _async_database_url
+
+
+class FakeRedis:
+    def __init__(self):
+        self.keys = set()
+
+    async def set(self, key, value, px=None):
+        self.keys.add(key)
+
+    async def exists(self, key):
+        return key in self.keys
+
+
+class StubEngine:
+    pass
+
+
+def make_router(lags, redis_client=None):
+    primary, replicas = StubEngine(), [StubEngine() for _ in lags]
+    router = ReadRouter(
+        primary, replicas, max_lag=5.0, check_interval=60.0, sticky_seconds=10.0,
+        redis_client=redis_client or FakeRedis()
+    )
+    probes = []
+
+    async def probe(engine):
+        probes.append(engine)
+        return lags[replicas.index(engine)]
+
+    router._probe_lag = probe
+    return router, primary, replicas, probes
+
+
+def test_reads_go_to_healthy_replica_and_lag_is_cached():
+    router, primary, replicas, probes = make_router([0.5])
+
+    assert asyncio.run(router.engine_for()) is replicas[0]
+    assert asyncio.run(router.engine_for()) is replicas[0]
+    assert len(probes) == 1
+
+
+def test_lagging_replicas_fall_back_to_primary():
+    router, primary, replicas, _ = make_router([30.0, 0.1])
+
+    chosen = {asyncio.run(router.engine_for()) for _ in range(4)}
+    assert chosen == {replicas[1]}
+
+    router, primary, replicas, _ = make_router([30.0, 60.0])
+    assert asyncio.run(router.engine_for()) is primary
+
+
+def test_recent_writer_reads_from_primary():
+    redis_client = FakeRedis()
+    router, primary, replicas, _ = make_router([0.0], redis_client)
+
+    asyncio.run(router.mark_write("user-1"))
+    assert asyncio.run(router.engine_for("user-1")) is primary
+    assert asyncio.run(router.engine_for("user-2")) is replicas[0]
+
+    # Another API process only sees the shared Redis mark
+    other, other_primary, _, _ = make_router([0.0], redis_client)
+    assert asyncio.run(other.engine_for("user-1")) is other_primary
+
+
+@pytest.mark.skipif(
+    not (os.getenv("TEST_DATABASE_URL") and os.getenv("TEST_REPLICA_DATABASE_URL")),
+    reason="TEST_DATABASE_URL and TEST_REPLICA_DATABASE_URL not set"
+)
+def test_sessions_route_between_two_postgres_instances():
+    async def scenario():
+        primary = create_async_engine(_async_database_url(os.environ["TEST_DATABASE_URL"]))
+        replica = create_async_engine(_async_database_url(os.environ["TEST_REPLICA_DATABASE_URL"]))
+        router = ReadRouter(primary, [replica], max_lag=5.0, check_interval=0.0,
+                            sticky_seconds=10.0, redis_client=FakeRedis())
+        port = "SELECT coalesce(host(inet_server_addr()), 'local') || ':' || inet_server_port()"
+        try:
+            async with primary.connect() as conn:
+                primary_port = await conn.scalar(text(port))
+            async with replica.connect() as conn:
+                replica_port = await conn.scalar(text(port))
+
+            async with router.session() as db:
+                assert await db.scalar(text(port)) == replica_port
+
+            await router.mark_write("user-1")
+            async with router.session("user-1") as db:
+                assert await db.scalar(text(port)) == primary_port
+        finally:
+            await primary.dispose()
+            await replica.dispose()
+
+    asyncio.run(scenario())
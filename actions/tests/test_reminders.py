@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from services.reminders import VaccinationReminderService
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def set(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+
+    def execute(self):
+        return [self.redis.set(*args, **kwargs) for args, kwargs in self.calls]
+
+
+@pytest.fixture
+def service_with_dues(monkeypatch):
+    def build(due_dates):
+        enqueued = []
+        service = VaccinationReminderService(redis_client=FakeRedis())
+
+        def scan_bucket(start, end):
+            rows = [SimpleNamespace(id=i, next_due_date=due) for i, due in enumerate(due_dates) if start <= due < end]
+            rows = service._not_yet_enqueued(rows)
+            enqueued.extend(row.next_due_date for row in rows)
+            return len(rows)
+
+        monkeypatch.setattr(service, "_scan_bucket", scan_bucket)
+        return service, enqueued
+
+    return build
+
+
+def test_scan_enqueues_each_due_record_once(service_with_dues):
+    now = datetime(2025, 3, 1, 10, 30)
+    dues = [now + timedelta(hours=h) for h in (1, 5, 5.2, 5.4)] + [now + timedelta(days=3)]
+    service, enqueued = service_with_dues(dues)
+
+    first = service.scan(now)
+    second = service.scan(now + timedelta(minutes=15))
+
+    assert first["enqueued"] == 4
+    assert second["enqueued"] == 0
+    assert sorted(enqueued) == dues[:4]
+
+
+def test_scan_catches_up_missed_buckets(service_with_dues):
+    now = datetime(2025, 3, 1, 10, 30)
+    service, enqueued = service_with_dues([now + timedelta(hours=26), now + timedelta(hours=29)])
+
+    service.scan(now)
+    assert enqueued == []
+
+    result = service.scan(now + timedelta(hours=6))
+    assert result["enqueued"] == 2
+    assert result["buckets"] == 6
+
+
+def test_records_written_after_their_bucket_was_scanned_still_get_a_reminder(service_with_dues):
+    now = datetime(2025, 3, 1, 10, 30)
+    dues = []
+    service, enqueued = service_with_dues(dues)
+    service.scan(now)  # every bucket up to now + lead is behind the watermark
+
+    # A dose recorded now that falls due within the lead time, and one already overdue
+    dues.extend([now + timedelta(hours=3), now - timedelta(hours=2)])
+    result = service.scan(now + timedelta(minutes=15))
+    again = service.scan(now + timedelta(minutes=30))
+
+    assert result["enqueued"] == 2
+    assert again["enqueued"] == 0
+    assert sorted(enqueued) == sorted(dues)
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from services.maintenance import RetentionService, expired_partitions, retention_policies
+
+
+def test_only_fully_expired_monthly_partitions_are_dropped():
+    partitions = [
+        "symptom_reports_p202411", "symptom_reports_p202412", "symptom_reports_p202501",
+        "symptom_reports_default", "symptom_reports_p2025", "other_p202401",
+    ]
+
+    assert expired_partitions("symptom_reports", partitions, datetime(2025, 1, 15)) == [
+        "symptom_reports_p202411", "symptom_reports_p202412"
+    ]
+    assert expired_partitions("symptom_reports", partitions, datetime(2025, 1, 1)) == [
+        "symptom_reports_p202411", "symptom_reports_p202412"
+    ]
+
+
+def test_retention_drops_partitions_then_deletes_remaining_rows_in_batches(monkeypatch):
+    [policy] = [p for p in retention_policies() if p.table == "outbreak_alerts"]
+    service = RetentionService([policy])
+    service.batch_size = 100
+    calls = []
+    sizes = iter([10_000, 4_000])
+    batches = iter([100, 100, 37])
+
+    monkeypatch.setattr(service, "_table_bytes", lambda table: next(sizes))
+    monkeypatch.setattr(service, "_partitions", lambda table: ["outbreak_alerts_p202001", "outbreak_alerts_p209912"])
+    monkeypatch.setattr(service, "_drop_partition", lambda p, name: calls.append(("drop", name)))
+    monkeypatch.setattr(service, "_delete_batch", lambda p, cutoff: calls.append(("delete",)) or next(batches))
+    monkeypatch.setattr(service, "_vacuum", lambda table: calls.append(("vacuum", table)))
+    monkeypatch.setattr("services.maintenance.time.sleep", lambda seconds: None)
+
+    report = service.apply(now=datetime(2025, 6, 1))["outbreak_alerts"]
+
+    assert calls == [("drop", "outbreak_alerts_p202001")] + [("delete",)] * 3 + [("vacuum", "outbreak_alerts")]
+    assert report["rows_deleted"] == 237
+    assert report["partitions_dropped"] == ["outbreak_alerts_p202001"]
+    assert report["reclaimed_bytes"] == 6_000
@@ -0,0 +1,82 @@
+import pytest
+from datetime import datetime, timedelta
+
+from services.surveillance import SpikeDetector, InMemoryDetectorStore
+
+
+def make_detector(alerts):
+    async def sink(spike):
+        alerts.append(spike)
+
+    return SpikeDetector(
+        store=InMemoryDetectorStore(),
+        bucket_minutes=60,
+        alpha=0.2,
+        z_threshold=3.0,
+        cusum_k=0.5,
+        cusum_h=5.0,
+        min_reports=5,
+        warmup_buckets=6,
+        alert_sink=sink,
+    )
+
+
+async def feed_baseline(detector, start, hours, per_hour):
+    for hour in range(hours):
+        for _ in range(per_hour):
+            await detector.observe_report("Pune", ["Fever"], start + timedelta(hours=hour, minutes=1))
+
+
+@pytest.mark.asyncio
+async def test_spike_raises_single_alert_per_bucket():
+    alerts = []
+    detector = make_detector(alerts)
+    start = datetime(2025, 1, 1)
+    await feed_baseline(detector, start, hours=12, per_hour=2)
+    assert alerts == []
+
+    spike_time = start + timedelta(hours=12, minutes=5)
+    for _ in range(15):
+        await detector.observe_report("pune ", ["fever"], spike_time)
+
+    assert len(alerts) == 1
+    assert alerts[0]["district"] == "pune"
+    assert alerts[0]["symptom"] == "fever"
+    assert alerts[0]["count"] >= 5
+
+
+@pytest.mark.asyncio
+async def test_no_alert_during_warmup_or_steady_state():
+    alerts = []
+    detector = make_detector(alerts)
+    start = datetime(2025, 1, 1)
+
+    # Large burst before the baseline has warmed up
+    for _ in range(20):
+        await detector.observe_report("Pune", ["cough"], start)
+    await feed_baseline(detector, start + timedelta(hours=1), hours=24, per_hour=3)
+
+    assert alerts == []
+
+
+@pytest.mark.asyncio
+async def test_districts_and_symptoms_are_tracked_independently():
+    alerts = []
+    detector = make_detector(alerts)
+    start = datetime(2025, 1, 1)
+    await feed_baseline(detector, start, hours=12, per_hour=2)
+
+    spike_time = start + timedelta(hours=12, minutes=5)
+    for _ in range(15):
+        await detector.observe_report("Nashik", ["fever"], spike_time)
+        await detector.observe_report("Pune", ["headache"], spike_time)
+
+    assert alerts == []
+
+
+@pytest.mark.asyncio
+async def test_reports_without_location_are_ignored():
+    alerts = []
+    detector = make_detector(alerts)
+    assert await detector.observe_report(None, ["fever"]) == []
+    assert await detector.observe_report("Pune", []) == []
@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import task_metrics
+from task_metrics import TaskMetricsRecorder, monitored_queues, render_metrics
+from worker.app.celery_app import celery_app
+
+fakeredis = pytest.importorskip("fakeredis")
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(task_metrics, "_recorder", TaskMetricsRecorder(client))
+    return client
+
+
+def message(enqueued_at):
+    return json.dumps({"body": "", "headers": {"task": "tasks.send_reminder", "enqueued_at": enqueued_at}})
+
+
+def test_monitors_every_routed_queue():
+    assert monitored_queues(celery_app) == ["alerts", "analysis", "emergency", "maintenance", "reminders", "rewards"]
+
+
+def test_queue_depth_and_oldest_age_cover_all_priority_lists(client):
+    client.lpush("reminders", message(1000.0))
+    client.lpush("reminders:6", message(970.0), message(990.0))
+
+    text = render_metrics(celery_app, client=client, now=1000.0)
+
+    assert 'celery_queue_length{queue="reminders"} 3' in text
+    assert 'celery_queue_oldest_message_age_seconds{queue="reminders"} 30.000' in text
+    assert 'celery_queue_length{queue="emergency"} 0' in text
+
+
+def test_task_signals_feed_runtime_wait_and_retry_metrics(client, monkeypatch):
+    headers = {}
+    task_metrics._stamp_enqueued_at(headers=headers)
+    task = SimpleNamespace(
+        name="actions.send_alert_task", app=celery_app,
+        request=SimpleNamespace(enqueued_at=headers["enqueued_at"] - 2, eta=None,
+                                delivery_info={"routing_key": "alerts"}),
+    )
+
+    task_metrics._on_prerun(task_id="t1", task=task)
+    task_metrics._on_postrun(task_id="t1", task=task, state="SUCCESS")
+    task_metrics._on_retry(sender=task)
+    text = render_metrics(celery_app, client=client)
+
+    assert 'celery_task_queue_wait_seconds_bucket{queue="alerts",le="1.0"} 0' in text
+    assert 'celery_task_queue_wait_seconds_bucket{queue="alerts",le="5.0"} 1' in text
+    assert 'celery_task_runtime_seconds_count{state="SUCCESS",task="actions.send_alert_task"} 1' in text
+    assert 'celery_task_runtime_seconds_bucket{state="SUCCESS",task="actions.send_alert_task",le="+Inf"} 1' in text
+    assert 'celery_task_retries_total{task="actions.send_alert_task"} 1' in text
+
+
+def test_exporter_imports_with_the_worker_image_layout():
+    # Same working directory and PYTHONPATH as worker/Dockerfile, without this test run's sys.path
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([ROOT, os.path.join(ROOT, "actions")])}
+    result = subprocess.run(
+        [sys.executable, "-c", "import app.metrics_exporter, app.tasks"],
+        cwd=os.path.join(ROOT, "worker"), env=env, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
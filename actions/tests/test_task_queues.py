@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+
+import actions.tasks as tasks_mod
+import services.tasks  # noqa: F401  registers the service tasks
+import worker.app.tasks  # noqa: F401  registers the worker stubs
+from worker.app.celery_app import celery_app
+
+from task_queues import PRIORITY_EMERGENCY, TASK_QUEUES, TASK_ROUTES, WORKER_POOLS, emergency_options
+
+
+def test_every_task_has_a_route_to_a_served_queue():
+    names = {n for n in celery_app.tasks if not n.startswith("celery.")}
+    served = {q for pool in WORKER_POOLS.values() for q in pool["queues"]}
+
+    assert names <= set(TASK_ROUTES)
+    assert {route["queue"] for route in TASK_ROUTES.values()} <= served
+    assert {q.name for q in TASK_QUEUES} == served
+
+
+def test_router_applies_queue_and_priority():
+    router = celery_app.amqp.router
+
+    reminder = router.route({}, "tasks.send_reminder", (), {})
+    emergency = router.route(emergency_options(), "actions.send_alert_task", (), {})
+
+    assert reminder["queue"].name == "reminders"
+    assert emergency["queue"].name == "emergency" and emergency["priority"] == PRIORITY_EMERGENCY
+    assert router.route({}, "tasks.unrouted", (), {})["queue"].name == "maintenance"
+
+
+def test_deferred_alerts_stay_on_their_queue(monkeypatch):
+    request = SimpleNamespace(delivery_info={"routing_key": "reminders", "priority": 6})
+    monkeypatch.setattr(type(tasks_mod.send_alert_task), "request", request, raising=False)
+
+    assert tasks_mod._requeue_options(tasks_mod.send_alert_task) == {"queue": "reminders", "priority": 6}
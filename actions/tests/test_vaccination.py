@@ -0,0 +1,209 @@
+import asyncio
+import time
+from datetime import date
+
+import pytest
+
+import services.vaccination as vaccination_mod
+from services.coverage import REQUIRED_MASKS, VaccinationCoverageService, vaccine_mask
+from services.schedules import SCHEDULE_INDEX
+from services.vaccination import VaccinationService
+
+
+@pytest.fixture(autouse=True)
+def clear_schedule_cache():
+    vaccination_mod._government_schedule_cache.clear()
+    yield
+    vaccination_mod._government_schedule_cache.clear()
+
+
+def patch_sources(monkeypatch, delays, results, calls, cancelled):
+    async def fake_fetch(self, client, source, params):
+        calls.append(source)
+        try:
+            await asyncio.sleep(delays[source])
+        except asyncio.CancelledError:
+            cancelled.append(source)
+            raise
+        return results[source]
+
+    monkeypatch.setattr(VaccinationService, "_fetch_schedule", fake_fetch)
+    monkeypatch.setattr(vaccination_mod._mofhw_latency, "hedge_delay", lambda: 0.05)
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_not_hedged(monkeypatch):
+    calls, cancelled = [], []
+    patch_sources(monkeypatch, {"mofhw": 0.0, "idsp": 0.0}, {"mofhw": {"src": "mofhw"}, "idsp": {"src": "idsp"}}, calls, cancelled)
+
+    result = await VaccinationService()._get_government_schedule("Pune", "child")
+
+    assert result == {"src": "mofhw"}
+    assert calls == ["mofhw"]
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_and_loser_cancelled(monkeypatch):
+    calls, cancelled = [], []
+    patch_sources(monkeypatch, {"mofhw": 1.0, "idsp": 0.0}, {"mofhw": {"src": "mofhw"}, "idsp": {"src": "idsp"}}, calls, cancelled)
+
+    result = await VaccinationService()._get_government_schedule("Pune", "child")
+
+    assert result == {"src": "idsp"}
+    assert calls == ["mofhw", "idsp"]
+    assert cancelled == ["mofhw"]
+
+
+@pytest.mark.asyncio
+async def test_hits_and_misses_are_cached(monkeypatch):
+    calls, cancelled = [], []
+    patch_sources(monkeypatch, {"mofhw": 0.0, "idsp": 0.0}, {"mofhw": None, "idsp": None}, calls, cancelled)
+    service = VaccinationService()
+
+    assert await service._get_government_schedule("Pune", "child") is None
+    assert await service._get_government_schedule(" pune", "child") is None
+    assert calls == ["mofhw", "idsp"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_fetch(monkeypatch):
+    calls, cancelled = [], []
+    patch_sources(monkeypatch, {"mofhw": 0.02, "idsp": 0.0}, {"mofhw": {"src": "mofhw"}, "idsp": None}, calls, cancelled)
+    service = VaccinationService()
+
+    results = await asyncio.gather(*(service._get_government_schedule(loc, "child") for loc in ("Pune", "pune ", "PUNE")))
+
+    assert results == [{"src": "mofhw"}] * 3
+    assert calls == ["mofhw"]
+    assert vaccination_mod._government_schedule_fetches == {}
+
+
+@pytest.mark.asyncio
+async def test_location_overlay_does_not_grow_shared_schedule(monkeypatch):
+    overlay = {"additional_vaccines": [{"name": "JE", "age": "9-12 months", "disease": "Japanese Encephalitis"},
+                                       {"name": "Cholera", "age": "1 year", "disease": "Cholera"}],
+               "recommendations": ["Carry vaccination card"]}
+
+    async def fake_gov(self, location, age_group):
+        return overlay
+
+    monkeypatch.setattr(VaccinationService, "_get_government_schedule", fake_gov)
+    service = VaccinationService()
+    base_count = len(service.vaccination_schedules["infant"].vaccines)
+
+    first = await service.get_vaccination_schedule(age="0", location="Pune")
+    second = await service.get_vaccination_schedule(age="0", location="Pune")
+    first["schedule"]["vaccines"].append({"name": "mutated"})
+
+    assert len(second["schedule"]["vaccines"]) == base_count + 1
+    assert second["schedule"]["recommendations"] == ["Carry vaccination card"]
+    assert len(service.vaccination_schedules["infant"].vaccines) == base_count
+    assert "recommendations" not in (await service.get_vaccination_schedule(age="0"))["schedule"]
+    assert service._merge_schedules(service.vaccination_schedules["infant"], overlay) is \
+        service._merge_schedules(service.vaccination_schedules["infant"], overlay)
+
+
+def names(doses):
+    return [(d["name"], d["dose"]) for d in doses]
+
+
+def test_schedule_index_infant_due_and_overdue():
+    dob = date(2025, 1, 1)
+    history = [{"vaccine_name": "BCG", "date_administered": "2025-01-02"}]
+
+    lookup = SCHEDULE_INDEX.lookup(dob, history, on=date(2025, 2, 20))
+
+    assert ("OPV", 1) in names(lookup["due"])
+    assert ("OPV", 2) not in names(lookup["due"])
+    assert names(lookup["overdue"]) == [("Hepatitis B", 1)]
+    assert lookup["due"][0]["due_from"] == "2025-02-12"
+
+
+def test_schedule_index_counts_series_doses():
+    dob = date(2025, 1, 1)
+    history = [{"vaccine_name": "opv"}, {"vaccine_name": "OPV"}]
+
+    lookup = SCHEDULE_INDEX.lookup(dob, history, on=date(2025, 4, 20))
+
+    assert ("OPV", 3) in names(lookup["due"])
+    assert ("OPV", 1) not in names(lookup["overdue"])
+    assert ("DPT", 1) in names(lookup["overdue"])
+
+
+def test_schedule_index_recurring_and_catch_up_doses():
+    dob = date(1990, 6, 1)
+    history = [
+        {"vaccine_name": "Influenza", "date_administered": "2025-01-10"},
+        {"vaccine_name": "MMR", "date_administered": "1991-10-01"},
+    ]
+
+    due = names(SCHEDULE_INDEX.lookup(dob, history, on=date(2025, 6, 1))["due"])
+    assert ("Influenza", 1) not in due
+    assert ("MMR", 1) not in due
+    assert ("Hepatitis B", 1) in due
+
+    due_next_year = names(SCHEDULE_INDEX.lookup(dob, history, on=date(2026, 2, 1))["due"])
+    assert ("Influenza", 1) in due_next_year
+
+
+def test_get_next_vaccine_uses_index_for_age():
+    service = VaccinationService()
+    next_vaccine = service._get_next_vaccine(service.vaccination_schedules["infant"], "0")
+    assert next_vaccine["name"] in {"BCG", "Hepatitis B"}
+    assert next_vaccine["reason"] == "Due now"
+
+
+def test_coverage_evaluates_cohorts_vectorized():
+    rows = [
+        ("Pune", "infant", vaccine_mask(["BCG", "opv"]), 10),
+        ("Pune", "infant", REQUIRED_MASKS["infant"], 30),
+        ("Nashik", "adult", 0, 5),
+    ]
+
+    locations = VaccinationCoverageService()._evaluate(rows)["locations"]
+
+    assert locations["Pune"]["population"] == 40
+    assert locations["Pune"]["fully_vaccinated_pct"] == 75.0
+    assert locations["Pune"]["vaccines"]["BCG"] == 100.0
+    assert locations["Pune"]["vaccines"]["DPT"] == 75.0
+    assert "COVID-19" not in locations["Pune"]["vaccines"]
+    assert locations["Nashik"]["fully_vaccinated_pct"] == 0.0
+
+
+@pytest.mark.asyncio
+async def test_check_vaccination_status_uses_history(monkeypatch):
+    async def fake_history(self, user_id):
+        return [{"vaccine_name": "bcg"}, {"vaccine_name": "Hepatitis B"}]
+
+    monkeypatch.setattr(VaccinationService, "get_vaccination_history", fake_history)
+
+    status = await VaccinationService().check_vaccination_status("user-1", "0")
+
+    assert status["missing_vaccines"][0] == "OPV"
+    assert "BCG" not in status["missing_vaccines"]
+    assert round(status["completion_percentage"], 2) == round(2 / 9 * 100, 2)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_coverage_misses_compute_the_snapshot_once(monkeypatch):
+    import services.coverage as coverage
+
+    monkeypatch.setattr(coverage, "_local_snapshot", {})
+    monkeypatch.setattr(coverage, "_refresh_lock", None)
+    monkeypatch.setattr(coverage.settings, "redis_url", "redis://127.0.0.1:1")
+    computed = []
+
+    def refresh(self):
+        computed.append(1)
+        time.sleep(0.05)
+        snapshot = {"locations": {"Pune": {"population": 40}}}
+        coverage._local_snapshot.update(snapshot=snapshot, loaded_at=time.monotonic())
+        return snapshot
+
+    monkeypatch.setattr(VaccinationCoverageService, "refresh_snapshot", refresh)
+    service = VaccinationCoverageService()
+
+    snapshots = await asyncio.gather(*(service.get_snapshot() for _ in range(5)))
+
+    assert computed == [1]
+    assert all(s["locations"]["Pune"]["population"] == 40 for s in snapshots)
@@ -0,0 +1,2 @@
+-- District of the reporting user, used by streaming symptom surveillance
+ALTER TABLE symptom_reports ADD COLUMN IF NOT EXISTS location VARCHAR(100);
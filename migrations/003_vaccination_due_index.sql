@@ -0,0 +1,5 @@
+-- Range scans of open due dates for vaccination reminders.
+-- Fulfilled records have next_due_date cleared, so the partial index stays small.
+CREATE INDEX IF NOT EXISTS ix_vaccination_records_next_due_date
+  ON vaccination_records (next_due_date, id)
+  WHERE next_due_date IS NOT NULL;
@@ -0,0 +1,99 @@
+-- Indexes for the queries the services issue, and monthly range partitioning
+-- of the append-only, time-filtered tables (symptom_reports, outbreak_alerts).
+
+-- VaccinationService.get_vaccination_history: WHERE user_id = ? ORDER BY date_administered DESC
+CREATE INDEX IF NOT EXISTS ix_vaccination_records_user_administered
+  ON vaccination_records (user_id, date_administered DESC);
+
+-- VaccinationService.record_vaccination: WHERE user_id = ? AND lower(vaccine_name) = ?
+CREATE INDEX IF NOT EXISTS ix_vaccination_records_user_vaccine
+  ON vaccination_records (user_id, lower(vaccine_name));
+
+-- Coverage snapshot and reminder scans only read active users
+CREATE INDEX IF NOT EXISTS ix_users_active_location
+  ON users (location) WHERE is_active;
+
+CREATE INDEX IF NOT EXISTS ix_reward_transactions_user_created
+  ON reward_transactions (user_id, created_at);
+
+CREATE INDEX IF NOT EXISTS ix_appointments_user_date
+  ON appointments (user_id, appointment_date);
+
+
+-- Create monthly partitions of `parent` from `from_month` through `months_ahead`
+-- months past the current month. Partitions are named <parent>_pYYYYMM.
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(
+  parent TEXT,
+  months_ahead INT DEFAULT 3,
+  from_month DATE DEFAULT NULL
+) RETURNS INT AS $$
+DECLARE
+  month_start DATE := date_trunc('month', COALESCE(from_month, CURRENT_DATE))::DATE;
+  last_month DATE := (date_trunc('month', CURRENT_DATE) + make_interval(months => months_ahead))::DATE;
+  partition_name TEXT;
+  created INT := 0;
+BEGIN
+  WHILE month_start <= last_month LOOP
+    partition_name := format('%s_p%s', parent, to_char(month_start, 'YYYYMM'));
+    IF to_regclass(partition_name) IS NULL THEN
+      EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, parent, month_start, (month_start + INTERVAL '1 month')::DATE
+      );
+      created := created + 1;
+    END IF;
+    month_start := (month_start + INTERVAL '1 month')::DATE;
+  END LOOP;
+  RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Rebuild `parent` as a table range-partitioned by month on created_at,
+-- copying existing rows. The primary key must include the partition key,
+-- so it becomes (id, created_at). No-op if the table is already partitioned.
+CREATE OR REPLACE FUNCTION partition_table_by_month(parent TEXT) RETURNS VOID AS $$
+DECLARE
+  legacy TEXT := parent || '_unpartitioned';
+  first_month DATE;
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(parent)
+  ) THEN
+    RETURN;
+  END IF;
+
+  EXECUTE format('ALTER TABLE %I RENAME TO %I', parent, legacy);
+  EXECUTE format('ALTER TABLE %I RENAME CONSTRAINT %I TO %I', legacy, parent || '_pkey', legacy || '_pkey');
+  EXECUTE format('UPDATE %I SET created_at = NOW() WHERE created_at IS NULL', legacy);
+  EXECUTE format(
+    'CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS, PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at)',
+    parent, legacy
+  );
+  -- Catches rows outside the pre-created months instead of failing the insert
+  EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', parent || '_default', parent);
+
+  EXECUTE format('SELECT min(created_at)::DATE FROM %I', legacy) INTO first_month;
+  PERFORM ensure_monthly_partitions(parent, 3, first_month);
+
+  EXECUTE format('INSERT INTO %I SELECT * FROM %I', parent, legacy);
+  EXECUTE format('DROP TABLE %I', legacy);
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT partition_table_by_month('symptom_reports');
+SELECT partition_table_by_month('outbreak_alerts');
+
+-- Created on the partitioned parents, so every partition inherits them.
+-- HealthAnalysisService / spike detection: recent reports by time and by district
+CREATE INDEX IF NOT EXISTS ix_symptom_reports_created
+  ON symptom_reports (created_at);
+CREATE INDEX IF NOT EXISTS ix_symptom_reports_location_created
+  ON symptom_reports (location, created_at);
+CREATE INDEX IF NOT EXISTS ix_symptom_reports_user_created
+  ON symptom_reports (user_id, created_at);
+
+-- OutbreakService._check_local_outbreaks / get_outbreak_statistics:
+-- WHERE verified AND created_at >= now() - interval
+CREATE INDEX IF NOT EXISTS ix_outbreak_alerts_verified_created
+  ON outbreak_alerts (verified, created_at);
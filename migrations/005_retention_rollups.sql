@@ -0,0 +1,29 @@
+-- Aggregates that outlive raw rows removed by the retention job
+-- (actions/services/maintenance.py RetentionService).
+
+CREATE TABLE IF NOT EXISTS symptom_report_daily (
+  day DATE NOT NULL,
+  location VARCHAR(100) NOT NULL,
+  severity VARCHAR(20) NOT NULL,
+  reports INT NOT NULL,
+  PRIMARY KEY (day, location, severity)
+);
+
+CREATE TABLE IF NOT EXISTS symptom_daily (
+  day DATE NOT NULL,
+  location VARCHAR(100) NOT NULL,
+  symptom VARCHAR(100) NOT NULL,
+  mentions INT NOT NULL,
+  PRIMARY KEY (day, location, symptom)
+);
+
+CREATE TABLE IF NOT EXISTS outbreak_alert_monthly (
+  month DATE NOT NULL,
+  location VARCHAR(100) NOT NULL,
+  disease_name VARCHAR(100) NOT NULL,
+  severity_level VARCHAR(20) NOT NULL,
+  verified BOOLEAN NOT NULL,
+  alerts INT NOT NULL,
+  cases BIGINT NOT NULL,
+  PRIMARY KEY (month, location, disease_name, severity_level, verified)
+);
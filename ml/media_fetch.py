@@ -0,0 +1,89 @@
+"""
+Size-limited download of user-supplied media URLs
+
+Media URLs come from chat messages, so every hop (the URL and each redirect)
+must be http(s), on an allowed host when an allowlist is set, and resolve only
+to public addresses; loopback, private, link-local (cloud metadata) and other
+reserved ranges are refused. Redirects are followed by hand so each hop is
+checked before it is requested.
+"""
+
+import asyncio
+import ipaddress
+import socket
+from typing import Iterable, Set
+
+import httpx
+
+MAX_REDIRECTS = 3
+CHUNK_BYTES = 64 * 1024
+
+
+class MediaRejected(Exception):
+    """The URL (or a redirect) points somewhere the service must not fetch"""
+
+
+class MediaTooLarge(Exception):
+    pass
+
+
+def parse_allowed_hosts(value: str) -> Set[str]:
+    """Comma-separated hosts; an entry starting with "." also allows its subdomains"""
+    return {h.strip().lower() for h in value.split(",") if h.strip()}
+
+
+def host_allowed(host: str, allowed: Set[str]) -> bool:
+    host = host.lower().rstrip(".")
+    if not allowed:
+        return True
+    return host in allowed or any(a.startswith(".") and (host.endswith(a) or host == a[1:]) for a in allowed)
+
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address)
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def check_url(url: httpx.URL, allowed: Set[str]):
+    if url.scheme not in ("http", "https") or not url.host:
+        raise MediaRejected("Only http(s) media URLs are supported")
+    if not host_allowed(url.host, allowed):
+        raise MediaRejected(f"Media host {url.host} is not allowed")
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            url.host, url.port or (443 if url.scheme == "https" else 80), type=socket.SOCK_STREAM
+        )
+    except socket.gaierror:
+        raise MediaRejected(f"Media host {url.host} does not resolve")
+    addresses = {info[4][0] for info in infos}
+    if not addresses or not all(_is_public(a) for a in addresses):
+        raise MediaRejected(f"Media host {url.host} resolves to a non-public address")
+
+
+async def fetch_media(client: httpx.AsyncClient, url: str, max_bytes: int,
+                      allowed: Iterable[str] = ()) -> bytes:
+    """Download `url` (the client must not follow redirects itself); raises MediaRejected/MediaTooLarge"""
+    allowed = set(allowed)
+    request = client.build_request("GET", url)
+    for _ in range(MAX_REDIRECTS + 1):
+        await check_url(request.url, allowed)
+        resp = await client.send(request, stream=True, follow_redirects=False)
+        try:
+            if resp.next_request is not None:
+                request = resp.next_request
+                continue
+            resp.raise_for_status()
+            # Refuse early when the size is declared; count bytes for when it isn't
+            if int(resp.headers.get("content-length") or 0) > max_bytes:
+                raise MediaTooLarge()
+            content = bytearray()
+            async for chunk in resp.aiter_bytes(CHUNK_BYTES):
+                content.extend(chunk)
+                if len(content) > max_bytes:
+                    raise MediaTooLarge()
+            return bytes(content)
+        finally:
+            await resp.aclose()
+    raise MediaRejected(f"More than {MAX_REDIRECTS} redirects")
@@ -0,0 +1,202 @@
+"""
+Cache of image results (OCR text) keyed by image content
+
+Two keys per image:
+- SHA-256 of the encoded bytes: resends and WhatsApp forwards are byte-identical,
+  and a hit skips decoding as well as OCR
+- a 256-bit difference hash (dHash) of the decoded image: re-photos and
+  recompressions of the same strip land within a few bits of each other. The
+  image's fine print (batch, expiry) is below dHash resolution, so this tier is
+  only for callers that opt in; exact hits are the only ones that are safe for
+  medicine details
+
+Results are kept in a size-bounded in-memory LRU, backed by Redis
+(OCR_CACHE_REDIS_URL) or a directory (OCR_CACHE_DIR) shared across processes
+and restarts. Near-duplicate lookups beyond memory need the Redis tier, which
+indexes hashes by band: with distance <= max_distance < BANDS, at least one
+band of a near duplicate matches exactly.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 16  # 16x16 gradient bits = 256-bit dHash
+BANDS = 8
+BAND_BITS = HASH_SIZE * HASH_SIZE // BANDS
+
+
+def digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def dhash(image) -> int:
+    """Difference hash of a decoded (BGR or grayscale) image"""
+    import cv2
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _bands(phash: int):
+    mask = (1 << BAND_BITS) - 1
+    return [(phash >> (i * BAND_BITS)) & mask for i in range(BANDS)]
+
+
+class RedisResultStore:
+    def __init__(self, client, ttl_seconds: int, prefix: str = "imgcache", max_candidates: int = 64):
+        self.client = client
+        self.ttl = ttl_seconds
+        self.prefix = prefix
+        self.max_candidates = max_candidates
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[int, Dict]]:
+        raw = self.client.get(f"{self.prefix}:{namespace}:{key}")
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return int(entry["phash"], 16), entry["result"]
+
+    def put(self, namespace: str, key: str, phash: int, result: Dict):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(f"{self.prefix}:{namespace}:{key}", json.dumps({"phash": f"{phash:x}", "result": result}),
+                 ex=self.ttl)
+        for i, band in enumerate(_bands(phash)):
+            band_key = f"{self.prefix}:{namespace}:band:{i}:{band:x}"
+            pipe.sadd(band_key, key)
+            pipe.expire(band_key, self.ttl)
+        pipe.execute()
+
+    def similar(self, namespace: str, phash: int, max_distance: int) -> Optional[Tuple[int, Dict]]:
+        pipe = self.client.pipeline(transaction=False)
+        for i, band in enumerate(_bands(phash)):
+            pipe.srandmember(f"{self.prefix}:{namespace}:band:{i}:{band:x}", self.max_candidates)
+        candidates = {m.decode() if isinstance(m, bytes) else m for members in pipe.execute() for m in members}
+        best = None
+        for key in list(candidates)[: self.max_candidates]:
+            entry = self.get(namespace, key)  # band members outlive expired entries
+            if entry and distance(entry[0], phash) <= max_distance:
+                if best is None or distance(entry[0], phash) < distance(best[0], phash):
+                    best = entry
+        return best
+
+
+class DiskResultStore:
+    """Exact-match tier on a local or mounted directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, namespace: str, key: str) -> str:
+        return os.path.join(self.directory, namespace, key[:2], f"{key}.json")
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[int, Dict]]:
+        try:
+            with open(self._path(namespace, key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return int(entry["phash"], 16), entry["result"]
+
+    def put(self, namespace: str, key: str, phash: int, result: Dict):
+        path = self._path(namespace, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"phash": f"{phash:x}", "result": result}, f)
+        os.replace(tmp, path)  # readers never see a partial file
+
+    def similar(self, namespace: str, phash: int, max_distance: int) -> Optional[Tuple[int, Dict]]:
+        return None
+
+
+class ImageResultCache:
+    def __init__(self, namespace: str, max_entries: int = 2048, store=None, max_distance: int = 6):
+        if max_distance >= BANDS:
+            raise ValueError(f"max_distance must be below {BANDS} for band lookups to find every match")
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.store = store
+        self.max_distance = max_distance
+        self._entries: "OrderedDict[str, Tuple[int, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()  # lookups run in the threadpool
+        self.stats = {"exact": 0, "similar": 0, "miss": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _backing(self, method: str, *args):
+        """Call the backing tier; an unavailable store only costs a cache miss"""
+        if self.store is None:
+            return None
+        try:
+            return getattr(self.store, method)(self.namespace, *args)
+        except Exception as e:
+            logger.warning(f"Image cache {method} failed: {str(e)}")
+            return None
+
+    def _remember(self, key: str, entry: Tuple[int, Dict]):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Result for byte-identical content, if cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            entry = self._backing("get", key)
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is not None:
+            self.stats["exact"] += 1
+            return entry[1]
+        return None
+
+    def get_similar(self, phash: int) -> Optional[Dict]:
+        """Result of a near-duplicate image (never stored under this image's own key)"""
+        with self._lock:
+            best = min(self._entries.values(), key=lambda e: distance(e[0], phash), default=None)
+        if best is None or distance(best[0], phash) > self.max_distance:
+            best = self._backing("similar", phash, self.max_distance)
+        if best is None:
+            self.stats["miss"] += 1
+            return None
+        self.stats["similar"] += 1
+        return best[1]
+
+    def put(self, key: str, phash: int, result: Dict):
+        self._remember(key, (phash, result))
+        self._backing("put", key, phash, result)
+
+
+def store_from_env():
+    """Backing tier from OCR_CACHE_REDIS_URL or OCR_CACHE_DIR (memory only if neither is set)"""
+    ttl = int(os.getenv("OCR_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+    redis_url = os.getenv("OCR_CACHE_REDIS_URL")
+    if redis_url:
+        import redis
+
+        return RedisResultStore(redis.Redis.from_url(redis_url), ttl)
+    directory = os.getenv("OCR_CACHE_DIR")
+    if directory:
+        return DiskResultStore(directory)
+    return None
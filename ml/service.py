@@ -1,32 +1,125 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, HTTPException
 from pydantic import BaseModel
 import pytesseract
 import cv2
+import httpx
 import numpy as np
-from typing import List, Dict
+import os
+from typing import List, Dict, Optional
 from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+import ocr_cache
+from media_fetch import MediaRejected, MediaTooLarge, fetch_media, parse_allowed_hosts
 
 app = FastAPI(title="SIH Health Bot ML Service")
 
+MAX_IMAGE_BYTES = int(os.getenv("OCR_MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+FETCH_TIMEOUT_SECONDS = float(os.getenv("OCR_FETCH_TIMEOUT_SECONDS", "15"))
+# Comma-separated hosts /ocr/url may fetch from (".example.com" allows subdomains). Empty
+# allows any host, but private, loopback and link-local addresses are always refused.
+ALLOWED_MEDIA_HOSTS = parse_allowed_hosts(os.getenv("OCR_ALLOWED_MEDIA_HOSTS", ""))
+CHUNK_BYTES = 64 * 1024
+
+# One pooled client for media downloads, shared by all requests
+_http: Optional[httpx.AsyncClient] = None
+
+def get_http() -> httpx.AsyncClient:
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(
+            timeout=FETCH_TIMEOUT_SECONDS,
+            follow_redirects=False,  # fetch_media checks every hop itself
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+    return _http
+
+@app.on_event("shutdown")
+async def close_http():
+    if _http is not None:
+        await _http.aclose()
+
+# Results by image content: resends, forwards and near-identical photos skip OCR
+_ocr_results = ocr_cache.ImageResultCache(
+    "ocr",
+    max_entries=int(os.getenv("OCR_CACHE_MAX_ENTRIES", "2048")),
+    store=ocr_cache.store_from_env(),
+    max_distance=int(os.getenv("OCR_CACHE_MAX_DISTANCE", "6")),
+)
+
+class OcrUrlRequest(BaseModel):
+    url: str
+    near_duplicates: bool = False
+
 class ForecastRequest(BaseModel):
     series: List[float]
     horizon: int = 7
 
 @app.get("/", include_in_schema=False)
 def index():
-    return {"status": "ok", "service": "ml-service", "endpoints": ["/health", "/ocr", "/forecast"]}
+    return {"status": "ok", "service": "ml-service", "endpoints": ["/health", "/ocr", "/ocr/url", "/ocr/cache", "/forecast"]}
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
-@app.post("/ocr")
-async def ocr(file: UploadFile = File(...)):
-    content = await file.read()
+def _ocr_bytes(content: bytes, near_duplicates: bool = False) -> Dict:
+    """
+    OCR text for an image, from the cache when possible
+
+    Near-duplicate hits return text read from a *different* image: a dHash can't
+    tell two strips of one product apart by their printed batch or expiry. Only
+    callers that don't rely on those details may opt in; medicine scanning never does.
+    """
+    key = ocr_cache.digest(content)
+    cached = _ocr_results.get(key)
+    if cached is not None:
+        return {**cached, "cache": "exact"}
     arr = np.frombuffer(content, np.uint8)
     img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-    text = pytesseract.image_to_string(img)
-    return {"text": text}
+    if img is None:
+        raise HTTPException(status_code=415, detail="Not a decodable image")
+    phash = ocr_cache.dhash(img)
+    if near_duplicates:
+        cached = _ocr_results.get_similar(phash)
+        if cached is not None:
+            return {**cached, "cache": "similar"}
+    result = {"text": pytesseract.image_to_string(img)}
+    _ocr_results.put(key, phash, result)
+    return {**result, "cache": None}
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Image larger than {MAX_IMAGE_BYTES} bytes")
+
+@app.post("/ocr")
+async def ocr(file: UploadFile = File(...), near_duplicates: bool = False):
+    content = bytearray()
+    while True:
+        chunk = await file.read(CHUNK_BYTES)
+        if not chunk:
+            break
+        content.extend(chunk)
+        if len(content) > MAX_IMAGE_BYTES:
+            raise _too_large()
+    # Decoding and tesseract are CPU-bound; keep them off the event loop
+    return await run_in_threadpool(_ocr_bytes, bytes(content), near_duplicates)
+
+@app.post("/ocr/url")
+async def ocr_url(req: OcrUrlRequest):
+    """OCR an image fetched from a media URL, so callers don't download and re-upload it"""
+    try:
+        content = await fetch_media(get_http(), req.url, MAX_IMAGE_BYTES, ALLOWED_MEDIA_HOSTS)
+    except MediaRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except MediaTooLarge:
+        raise _too_large()
+    except (httpx.HTTPError, httpx.InvalidURL) as e:
+        raise HTTPException(status_code=502, detail=f"Could not fetch media: {e}")
+    return await run_in_threadpool(_ocr_bytes, content, req.near_duplicates)
+
+@app.get("/ocr/cache")
+def ocr_cache_stats():
+    return {"entries": len(_ocr_results), **_ocr_results.stats}
 
 @app.post("/forecast")
 def forecast(req: ForecastRequest):
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The ML service runs from its own directory (uvicorn service:app)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -0,0 +1,75 @@
+import asyncio
+import socket
+
+import httpx
+import pytest
+
+import media_fetch
+from media_fetch import MediaRejected, MediaTooLarge, fetch_media, host_allowed, parse_allowed_hosts
+
+ADDRESSES = {
+    "media.example": "93.184.216.34",
+    "cdn.example": "93.184.216.35",
+    "internal.example": "10.0.0.5",
+    "metadata.example": "169.254.169.254",
+}
+
+
+@pytest.fixture(autouse=True)
+def fake_dns(monkeypatch):
+    async def getaddrinfo(self, host, port, **kwargs):
+        address = ADDRESSES.get(host, host)
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port))]
+
+    monkeypatch.setattr(asyncio.BaseEventLoop, "getaddrinfo", getaddrinfo)
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    redirects = {
+        "/to-metadata": "http://metadata.example/latest/meta-data/",
+        "/to-cdn": "https://cdn.example/image.png",
+    }
+    if request.url.path in redirects:
+        return httpx.Response(302, headers={"Location": redirects[request.url.path]})
+    if request.url.path == "/big":
+        return httpx.Response(200, content=b"x" * 101)
+    return httpx.Response(200, content=b"image-bytes")
+
+
+def fetch(url, allowed=()):
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await fetch_media(client, url, max_bytes=100, allowed=allowed)
+
+    return asyncio.run(scenario())
+
+
+def test_public_media_and_checked_redirects_are_fetched():
+    allowed = parse_allowed_hosts("media.example, .cdn.example")
+    assert fetch("https://media.example/a.png", allowed) == b"image-bytes"
+    assert fetch("https://media.example/to-cdn", allowed) == b"image-bytes"
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/admin",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://internal.example/image.png",
+    "http://[::ffff:10.0.0.1]/image.png",
+    "file:///etc/passwd",
+    "https://media.example/to-metadata",  # redirect to a link-local address
+])
+def test_private_and_non_http_targets_are_refused(url):
+    with pytest.raises(MediaRejected):
+        fetch(url)
+
+
+def test_allowlist_applies_to_every_redirect_hop():
+    with pytest.raises(MediaRejected):
+        fetch("https://media.example/to-cdn", parse_allowed_hosts("media.example"))
+    assert host_allowed("mms.cdn.example", {".cdn.example"})
+    assert not host_allowed("cdn.example.evil.com", {".cdn.example"})
+
+
+def test_oversized_media_is_refused_while_streaming():
+    with pytest.raises(MediaTooLarge):
+        fetch("https://media.example/big")
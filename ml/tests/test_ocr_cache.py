@@ -0,0 +1,71 @@
+import pytest
+
+from ocr_cache import BANDS, BAND_BITS, DiskResultStore, ImageResultCache, RedisResultStore, digest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+PHASH = (1 << 255) | 0x5A5A5A5A
+
+
+def flip(phash, bits):
+    """`phash` with `bits` low bits flipped, one in each band so no band stays intact"""
+    for band in range(bits):
+        phash ^= 1 << (band * BAND_BITS)
+    return phash
+
+
+@pytest.fixture
+def redis_store():
+    return RedisResultStore(fakeredis.FakeRedis(), ttl_seconds=60)
+
+
+def test_exact_hit_survives_a_fresh_process_through_the_backing_store(redis_store, tmp_path):
+    for store in (redis_store, DiskResultStore(str(tmp_path))):
+        ImageResultCache("ocr", store=store).put(digest(b"strip"), PHASH, {"text": "CROCIN"})
+
+        cache = ImageResultCache("ocr", store=store)
+        assert cache.get(digest(b"strip")) == {"text": "CROCIN"}
+        assert cache.get(digest(b"other")) is None
+        assert cache.stats["exact"] == 1
+
+
+def test_near_duplicate_found_through_bands_within_max_distance(redis_store):
+    ImageResultCache("ocr", store=redis_store, max_distance=6).put("a" * 64, PHASH, {"text": "CROCIN"})
+    cache = ImageResultCache("ocr", store=redis_store, max_distance=6)  # empty memory tier
+
+    assert cache.get_similar(flip(PHASH, 6)) == {"text": "CROCIN"}
+    assert cache.get_similar(flip(PHASH, BANDS)) is None  # every band differs and distance > max
+    assert cache.stats == {"exact": 0, "similar": 1, "miss": 1}
+    assert cache.get("b" * 64) is None  # a near-duplicate hit is not stored under another image's key
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ImageResultCache("ocr", max_entries=2)
+    cache.put("a", PHASH, {"text": "a"})
+    cache.put("b", PHASH, {"text": "b"})
+    cache.get("a")
+    cache.put("c", PHASH, {"text": "c"})
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == {"text": "a"}
+
+
+def test_failing_store_is_a_miss_not_an_error():
+    class DownStore:
+        def get(self, *args):
+            raise ConnectionError("redis down")
+
+        put = similar = get
+
+    cache = ImageResultCache("ocr", store=DownStore())
+    cache.put("a", PHASH, {"text": "a"})
+
+    assert cache.get("b") is None
+    assert cache.get_similar(flip(PHASH, 7) ^ (1 << 254)) is None
+    assert cache.get("a") == {"text": "a"}
+
+
+def test_max_distance_must_leave_an_intact_band():
+    with pytest.raises(ValueError):
+        ImageResultCache("ocr", max_distance=BANDS)
@@ -1,25 +1,35 @@
 from __future__ import annotations
 
-import datetime as dt
-import io
-import mimetypes
+import logging
 import os
-from typing import Any, Dict, List, Text
+from typing import Any, Dict, List, Optional, Text
 
-import requests
+import httpx
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
-from rasa_sdk.events import ReminderScheduled, EventType
+from rasa_sdk.events import EventType
 
+logger = logging.getLogger(__name__)
 
 ML_SERVICE_URL = os.getenv("ML_SERVICE_URL", "http://localhost:8000")
+ACTIONS_API_URL = os.getenv("ACTIONS_API_URL", "http://actions:8000")
+
+# Shared by async actions on the action server's event loop
+_http: Optional[httpx.AsyncClient] = None
+
+
+def _async_http() -> httpx.AsyncClient:
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(timeout=30)
+    return _http
 
 
 class ActionImageAnalysis(Action):
     def name(self) -> Text:
         return "action_image_analysis"
 
-    def run(
+    async def run(
         self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]
     ) -> List[EventType]:
         # Try to extract media URLs passed by Twilio channel (if any)
@@ -52,21 +62,12 @@ class ActionImageAnalysis(Action):
         # Take the first image
         image_url = media_urls[0]
         try:
-            # Download image
-            resp = requests.get(image_url, timeout=15)
-            resp.raise_for_status()
-            content = resp.content
-
-            # Guess filename and content-type
-            filename = os.path.basename(image_url.split("?")[0]) or "image.jpg"
-            content_type, _ = mimetypes.guess_type(filename)
-            if not content_type:
-                content_type = "application/octet-stream"
-
-            # Send to ML OCR endpoint as multipart
-            ocr_url = f"{ML_SERVICE_URL}/ocr"
-            files = {"file": (filename, io.BytesIO(content), content_type)}
-            ocr_resp = requests.post(ocr_url, files=files, timeout=30)
+            # The ML service fetches the image itself (size-limited, pooled connections),
+            # so the action server neither downloads nor re-uploads it
+            ocr_resp = await _async_http().post(f"{ML_SERVICE_URL}/ocr/url", json={"url": image_url})
+            if ocr_resp.status_code == 413:
+                dispatcher.utter_message(text="That image is too large to analyze. Please send a smaller photo.")
+                return []
             ocr_resp.raise_for_status()
             data = ocr_resp.json()
             text_out = data.get("text") or "(no text detected)"
@@ -82,69 +83,52 @@ class ActionVaccinationSchedule(Action):
         return "action_vaccination_schedule"
 
     @staticmethod
-    def build_schedule_for_age(age_years: float) -> List[str]:
-        # Simplified example schedule (non-clinical). Replace with authoritative schedule per region if needed.
-        s: List[str] = []
-        if age_years < 1/12:
-            s.append("At birth: BCG, Hepatitis B (1st dose), OPV-0")
-        if age_years < 1:
-            s.extend([
-                "6, 10, 14 weeks: DTP, IPV/OPV, Hib, HepB",
-                "9 months: Measles/MMR (1st dose)",
-            ])
-        if 1 <= age_years < 5:
-            s.extend([
-                "12-15 months: MMR (2nd dose)",
-                "16-24 months: DTP booster, IPV/OPV booster",
-            ])
-        if 5 <= age_years < 12:
-            s.append("5-6 years: DTP booster, OPV booster")
-        if 10 <= age_years < 18:
-            s.extend([
-                "10-12 years: Tdap booster",
-                "9-14 years: HPV (2 doses)",
-            ])
-        if 18 <= age_years < 60:
-            s.extend([
-                "Adults: Tdap once, then Td every 10 years",
-                "Seasonal influenza: annually",
-            ])
-        if age_years >= 60:
-            s.extend([
-                "60+: Influenza annually, Pneumococcal (as per guidelines)",
-            ])
-        return s or ["Please consult your clinician for a personalized vaccination schedule."]
-
-    def run(
+    def format_schedule(lookup: Dict[Text, Any]) -> List[str]:
+        lines: List[str] = []
+        sections = (("overdue", "Overdue"), ("due", "Due now"), ("upcoming", "Coming up"))
+        for key, title in sections:
+            for dose in lookup.get(key) or []:
+                window = f"from {dose['due_from']}" if dose.get("due_from") else dose.get("age", "")
+                lines.append(f"{title}: {dose['name']} (dose {dose['dose']}, {window})")
+        return lines or ["Please consult your clinician for a personalized vaccination schedule."]
+
+    async def run(
         self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]
     ) -> List[EventType]:
         age_str = (tracker.get_slot("user_age") or "").strip()
-        age_years: float
+        age_days: int
         try:
-            # Accept plain years (e.g., "30") or with units like "6 months"
-            if "month" in age_str:
-                num = float("".join(ch for ch in age_str if (ch.isdigit() or ch == ".")))
-                age_years = num / 12.0
+            # Accept plain years (e.g., "30") or with units like "6 months" / "10 weeks"
+            num = float("".join(ch for ch in age_str if (ch.isdigit() or ch == ".")))
+            if "week" in age_str:
+                age_days = round(num * 7)
+            elif "month" in age_str:
+                age_days = round(num * 30.4375)
             else:
-                age_years = float("".join(ch for ch in age_str if (ch.isdigit() or ch == ".")))
+                age_days = round(num * 365.25)
         except Exception:
-            age_years = 0.0
+            age_days = 0
+
+        # The canonical schedule and dose-window index live in the actions server; awaited so
+        # a slow actions server doesn't hold up other actions on the event loop
+        try:
+            resp = await _async_http().get(
+                f"{ACTIONS_API_URL}/api/vaccination-schedule/due",
+                params={"age_days": age_days},
+                timeout=10,
+            )
+            resp.raise_for_status()
+            schedule = self.format_schedule(resp.json())
+        except Exception as e:
+            logger.warning(f"Could not load vaccination schedule for age_days={age_days}: {e}")
+            schedule = self.format_schedule({})
 
-        schedule = self.build_schedule_for_age(age_years)
         schedule_text = "\n- " + "\n- ".join(schedule)
         dispatcher.utter_message(text=f"Recommended vaccination schedule based on your age:\n{schedule_text}")
 
-        # Optionally schedule a follow-up reminder 24 hours later as an example
-        reminder_time = dt.datetime.utcnow() + dt.timedelta(hours=24)
-        return [
-            ReminderScheduled(
-                "action_send_vaccination_reminder",
-                trigger_date_time=reminder_time,
-                entities=tracker.latest_message.get("entities"),
-                name=f"vaccination_reminder_{tracker.sender_id}",
-                kill_on_user_message=False,
-            )
-        ]
+        # Reminders are sent from recorded due dates by the worker's reminder scan,
+        # not scheduled per conversation in the tracker
+        return []
 
 
 class ActionSendVaccinationReminder(Action):
@@ -0,0 +1,129 @@
+"""
+Emergency alert latency under a reminder flood
+
+Starts Celery worker pools laid out like docker-compose.yml (queues, routes,
+concurrency and prefetch from actions/task_queues.py), floods the reminders
+queue, and measures how long emergency alerts wait before a worker starts
+them. Provider calls are simulated with a sleep, so nothing is sent.
+
+The tasks registered here reuse the production task names so the real routes
+apply; use a Redis database no real worker consumes (default: db 15).
+
+Usage:
+  python scripts/load_test_queues.py --reminders 5000 --probes 40
+  python scripts/load_test_queues.py --single-pool   # baseline: one pool, all queues
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "actions"))
+
+from celery import Celery  # noqa: E402
+
+from task_queues import (  # noqa: E402
+    REMINDERS_QUEUE, TASK_QUEUES, WORKER_POOLS, configure_queues, emergency_options
+)
+
+BROKER_URL = os.getenv("LOADTEST_BROKER_URL", "redis://localhost:6379/15")
+PROVIDER_LATENCY = float(os.getenv("LOADTEST_PROVIDER_LATENCY_SECONDS", "0.05"))
+
+app = configure_queues(Celery("load_test_queues", broker=BROKER_URL, backend=BROKER_URL))
+
+
+@app.task(name="tasks.send_reminder")
+def send_reminder(user_id: str, message: str, enqueued_at: float = 0.0):
+    time.sleep(PROVIDER_LATENCY)
+    return None
+
+
+@app.task(name="actions.send_alert_task")
+def send_alert_task(user_id: str, message: str, enqueued_at: float = 0.0):
+    waited = time.time() - enqueued_at
+    time.sleep(PROVIDER_LATENCY)
+    return waited
+
+
+def start_pools(single_pool: bool):
+    if single_pool:
+        pools = {"all": {
+            "queues": [q.name for q in TASK_QUEUES],
+            "concurrency": sum(p["concurrency"] for p in WORKER_POOLS.values()),
+            "prefetch_multiplier": 4,
+        }}
+    else:
+        pools = WORKER_POOLS
+
+    env = dict(os.environ, LOADTEST_BROKER_URL=BROKER_URL, PYTHONPATH=os.pathsep.join(
+        [os.path.dirname(os.path.abspath(__file__)), os.path.join(os.path.dirname(__file__), "..", "actions")]
+    ))
+    workers = [
+        subprocess.Popen(
+            ["celery", "-A", "load_test_queues", "worker", "-n", f"loadtest-{name}@%h",
+             "-Q", ",".join(pool["queues"]), f"--concurrency={pool['concurrency']}",
+             f"--prefetch-multiplier={pool['prefetch_multiplier']}", "--loglevel=warning"],
+            env=env,
+        )
+        for name, pool in pools.items()
+    ]
+
+    deadline = time.time() + 30
+    while len(app.control.ping(timeout=1.0)) < len(workers):
+        if time.time() > deadline:
+            stop_pools(workers)
+            raise SystemExit("Workers did not come up; is Redis reachable at LOADTEST_BROKER_URL?")
+    return workers
+
+
+def stop_pools(workers):
+    for worker in workers:
+        worker.terminate()
+    for worker in workers:
+        worker.wait(timeout=30)
+
+
+def probe(count: int, interval: float):
+    results = []
+    for i in range(count):
+        results.append(app.send_task(
+            "actions.send_alert_task",
+            kwargs={"user_id": f"+9100000{i:05d}", "message": "probe", "enqueued_at": time.time()},
+            **emergency_options()
+        ))
+        time.sleep(interval)
+    return [r.get(timeout=600) for r in results]
+
+
+def summary(label: str, waits):
+    waits = sorted(w * 1000 for w in waits)
+    p95 = waits[int(0.95 * (len(waits) - 1))]
+    print(f"{label:<22} p50 {statistics.median(waits):8.1f} ms   p95 {p95:8.1f} ms   max {waits[-1]:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reminders", type=int, default=5000, help="Reminder tasks in the flood")
+    parser.add_argument("--probes", type=int, default=40, help="Emergency alerts sampled per phase")
+    parser.add_argument("--interval", type=float, default=0.1, help="Seconds between emergency probes")
+    parser.add_argument("--single-pool", action="store_true", help="One pool consuming every queue")
+    args = parser.parse_args()
+
+    app.control.purge()
+    workers = start_pools(args.single_pool)
+    try:
+        summary("idle", probe(args.probes, args.interval))
+
+        for i in range(args.reminders):
+            app.send_task("tasks.send_reminder", args=(f"+9199999{i:05d}", "flood"), queue=REMINDERS_QUEUE)
+        summary(f"{args.reminders} reminders queued", probe(args.probes, args.interval))
+    finally:
+        app.control.purge()
+        stop_pools(workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -75,6 +75,9 @@ const MedicineScanner = () => {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ image_base64: imageData })
       });
+      if (!res.ok) {
+        throw new Error(`Scan failed (${res.status})`);
+      }
       const data = await res.json();
       const result = {
         medicineName: data.medicineName || 'Unknown',
@@ -0,0 +1,62 @@
+"""
+Priority admission for inbound chat messages
+
+The gateway only queues messages, so overload shows up as backlog and queue
+wait rather than slow requests. An AIMD limit on the backlog follows the queue
+wait the workers report: it grows while messages start within the target and is
+cut when they don't. Against that limit:
+
+- critical (emergency keywords) is always queued, at the front of its partition
+- normal is queued while the backlog is under the limit
+- low (quizzes, tips, rewards) only while it is under a share of the limit
+
+Everything else gets a quick 503. The priority rules and the AIMD limit are
+actions/admission_rules.py, copied into the image at build.
+"""
+
+import statistics
+import time
+from typing import Dict
+
+from admission_rules import CRITICAL, LOW, NORMAL, AdaptiveLimit, classify_text
+
+
+class BacklogAdmission:
+    def __init__(self, queue, limit: AdaptiveLimit, low_share: float = 0.5, refresh_seconds: float = 1.0,
+                 samples: int = 20):
+        self.queue = queue
+        self.limit = limit
+        self.low_share = low_share
+        self.refresh_seconds = refresh_seconds
+        self.samples = samples
+        self.backlog = 0
+        self._refreshed = float("-inf")
+        self._processed = 0
+        self.shed = {NORMAL: 0, LOW: 0}
+
+    async def _refresh(self):
+        # Backlog and recent queue wait are read at most once per refresh, not per request
+        if time.monotonic() - self._refreshed < self.refresh_seconds:
+            return
+        self._refreshed = time.monotonic()
+        self.backlog = sum((await self.queue.depths()).values())
+        processed = int(await self.queue.redis.hget(f"{self.queue.prefix}:stats", "processed") or 0)
+        if processed == self._processed:
+            return  # no new queue-wait samples since the last look
+        self._processed = processed
+        waits = await self.queue.redis.lrange(f"{self.queue.prefix}:latency:queue_wait", 0, self.samples - 1)
+        if waits:
+            self.limit.record(statistics.median(float(w) for w in waits), True, self.backlog)
+
+    async def admit(self, priority: str) -> bool:
+        await self._refresh()
+        if priority == CRITICAL:
+            return True
+        if self.backlog < self.limit.limit * (self.low_share if priority == LOW else 1):
+            self.backlog += 1
+            return True
+        self.shed[priority] += 1
+        return False
+
+    def snapshot(self) -> Dict:
+        return {"limit": round(self.limit.limit, 1), "backlog": self.backlog, "shed": dict(self.shed)}
@@ -0,0 +1,210 @@
+"""
+Redis-backed queue of inbound chat messages, partitioned by sender
+
+The webhook pushes each message and acknowledges the provider straight away.
+Every partition is consumed by exactly one worker coroutine, one message at a
+time, so messages from the same sender are handled in arrival order while
+different senders proceed in parallel.
+
+Provider retries are dropped at enqueue by message ID (MessageSid, Gupshup
+message id). Each message gets a per-sender sequence number; a per-sender lock
+plus the sequence check keep ordering safe, and measurable, when partitions
+move between worker processes. Messages that still fail after the worker's
+retries are moved to a dead-letter list ({prefix}:dead) for inspection and replay.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+import zlib
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+PREFIX = "webhook:inbound"
+LATENCY_SAMPLES = 1000
+
+# Dedupe, sequence and push in one step, so list order matches sequence order
+ENQUEUE_LUA = """
+redis.call('HINCRBY', KEYS[4], 'received', 1)
+if ARGV[4] == '1' and not redis.call('SET', KEYS[1], 1, 'NX', 'EX', ARGV[2]) then
+  redis.call('HINCRBY', KEYS[4], 'duplicates', 1)
+  return -1
+end
+local seq = redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+local message = cjson.decode(ARGV[1])
+message['seq'] = seq
+if ARGV[5] == '1' then
+  -- Urgent messages go to the consuming end, ahead of the backlog
+  redis.call('RPUSH', KEYS[3], cjson.encode(message))
+else
+  redis.call('LPUSH', KEYS[3], cjson.encode(message))
+end
+return seq
+"""
+
+# Record that `seq` is being processed; count it if an earlier-numbered message got there first.
+# Urgent messages jump the queue on purpose, so they don't move the sender's high-water mark.
+PROCESS_LUA = """
+local last = tonumber(redis.call('GET', KEYS[1]) or '0')
+local seq = tonumber(ARGV[1])
+redis.call('HINCRBY', KEYS[2], 'processed', 1)
+if ARGV[3] == '1' then
+  return 1
+end
+if seq < last then
+  redis.call('HINCRBY', KEYS[2], 'reordered', 1)
+  return 0
+end
+redis.call('SET', KEYS[1], seq, 'EX', ARGV[2])
+return 1
+"""
+
+RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass
+class InboundMessage:
+    provider: str  # "twilio" or "gupshup"
+    sender: str
+    text: str
+    recipient: str = ""  # our number / app the message was sent to; replies go out from it
+    message_id: str = ""
+    received_at: float = field(default_factory=time.time)
+    seq: int = 0  # per-sender, assigned at enqueue
+    urgent: bool = False  # queued ahead of the partition's backlog
+
+    def dumps(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def loads(cls, raw) -> "InboundMessage":
+        return cls(**json.loads(raw))
+
+
+class InboundQueue:
+    def __init__(self, redis, partitions: int = 16, prefix: str = PREFIX,
+                 dedupe_ttl: int = 24 * 3600, lock_lease: float = 60.0):
+        self.redis = redis
+        self.partitions = partitions
+        self.prefix = prefix
+        self.dedupe_ttl = dedupe_ttl
+        self.lock_lease = lock_lease
+        self._enqueue = redis.register_script(ENQUEUE_LUA)
+        self._process = redis.register_script(PROCESS_LUA)
+        self._release = redis.register_script(RELEASE_LUA)
+
+    def partition_for(self, sender: str) -> int:
+        return zlib.crc32(sender.encode("utf-8")) % self.partitions
+
+    def _queue(self, partition: int) -> str:
+        return f"{self.prefix}:{partition}"
+
+    def _processing(self, partition: int) -> str:
+        return f"{self.prefix}:{partition}:processing"
+
+    async def enqueue(self, message: InboundMessage) -> Optional[int]:
+        """Queue `message` and return its sequence number, or None for a provider retry"""
+        partition = self.partition_for(message.sender)
+        seq = await self._enqueue(
+            keys=[
+                f"{self.prefix}:seen:{message.provider}:{message.message_id}",
+                f"{self.prefix}:seq:{message.sender}",
+                self._queue(partition),
+                f"{self.prefix}:stats",
+            ],
+            args=[message.dumps(), self.dedupe_ttl, self.dedupe_ttl, 1 if message.message_id else 0,
+                  1 if message.urgent else 0],
+        )
+        return None if int(seq) < 0 else int(seq)
+
+    @asynccontextmanager
+    async def sender_lock(self, sender: str, poll: float = 0.05) -> AsyncIterator[None]:
+        """Serialize processing of one sender across worker processes"""
+        key, token = f"{self.prefix}:lock:{sender}", uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_lease
+        # A holder that died releases when its lease runs out
+        while not await self.redis.set(key, token, nx=True, px=int(self.lock_lease * 1000)):
+            if time.monotonic() > deadline:
+                break
+            await asyncio.sleep(poll)
+        try:
+            yield
+        finally:
+            await self._release(keys=[key], args=[token])
+
+    async def mark_processing(self, message: InboundMessage) -> bool:
+        """False if a later message from the same sender was already processed"""
+        in_order = await self._process(
+            keys=[f"{self.prefix}:done:{message.sender}", f"{self.prefix}:stats"],
+            args=[message.seq, self.dedupe_ttl, 1 if message.urgent else 0],
+        )
+        return bool(in_order)
+
+    async def stats(self) -> Dict[str, float]:
+        counts = {k: int(v) for k, v in (await self.redis.hgetall(f"{self.prefix}:stats")).items()}
+        received, processed = counts.get("received", 0), counts.get("processed", 0)
+        return {
+            **counts,
+            "duplicate_rate": round(counts.get("duplicates", 0) / received, 4) if received else 0.0,
+            "reorder_rate": round(counts.get("reordered", 0) / processed, 4) if processed else 0.0,
+        }
+
+    async def claim(self, partition: int, timeout: float = 1.0) -> Optional[Tuple[str, InboundMessage]]:
+        """Move the oldest message to the partition's processing list and return it"""
+        raw = await self.redis.blmove(self._queue(partition), self._processing(partition), timeout, "RIGHT", "LEFT")
+        if raw is None:
+            return None
+        return raw, InboundMessage.loads(raw)
+
+    async def ack(self, partition: int, raw: str):
+        await self.redis.lrem(self._processing(partition), 1, raw)
+
+    async def dead_letter(self, partition: int, raw: str):
+        """Move a message that failed for good from processing to the dead-letter list"""
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.lpush(f"{self.prefix}:dead", raw)
+        pipe.lrem(self._processing(partition), 1, raw)
+        pipe.hincrby(f"{self.prefix}:stats", "dead_lettered", 1)
+        await pipe.execute()
+
+    async def recover(self, partition: int) -> int:
+        """Put messages left in processing by a crashed worker back at the head of the queue"""
+        recovered = 0
+        while await self.redis.lmove(self._processing(partition), self._queue(partition), "LEFT", "RIGHT"):
+            recovered += 1
+        return recovered
+
+    async def depths(self) -> Dict[int, int]:
+        pipe = self.redis.pipeline(transaction=False)
+        for partition in range(self.partitions):
+            pipe.llen(self._queue(partition))
+        return dict(enumerate(await pipe.execute()))
+
+    async def record_latency(self, stage: str, seconds: float):
+        key = f"{self.prefix}:latency:{stage}"
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.lpush(key, round(seconds, 4))
+        pipe.ltrim(key, 0, LATENCY_SAMPLES - 1)
+        await pipe.execute()
+
+    async def latency_summary(self, stages: List[str]) -> Dict[str, Dict[str, float]]:
+        """p50/p95/p99 in milliseconds over the most recent samples of each stage"""
+        summary = {}
+        for stage in stages:
+            samples = sorted(float(s) for s in await self.redis.lrange(f"{self.prefix}:latency:{stage}", 0, -1))
+            if not samples:
+                continue
+            summary[stage] = {
+                "samples": len(samples),
+                **{f"p{q}_ms": round(1000 * samples[min(len(samples) - 1, int(q / 100 * len(samples)))], 1)
+                   for q in (50, 95, 99)},
+            }
+        return summary
@@ -0,0 +1,128 @@
+"""
+Inbound message worker: runs each queued message through Rasa and sends the
+replies through the provider's outbound API
+
+Each process owns the partitions p with p % WEBHOOK_WORKER_COUNT ==
+WEBHOOK_WORKER_INDEX and consumes each with one coroutine, so a sender's
+messages are handled strictly in order. A per-sender lock covers the overlap
+while partitions move between processes; anything still processed out of
+sequence is counted in the reorder rate.
+
+    python inbound_worker.py
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple, Type
+
+import httpx
+import redis.asyncio as aioredis
+
+from inbound_queue import InboundMessage, InboundQueue
+from replies import reply_senders
+
+logger = logging.getLogger(__name__)
+
+RASA_URL = os.getenv("RASA_URL", "http://rasa:5005/webhooks/rest/webhook")
+RASA_TIMEOUT = float(os.getenv("RASA_TIMEOUT_SECONDS", "15"))
+MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF = float(os.getenv("WEBHOOK_RETRY_BACKOFF_SECONDS", "0.5"))
+
+
+async def _with_retries(action: Callable[[], Awaitable], what: str,
+                        retry_on: Tuple[Type[BaseException], ...] = (Exception,)):
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return await action()
+        except retry_on as e:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            logger.warning(f"{what} failed (attempt {attempt}/{MAX_ATTEMPTS}): {e}")
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+
+
+class InboundWorker:
+    def __init__(self, queue: InboundQueue, http: httpx.AsyncClient, replies: Dict, rasa_url: str = RASA_URL):
+        self.queue = queue
+        self.http = http
+        self.replies = replies
+        self.rasa_url = rasa_url
+
+    async def handle(self, message: InboundMessage):
+        started = time.time()
+        await self.queue.record_latency("queue_wait", started - message.received_at)
+
+        async def ask_rasa():
+            response = await self.http.post(
+                self.rasa_url, json={"sender": message.sender, "message": message.text}, timeout=RASA_TIMEOUT
+            )
+            response.raise_for_status()
+            return response.json()
+
+        # Once the request has reached Rasa, running it again would append a second user turn to
+        # the tracker, so only failures to connect are retried; a timeout may mean Rasa already has it
+        answers = await _with_retries(ask_rasa, f"Rasa turn for {message.sender}",
+                                      retry_on=(httpx.ConnectError, httpx.ConnectTimeout))
+        await self.queue.record_latency("rasa", time.time() - started)
+
+        outbound = self.replies[message.provider]
+        for answer in answers:
+            text = answer.get("text")
+            if text:
+                await _with_retries(
+                    lambda: outbound.send(message.recipient, message.sender, text),
+                    f"{message.provider} reply to {message.sender}",
+                )
+        await self.queue.record_latency("end_to_end", time.time() - message.received_at)
+
+    async def consume(self, partition: int, stop: asyncio.Event):
+        recovered = await self.queue.recover(partition)
+        if recovered:
+            logger.info(f"Recovered {recovered} unfinished messages on partition {partition}")
+        while not stop.is_set():
+            claimed = await self.queue.claim(partition, timeout=1.0)
+            if claimed is None:
+                continue
+            raw, message = claimed
+            try:
+                async with self.queue.sender_lock(message.sender):
+                    if not await self.queue.mark_processing(message):
+                        logger.warning(f"Message {message.seq} from {message.sender} processed out of order")
+                    await self.handle(message)
+            except Exception as e:
+                logger.error(f"Dead-lettering message {message.seq} from {message.sender}: {e}")
+                await self.queue.dead_letter(partition, raw)
+            else:
+                await self.queue.ack(partition, raw)
+
+
+def owned_partitions(partitions: int, index: int, count: int) -> List[int]:
+    return [p for p in range(partitions) if p % count == index]
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO)
+    redis = aioredis.from_url(os.getenv("REDIS_URL", "redis://redis:6379"), decode_responses=True)
+    queue = InboundQueue(redis, partitions=int(os.getenv("WEBHOOK_PARTITIONS", "16")),
+                         dedupe_ttl=int(os.getenv("WEBHOOK_DEDUPE_TTL_SECONDS", "86400")))
+    partitions = owned_partitions(
+        queue.partitions, int(os.getenv("WEBHOOK_WORKER_INDEX", "0")), int(os.getenv("WEBHOOK_WORKER_COUNT", "1"))
+    )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    async with httpx.AsyncClient(timeout=10.0) as http:
+        worker = InboundWorker(queue, http, reply_senders(http))
+        logger.info(f"Consuming inbound partitions {partitions}")
+        await asyncio.gather(*(worker.consume(p, stop) for p in partitions))
+    await redis.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
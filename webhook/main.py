@@ -2,8 +2,11 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import os
-from fastapi.responses import PlainTextResponse
-import httpx
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+import redis.asyncio as aioredis
+
+from inbound_admission import CRITICAL, AdaptiveLimit, BacklogAdmission, classify_text
+from inbound_queue import InboundMessage, InboundQueue
 
 app = FastAPI(title="SIH Health Bot Webhook")
 
@@ -17,45 +20,92 @@ app.add_middleware(
 
 @app.get("/", include_in_schema=False)
 def index():
-    return {"status": "ok", "service": "webhook", "endpoints": ["/health", "/twilio", "/gupshup"]}
+    return {"status": "ok", "service": "webhook", "endpoints": ["/health", "/twilio", "/gupshup", "/metrics"]}
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+_queue = None
+
+def get_queue() -> InboundQueue:
+    global _queue
+    if _queue is None:
+        redis = aioredis.from_url(os.getenv("REDIS_URL", "redis://redis:6379"), decode_responses=True)
+        _queue = InboundQueue(redis, partitions=int(os.getenv("WEBHOOK_PARTITIONS", "16")),
+                            dedupe_ttl=int(os.getenv("WEBHOOK_DEDUPE_TTL_SECONDS", "86400")))
+    return _queue
+
+_admission = None
+
+def get_admission() -> BacklogAdmission:
+    global _admission
+    if _admission is None:
+        _admission = BacklogAdmission(get_queue(), AdaptiveLimit(
+            target_latency=float(os.getenv("WEBHOOK_TARGET_QUEUE_WAIT_SECONDS", "5")),
+            initial=int(os.getenv("WEBHOOK_BACKLOG_LIMIT", "500")),
+            min_limit=int(os.getenv("WEBHOOK_BACKLOG_MIN_LIMIT", "50")),
+            max_limit=int(os.getenv("WEBHOOK_BACKLOG_MAX_LIMIT", "20000")),
+        ))
+    return _admission
+
+RETRY_AFTER = os.getenv("WEBHOOK_RETRY_AFTER_SECONDS", "30")
+
+# Messages are only queued here; inbound_worker.py runs them through Rasa and sends
+# the replies, so providers get their 200 in milliseconds and never retry on timeout.
+# Under backlog, low-priority messages (then normal ones) get a quick 503 instead;
+# emergency messages are always queued, ahead of the rest.
 @app.post("/twilio")
 async def twilio_webhook(request: Request):
     form = await request.form()
     from_number = form.get("From")
     body = form.get("Body", "")
-    # Forward to Rasa REST webhook
-    rasa_url = os.getenv("RASA_URL", "http://rasa:5005/webhooks/rest/webhook")
-    payload = {"sender": from_number or "twilio-user", "message": body}
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        try:
-            r = await client.post(rasa_url, json=payload)
-            r.raise_for_status()
-            messages = r.json()
-        except Exception as e:
-            return {"error": str(e), "forwarded_to": rasa_url}
-    # Twilio expects string body; we return structured for now
-    return {"received_from": from_number, "body": body, "replies": messages}
+    priority = classify_text(body)
+    if not await get_admission().admit(priority):
+        return Response(content="<Response/>", media_type="application/xml", status_code=503,
+                        headers={"Retry-After": RETRY_AFTER})
+    # Provider retries (same MessageSid) are acknowledged but not queued again
+    await get_queue().enqueue(InboundMessage(
+        provider="twilio",
+        sender=from_number or "twilio-user",
+        text=body,
+        recipient=form.get("To", ""),
+        message_id=form.get("MessageSid", ""),
+        urgent=priority == CRITICAL,
+    ))
+    # Empty TwiML: no synchronous reply
+    return Response(content="<Response/>", media_type="application/xml")
 
 @app.post("/gupshup")
 async def gupshup_webhook(payload: dict):
     # Gupshup payloads can vary; attempt generic extraction
-    sender = payload.get("sender", payload.get("phone", "gupshup-user"))
-    text = payload.get("text") or payload.get("message") or payload.get("payload", {}).get("text", "")
-    rasa_url = os.getenv("RASA_URL", "http://rasa:5005/webhooks/rest/webhook")
-    data = {"sender": sender, "message": text}
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        try:
-            r = await client.post(rasa_url, json=data)
-            r.raise_for_status()
-            messages = r.json()
-        except Exception as e:
-            return {"error": str(e), "forwarded_to": rasa_url}
-    return {"received": payload, "replies": messages}
+    inner = payload.get("payload", {}) if isinstance(payload.get("payload"), dict) else {}
+    sender = payload.get("sender", payload.get("phone")) or inner.get("source") or "gupshup-user"
+    text = payload.get("text") or payload.get("message") or inner.get("text") \
+        or inner.get("payload", {}).get("text", "")
+    priority = classify_text(text)
+    if not await get_admission().admit(priority):
+        return JSONResponse({"status": "busy"}, status_code=503, headers={"Retry-After": RETRY_AFTER})
+    await get_queue().enqueue(InboundMessage(
+        provider="gupshup",
+        sender=str(sender),
+        text=text,
+        message_id=str(inner.get("id") or payload.get("messageId") or ""),
+        urgent=priority == CRITICAL,
+    ))
+    return {"status": "queued"}
+
+@app.get("/metrics")
+async def metrics():
+    queue = get_queue()
+    depths = await queue.depths()
+    return {
+        "queued": sum(depths.values()),
+        "partitions": depths,
+        "latency": await queue.latency_summary(["queue_wait", "rasa", "end_to_end"]),
+        "messages": await queue.stats(),
+        "admission": get_admission().snapshot(),
+    }
 
 @app.get("/favicon.ico", include_in_schema=False)
 async def favicon():
@@ -0,0 +1,50 @@
+"""
+Outbound reply delivery through each provider's messaging API
+"""
+
+import os
+
+import httpx
+
+
+class TwilioReplies:
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.account_sid = os.getenv("TWILIO_ACCOUNT_SID", "")
+        self.auth_token = os.getenv("TWILIO_AUTH_TOKEN", "")
+        self.api_url = os.getenv("TWILIO_API_URL", "https://api.twilio.com").rstrip("/")
+
+    async def send(self, sender: str, recipient: str, text: str):
+        # Reply from the number (or whatsapp: address) the user wrote to
+        response = await self.client.post(
+            f"{self.api_url}/2010-04-01/Accounts/{self.account_sid}/Messages.json",
+            data={"To": recipient, "From": sender, "Body": text},
+            auth=(self.account_sid, self.auth_token),
+        )
+        response.raise_for_status()
+
+
+class GupshupReplies:
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.api_key = os.getenv("GUPSHUP_API_KEY", "")
+        self.app_name = os.getenv("GUPSHUP_APP_NAME", "")
+        self.api_url = os.getenv("GUPSHUP_MESSAGE_URL", "https://api.gupshup.io/sm/api/v1/msg")
+
+    async def send(self, sender: str, recipient: str, text: str):
+        response = await self.client.post(
+            self.api_url,
+            data={
+                "channel": "whatsapp",
+                "source": sender or os.getenv("GUPSHUP_SOURCE_NUMBER", ""),
+                "destination": recipient,
+                "message": text,
+                "src.name": self.app_name,
+            },
+            headers={"apikey": self.api_key},
+        )
+        response.raise_for_status()
+
+
+def reply_senders(client: httpx.AsyncClient):
+    return {"twilio": TwilioReplies(client), "gupshup": GupshupReplies(client)}
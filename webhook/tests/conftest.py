@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The webhook service runs from its own directory (uvicorn main:app / python inbound_worker.py)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# admission_rules.py is copied in from actions/ when the image is built
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "actions")))
@@ -0,0 +1,226 @@
+import asyncio
+import importlib.util
+import json
+import os
+
+import httpx
+import pytest
+
+from inbound_admission import LOW, NORMAL, AdaptiveLimit, BacklogAdmission, classify_text
+from inbound_queue import InboundMessage, InboundQueue
+from inbound_worker import InboundWorker
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class RecordingReplies:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, sender, recipient, text):
+        self.sent.append((recipient, text))
+
+
+def rasa_echo(request: httpx.Request) -> httpx.Response:
+    message = json.loads(request.content)
+    return httpx.Response(200, json=[{"recipient_id": message["sender"], "text": f"re: {message['message']}"}])
+
+
+async def drain(queue: InboundQueue, worker: InboundWorker):
+    stop = asyncio.Event()
+    consumers = [asyncio.create_task(worker.consume(p, stop)) for p in range(queue.partitions)]
+    while sum((await queue.depths()).values()):
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+    stop.set()
+    await asyncio.gather(*consumers)
+
+
+def test_worker_replies_in_order_per_sender_and_tracks_latency():
+    async def scenario():
+        queue = InboundQueue(fakeredis.FakeAsyncRedis(decode_responses=True), partitions=4)
+        for i in range(5):
+            for sender in ("+911", "+912", "+913"):
+                await queue.enqueue(InboundMessage("twilio", sender, f"msg {i}", recipient="+1555"))
+
+        replies = RecordingReplies()
+        async with httpx.AsyncClient(transport=httpx.MockTransport(rasa_echo)) as http:
+            await drain(queue, InboundWorker(queue, http, {"twilio": replies}, rasa_url="http://rasa/webhook"))
+        return replies, await queue.latency_summary(["queue_wait", "rasa", "end_to_end"])
+
+    replies, summary = asyncio.run(scenario())
+
+    for sender in ("+911", "+912", "+913"):
+        assert [text for to, text in replies.sent if to == sender] == [f"re: msg {i}" for i in range(5)]
+    assert summary["end_to_end"]["samples"] == 15
+
+
+def test_unfinished_messages_are_recovered_first():
+    async def scenario():
+        queue = InboundQueue(fakeredis.FakeAsyncRedis(decode_responses=True), partitions=1)
+        for text in ("first", "second"):
+            await queue.enqueue(InboundMessage("gupshup", "+911", text))
+        await queue.claim(0)  # worker dies holding "first"
+
+        assert await queue.recover(0) == 1
+        return [(await queue.claim(0))[1].text for _ in range(2)]
+
+    assert asyncio.run(scenario()) == ["first", "second"]
+
+
+def test_webhook_acknowledges_without_waiting_for_rasa(monkeypatch):
+    spec = importlib.util.spec_from_file_location(
+        "webhook_main", os.path.join(os.path.dirname(__file__), "..", "main.py")
+    )
+    webhook_main = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(webhook_main)
+    queue = InboundQueue(fakeredis.FakeAsyncRedis(decode_responses=True), partitions=2)
+    monkeypatch.setattr(webhook_main, "_queue", queue)
+
+    async def scenario():
+        ack = await webhook_main.gupshup_webhook(
+            {"type": "message", "payload": {"id": "gs-1", "source": "919876543210", "payload": {"text": "fever"}}}
+        )
+        claimed = await queue.claim(queue.partition_for("919876543210"))
+        return ack, claimed[1]
+
+    ack, message = asyncio.run(scenario())
+
+    assert ack == {"status": "queued"}
+    assert (message.sender, message.text, message.message_id) == ("919876543210", "fever", "gs-1")
+
+
+def test_provider_retries_are_queued_once():
+    async def scenario():
+        queue = InboundQueue(fakeredis.FakeAsyncRedis(decode_responses=True), partitions=2)
+        seqs = [
+            await queue.enqueue(InboundMessage("twilio", "+911", "fever", message_id="SM1")),
+            await queue.enqueue(InboundMessage("twilio", "+911", "fever", message_id="SM1")),
+            await queue.enqueue(InboundMessage("twilio", "+911", "cough", message_id="SM2")),
+        ]
+        return seqs, await queue.depths(), await queue.stats()
+
+    seqs, depths, stats = asyncio.run(scenario())
+
+    assert seqs == [1, None, 2]
+    assert sum(depths.values()) == 2
+    assert (stats["received"], stats["duplicates"], stats["duplicate_rate"]) == (3, 1, 0.3333)
+
+
+def test_out_of_sequence_processing_is_counted():
+    async def scenario():
+        queue = InboundQueue(fakeredis.FakeAsyncRedis(decode_responses=True), partitions=1)
+        for text in ("first", "second"):
+            await queue.enqueue(InboundMessage("gupshup", "+911", text))
+        first, second = (await queue.claim(0))[1], (await queue.claim(0))[1]
+        # Two consumers briefly share the partition during a rebalance
+        async with queue.sender_lock("+911"):
+            in_order = [await queue.mark_processing(second), await queue.mark_processing(first)]
+        return (first.seq, second.seq), in_order, await queue.stats()
+
+    seqs, in_order, stats = asyncio.run(scenario())
+
+    assert seqs == (1, 2)
+    assert in_order == [True, False]
+    assert (stats["reordered"], stats["reorder_rate"]) == (1, 0.5)
+
+
+def test_sender_lock_serializes_one_sender():
+    async def scenario():
+        queue = InboundQueue(fakeredis.FakeAsyncRedis(decode_responses=True), partitions=1)
+        events = []
+
+        async def hold(name):
+            async with queue.sender_lock("+911", poll=0.01):
+                events.append(f"{name} in")
+                await asyncio.sleep(0.05)
+                events.append(f"{name} out")
+
+        await asyncio.gather(hold("a"), hold("b"))
+        return events
+
+    events = asyncio.run(scenario())
+
+    assert events in (["a in", "a out", "b in", "b out"], ["b in", "b out", "a in", "a out"])
+
+
+def test_backlog_sheds_low_priority_first_and_queues_emergencies_ahead():
+    async def scenario():
+        queue = InboundQueue(fakeredis.FakeAsyncRedis(decode_responses=True), partitions=1)
+        admission = BacklogAdmission(queue, AdaptiveLimit(5.0, initial=4, min_limit=2, max_limit=100))
+        for i in range(2):
+            await queue.enqueue(InboundMessage("twilio", "+911", f"fever {i}"))
+
+        decisions = [await admission.admit(classify_text(text))
+                     for text in ("quiz please", "cough", "more cough", "chest pain, help")]
+        await queue.enqueue(InboundMessage("twilio", "+912", "chest pain, help", urgent=True))
+        return decisions, (await queue.claim(0))[1], admission.snapshot()
+
+    decisions, first, snapshot = asyncio.run(scenario())
+
+    assert decisions == [False, True, True, True]
+    assert first.text == "chest pain, help"
+    assert snapshot["shed"] == {NORMAL: 0, LOW: 1}
+
+
+def test_slow_queue_wait_shrinks_the_backlog_limit():
+    async def scenario():
+        queue = InboundQueue(fakeredis.FakeAsyncRedis(decode_responses=True), partitions=1)
+        admission = BacklogAdmission(queue, AdaptiveLimit(5.0, initial=100, min_limit=10, max_limit=1000),
+                                     refresh_seconds=0)
+        await queue.redis.hset(f"{queue.prefix}:stats", "processed", 3)
+        for wait in (12.0, 9.0, 20.0):
+            await queue.record_latency("queue_wait", wait)
+        await admission.admit(NORMAL)
+        return admission.limit.limit
+
+    assert asyncio.run(scenario()) == 80
+
+
+def test_rasa_timeouts_are_not_retried_and_failed_messages_are_dead_lettered():
+    calls = []
+
+    def slow_rasa(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        raise httpx.ReadTimeout("no answer", request=request)
+
+    async def scenario():
+        queue = InboundQueue(fakeredis.FakeAsyncRedis(decode_responses=True), partitions=1)
+        await queue.enqueue(InboundMessage("twilio", "+911", "fever"))
+        replies = RecordingReplies()
+        async with httpx.AsyncClient(transport=httpx.MockTransport(slow_rasa)) as http:
+            await drain(queue, InboundWorker(queue, http, {"twilio": replies}, rasa_url="http://rasa/webhook"))
+        dead = await queue.redis.lrange(f"{queue.prefix}:dead", 0, -1)
+        processing = await queue.redis.llen(f"{queue.prefix}:0:processing")
+        return replies.sent, dead, processing, await queue.stats()
+
+    sent, dead, processing, stats = asyncio.run(scenario())
+
+    # Rasa may have recorded the turn before timing out; a retry would add it twice
+    assert len(calls) == 1
+    assert sent == []
+    assert [InboundMessage.loads(raw).text for raw in dead] == ["fever"]
+    assert processing == 0
+    assert stats["dead_lettered"] == 1
+
+
+def test_rasa_connection_failures_are_retried(monkeypatch):
+    monkeypatch.setattr("inbound_worker.RETRY_BACKOFF", 0)
+    attempts = []
+
+    def flaky_rasa(request: httpx.Request) -> httpx.Response:
+        attempts.append(request)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("refused", request=request)
+        return rasa_echo(request)
+
+    async def scenario():
+        queue = InboundQueue(fakeredis.FakeAsyncRedis(decode_responses=True), partitions=1)
+        await queue.enqueue(InboundMessage("twilio", "+911", "fever"))
+        replies = RecordingReplies()
+        async with httpx.AsyncClient(transport=httpx.MockTransport(flaky_rasa)) as http:
+            await drain(queue, InboundWorker(queue, http, {"twilio": replies}, rasa_url="http://rasa/webhook"))
+        return replies.sent
+
+    assert asyncio.run(scenario()) == [("+911", "re: fever")]
+    assert len(attempts) == 2
@@ -12,7 +12,11 @@ Instructions:
    - Run: ngrok http 8002
    - Copy the https URL from ngrok and set it as the webhook in Twilio Console.
 
-3. Testing:
+3. Run (async; one process serves many concurrent conversations):
+   - uvicorn whatsapp_flask_bot:app --host 0.0.0.0 --port 8002 --workers 2
+   - Set REDIS_URL to share conversation history between workers/replicas.
+
+4. Testing:
    - Send WhatsApp messages to your Twilio sandbox number from your WhatsApp app.
    - Try commands: schedule, symptoms fever cough, alert, services, etc.
 """
@@ -20,24 +24,104 @@ Instructions:
 
 
 
+import json
 import os
-from flask import Flask, request, session
-from twilio.twiml.messaging_response import MessagingResponse
-import openai
-from collections import defaultdict
-
+import time
+from collections import OrderedDict
+from typing import Dict, List
 
+import aiohttp
+import openai
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+from twilio.twiml.messaging_response import MessagingResponse
 
-app = Flask(__name__)
-app.secret_key = os.getenv("FLASK_SECRET_KEY", "supersecretkey")  # For session management
+# Served by FastAPI/uvicorn: the OpenAI call is awaited, so a waiting LLM reply
+# no longer ties up a whole WSGI worker.
+app = FastAPI(title="ByteCare WhatsApp Bot")
 
 # --- Load Environment Variables ---
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 openai.api_key = OPENAI_API_KEY
 
-# --- In-memory session store for WhatsApp numbers (for demo; use Redis/DB for production) ---
-user_histories = defaultdict(list)
+HISTORY_EXCHANGES = int(os.getenv("BOT_HISTORY_EXCHANGES", "6"))
+HISTORY_TTL_SECONDS = int(os.getenv("BOT_HISTORY_TTL_SECONDS", str(24 * 3600)))
+HISTORY_MAX_USERS = int(os.getenv("BOT_HISTORY_MAX_USERS", "10000"))
+
+
+# --- Conversation history: last few exchanges per WhatsApp number, expiring when idle ---
+class MemoryHistoryStore:
+    """Single-process fallback when REDIS_URL is not set; least recently active users are evicted"""
+
+    def __init__(self, max_users: int, max_exchanges: int, ttl: int):
+        self.max_users = max_users
+        self.max_exchanges = max_exchanges
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, user_id: str) -> List[Dict]:
+        entry = self._data.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            self._data.pop(user_id, None)
+            return []
+        return list(entry[1])
+
+    async def append(self, user_id: str, exchange: Dict):
+        history = (await self.get(user_id) + [exchange])[-self.max_exchanges:]
+        self._data[user_id] = (time.monotonic() + self.ttl, history)
+        self._data.move_to_end(user_id)
+        while len(self._data) > self.max_users:
+            self._data.popitem(last=False)
+
+
+class RedisHistoryStore:
+    """Shared by every worker and replica; each user's list is trimmed and expires when idle"""
+
+    def __init__(self, redis, max_exchanges: int, ttl: int, prefix: str = "whatsapp:history"):
+        self.redis = redis
+        self.max_exchanges = max_exchanges
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, user_id: str) -> List[Dict]:
+        return [json.loads(raw) for raw in await self.redis.lrange(f"{self.prefix}:{user_id}", 0, -1)]
+
+    async def append(self, user_id: str, exchange: Dict):
+        key = f"{self.prefix}:{user_id}"
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.rpush(key, json.dumps(exchange))
+        pipe.ltrim(key, -self.max_exchanges, -1)
+        pipe.expire(key, self.ttl)
+        await pipe.execute()
+
+
+def _history_store():
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        import redis.asyncio as aioredis
+
+        return RedisHistoryStore(aioredis.from_url(redis_url, decode_responses=True),
+                                 HISTORY_EXCHANGES, HISTORY_TTL_SECONDS)
+    return MemoryHistoryStore(HISTORY_MAX_USERS, HISTORY_EXCHANGES, HISTORY_TTL_SECONDS)
+
+
+user_histories = _history_store()
+
+# One pooled HTTP session for OpenAI calls instead of a new connection per request
+_openai_session = None
+
+
+@app.on_event("startup")
+async def open_openai_session():
+    global _openai_session
+    _openai_session = aiohttp.ClientSession()
+
+
+@app.on_event("shutdown")
+async def close_openai_session():
+    if _openai_session is not None:
+        await _openai_session.close()
 
 
 # --- Service Data ---
@@ -73,11 +157,11 @@ def analyze_symptoms(text):
             return diagnosis
     return "Sorry, I couldn't match your symptoms. Please consult a doctor. 🩺"
 
-def chatgpt_analysis(user_query, user_id=None):
+async def chatgpt_analysis(user_query, user_id=None):
     if not OPENAI_API_KEY:
         return "OpenAI API key not set. Please contact admin."
     # Maintain conversation history for context
-    history = user_histories[user_id] if user_id else []
+    history = await user_histories.get(user_id) if user_id else []
     system_prompt = {
         "role": "system",
         "content": (
@@ -89,13 +173,16 @@ def chatgpt_analysis(user_query, user_id=None):
     }
     # Build message history for OpenAI
     messages = [system_prompt]
-    for h in history[-6:]:  # last 6 exchanges for context
+    for h in history[-HISTORY_EXCHANGES:]:  # last few exchanges for context
         messages.append({"role": "user", "content": h["user"]})
         if h.get("assistant"):
             messages.append({"role": "assistant", "content": h["assistant"]})
     messages.append({"role": "user", "content": user_query})
     try:
-        response = openai.ChatCompletion.create(
+        # The session is picked up from this request's context by openai's async client
+        if _openai_session is not None:
+            openai.aiosession.set(_openai_session)
+        response = await openai.ChatCompletion.acreate(
             model="gpt-3.5-turbo-16k",
             messages=messages,
             max_tokens=512,
@@ -104,17 +191,18 @@ def chatgpt_analysis(user_query, user_id=None):
         answer = response.choices[0].message["content"].strip()
         # Save to history
         if user_id:
-            user_histories[user_id].append({"user": user_query, "assistant": answer})
+            await user_histories.append(user_id, {"user": user_query, "assistant": answer})
         return answer
     except Exception as e:
         return f"AI analysis error: {str(e)}"
 
 
 # --- Webhook Endpoint ---
-@app.route("/twilio", methods=["POST"])
-def twilio_webhook():
-    incoming_msg = request.values.get("Body", "").strip()
-    from_number = request.values.get("From", "")
+@app.post("/twilio")
+async def twilio_webhook(request: Request):
+    form = await request.form()
+    incoming_msg = (form.get("Body") or "").strip()
+    from_number = form.get("From", "")
     resp = MessagingResponse()
     reply = ""
 
@@ -132,15 +220,17 @@ def twilio_webhook():
         if not user_query:
             reply = "Please provide a question or health concern after 'analyze'."
         else:
-            reply = chatgpt_analysis(user_query, user_id=from_number)
+            reply = await chatgpt_analysis(user_query, user_id=from_number)
     elif incoming_msg.lower() == "services":
         reply = services_list
     else:
         # For any other message, use advanced AI with context
-        reply = chatgpt_analysis(incoming_msg, user_id=from_number)
+        reply = await chatgpt_analysis(incoming_msg, user_id=from_number)
 
     resp.message(reply)
-    return str(resp)
+    return Response(content=str(resp), media_type="application/xml")
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8002)
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=8002)
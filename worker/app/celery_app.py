@@ -1,6 +1,10 @@
 import os
 from celery import Celery
 
+from config import settings
+from task_metrics import instrument_tasks
+from task_queues import configure_queues
+
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
 celery_app = Celery(
@@ -9,10 +13,34 @@ celery_app = Celery(
     backend=REDIS_URL,
 )
 
-celery_app.conf.task_routes = {
-    "tasks.send_reminder": {"queue": "reminders"},
-    "tasks.send_outbreak_alert": {"queue": "alerts"},
-    "tasks.credit_reward": {"queue": "rewards"},
+# Queues, routes and priorities for every task (actions/task_queues.py)
+configure_queues(celery_app)
+
+# Enqueue stamps, queue wait/runtime histograms and retry counts (actions/task_metrics.py)
+instrument_tasks()
+
+celery_app.conf.beat_schedule = {
+    "refresh-vaccination-coverage": {
+        "task": "services.refresh_coverage_snapshot",
+        # Same interval the API treats its local copy as fresh for (actions/services/coverage.py)
+        "schedule": float(settings.coverage_snapshot_refresh_seconds),
+    },
+    "scan-vaccination-reminders": {
+        "task": "services.scan_vaccination_reminders",
+        "schedule": 900.0,
+    },
+    "ensure-table-partitions": {
+        "task": "services.ensure_partitions",
+        "schedule": 24 * 3600.0,
+    },
+    "apply-data-retention": {
+        "task": "services.apply_retention",
+        "schedule": 24 * 3600.0,
+    },
+    "export-analytics-data": {
+        "task": "services.export_analytics_data",
+        "schedule": 6 * 3600.0,
+    },
 }
 
 """
@@ -0,0 +1,10 @@
+"""Prometheus endpoint for Celery queue and task metrics: python -m app.metrics_exporter"""
+import logging
+import os
+
+from task_metrics import serve
+from .celery_app import celery_app
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    serve(celery_app, int(os.getenv("METRICS_PORT", "9808")))
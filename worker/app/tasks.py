@@ -1,11 +1,19 @@
 from .celery_app import celery_app
+from task_queues import PRIORITY_ROUTINE, REMINDERS_QUEUE
 import os
 import requests
 
 API_URL = os.getenv("ACTIONS_API_URL", "http://actions:8000")
 
 @celery_app.task(name="tasks.send_reminder")
-def send_reminder(user_id: str, message: str) -> dict:
+def send_reminder(user_id: str, message: str, idempotency_key: str = None) -> dict:
+    # Delivery (provider choice, fallback and dedupe) is handled by the alert task
+    celery_app.send_task(
+        "actions.send_alert_task",
+        kwargs={"user_id": user_id, "message": message, "idempotency_key": idempotency_key},
+        queue=REMINDERS_QUEUE,
+        priority=PRIORITY_ROUTINE,
+    )
     return {"status": "queued", "user_id": user_id, "message": message}
 
 @celery_app.task(name="tasks.send_outbreak_alert")